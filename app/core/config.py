@@ -32,12 +32,46 @@ class Settings(BaseSettings):
     api_password: str
     api_url: str
     api_timeout: int = 30
+    api_max_connections: int = 100
+    api_max_keepalive_connections: int = 20
+    api_keepalive_expiry: float = 30.0
+    api_http2: bool = False
 
     # Cache configuration
     cache_type: str = "redis"
     cache_default_timeout: int = 5 * 24 * 60 * 60  # 5 days
     redis_url: str = "redis://localhost:6379/0"
-    cache_excluded_paths: list[str] = ["/up"]
+    # past its timeout an entry is served while refreshed in the background...
+    cache_stale_while_revalidate: int = 24 * 60 * 60  # 1 day
+    # ...and after that only when the refresh fails with a server error
+    cache_stale_if_error: int = 7 * 24 * 60 * 60  # 7 days
+    cache_excluded_paths: list[str] = ["/up", "/metrics"]
+    # per-process LRU in front of redis, kept coherent through pub/sub
+    cache_local_ttl: int = 60  # seconds, 0 disables the local tier
+    cache_local_max_entries: int = 10_000
+    cache_local_max_bytes: int = 64 * 1024 * 1024  # 64 MB
+    # capacity of the in-memory cache type
+    cache_memory_max_entries: int = 100_000
+    cache_memory_max_bytes: int = 256 * 1024 * 1024  # 256 MB
+    # eviction of both in-process caches: "lru" or "tinylfu"
+    cache_memory_policy: str = "lru"
+    # coalesce concurrent /vakitler misses across workers (redis cache only)
+    singleflight_distributed: bool = True
+    # refetch an ilce's prayer times once fewer days than this are stored ahead
+    vakitler_min_days_ahead: int = 15
+    # ilces per /vakitler batch request, and their upstream calls in flight at most
+    vakitler_batch_max_ilces: int = 100
+    vakitler_batch_concurrency: int = 8
+
+    # Prayer times warm-up (also runnable with python -m app.services.warmup)
+    warmup_on_startup: bool = False
+    warmup_concurrency: int = 8
+    warmup_rate: float = 10.0  # upstream requests per second
+    warmup_max_retries: int = 5
+
+    # Static data
+    # serve location endpoints from bodies serialized and compressed at startup
+    static_preserialized: bool = True
 
     # Security
     trusted_clients: set[str] = set()
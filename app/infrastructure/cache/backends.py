@@ -1,23 +1,69 @@
 import asyncio
+import contextlib
 import logging
+import uuid
+from collections import Counter
+from contextlib import AbstractAsyncContextManager
 from typing import Any
 
 import redis.asyncio as redis
+from redis.exceptions import LockError
+
+from app.infrastructure.cache.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
+# Keys written by one process are announced here so the others drop their copy
+INVALIDATION_CHANNEL = "cache:invalidate"
+
 
 class CacheBackend:
     """Abstract cache backend interface."""
 
-    async def get(self, key: str) -> str | None:
+    async def get(self, key: str) -> bytes | None:
         """Get value from cache."""
         raise NotImplementedError()
 
-    async def set(self, key: str, value: str, timeout: int) -> None:
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        """Get several values at once, None for the missing ones."""
+        return [await self.get(key) for key in keys]
+
+    async def set(self, key: str, value: bytes | str, timeout: int) -> None:
         """Set value in cache with timeout."""
         raise NotImplementedError()
 
+    async def increment(self, key: str, counts: dict[str, int], timeout: int) -> None:
+        """Add to the counters of a key atomically, keeping them for timeout."""
+        raise NotImplementedError()
+
+    async def get_counts(self, key: str) -> dict[str, int]:
+        """Counters of a key, empty if there are none."""
+        raise NotImplementedError()
+
+    def lock(
+        self, key: str, timeout: int, blocking: bool = True
+    ) -> AbstractAsyncContextManager[bool]:
+        """
+        Lock shared by every process using this backend.
+
+        The context manager yields whether the lock was acquired. Backends
+        local to a single process return a no-op lock, always acquired.
+
+        Args:
+            key: Name of the lock
+            timeout: Seconds the lock is held at most, and waited for at most
+                when blocking
+            blocking: Wait for the lock if it is held, else give up at once
+        """
+        return contextlib.nullcontext(True)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Counters describing the backend, empty if it keeps none."""
+        return {}
+
+    async def close(self) -> None:
+        """Release connections and background tasks."""
+
 
 class RedisCacheBackend(CacheBackend):
     """Redis cache backend implementation."""
@@ -25,47 +71,188 @@ class RedisCacheBackend(CacheBackend):
     def __init__(self, redis_url: str):
         self.redis = redis.from_url(redis_url)
 
-    async def get(self, key: str) -> str | None:
-        value = await self.redis.get(key)
-        return value.decode("utf-8") if value else None
+    async def get(self, key: str) -> bytes | None:
+        return await self.redis.get(key)
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        # One round trip for all keys
+        return await self.redis.mget(keys) if keys else []
 
-    async def set(self, key: str, value: str, timeout: int) -> None:
+    async def set(self, key: str, value: bytes | str, timeout: int) -> None:
         await self.redis.setex(key, timeout, value)
 
+    async def increment(self, key: str, counts: dict[str, int], timeout: int) -> None:
+        async with self.redis.pipeline(transaction=True) as pipe:
+            for field, count in counts.items():
+                pipe.hincrby(key, field, count)
+            pipe.expire(key, timeout)
+            await pipe.execute()
+
+    async def get_counts(self, key: str) -> dict[str, int]:
+        counts = await self.redis.hgetall(key)
+        return {field.decode(): int(count) for field, count in counts.items()}
+
+    @contextlib.asynccontextmanager
+    async def lock(self, key: str, timeout: int, blocking: bool = True):
+        lock = self.redis.lock(
+            f"lock:{key}",
+            timeout=timeout,
+            blocking=blocking,
+            blocking_timeout=timeout if blocking else None,
+        )
+        try:
+            acquired = await lock.acquire()
+        except LockError:
+            acquired = False
+        if blocking and not acquired:
+            # Holder died or is too slow; proceed rather than fail the request
+            logger.warning(f"Could not acquire cache lock for {key}")
+        try:
+            yield acquired
+        finally:
+            if acquired:
+                with contextlib.suppress(LockError):
+                    await lock.release()
+
+    async def close(self) -> None:
+        await self.redis.aclose()
+
+
+class TieredCacheBackend(CacheBackend):
+    """
+    Per-process LRU cache in front of Redis.
+
+    Reads are served from the local tier when possible and fall back to
+    Redis. Writes go to both tiers and are announced on a pub/sub channel,
+    so other workers and hosts drop their local copy. Local entries are
+    also kept for at most local_ttl seconds, which bounds how stale they
+    can get if an announcement is missed.
+    """
+
+    def __init__(self, remote: RedisCacheBackend, local: LRUCache, local_ttl: int):
+        """
+        Args:
+            remote: Shared Redis backend
+            local: Cache local to this process
+            local_ttl: Seconds an entry is kept locally at most
+        """
+        self.remote = remote
+        self.local = local
+        self.local_ttl = local_ttl
+        self.node_id = uuid.uuid4().hex
+        self._listener: asyncio.Task | None = None
+
+    async def get(self, key: str) -> bytes | None:
+        self._ensure_listening()
+        value = self.local.get(key)
+        if value is not None:
+            return value
+
+        value = await self.remote.get(key)
+        if value is not None:
+            self.local.set(key, value, self.local_ttl)
+        return value
+
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        self._ensure_listening()
+        values = [self.local.get(key) for key in keys]
+        missing = [i for i, value in enumerate(values) if value is None]
+        if missing:
+            remote = await self.remote.get_many([keys[i] for i in missing])
+            for i, value in zip(missing, remote, strict=True):
+                if value is not None:
+                    self.local.set(keys[i], value, self.local_ttl)
+                    values[i] = value
+        return values
+
+    async def set(self, key: str, value: bytes | str, timeout: int) -> None:
+        self._ensure_listening()
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        await self.remote.set(key, value, timeout)
+        self.local.set(key, value, min(timeout, self.local_ttl))
+        await self.remote.redis.publish(INVALIDATION_CHANNEL, f"{self.node_id} {key}")
+
+    async def increment(self, key: str, counts: dict[str, int], timeout: int) -> None:
+        # Counters change in every process, they are not worth caching locally
+        await self.remote.increment(key, counts, timeout)
+
+    async def get_counts(self, key: str) -> dict[str, int]:
+        return await self.remote.get_counts(key)
+
+    def lock(
+        self, key: str, timeout: int, blocking: bool = True
+    ) -> AbstractAsyncContextManager[bool]:
+        return self.remote.lock(key, timeout, blocking)
+
+    def get_metrics(self) -> dict[str, Any]:
+        return {"local": self.local.get_metrics()}
+
+    async def close(self) -> None:
+        if self._listener is not None:
+            self._listener.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._listener
+            self._listener = None
+        await self.remote.close()
+
+    def _ensure_listening(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.create_task(self._listen())
+
+    async def _listen(self) -> None:
+        """Drop local entries written by other processes, reconnecting on errors."""
+        while True:
+            pubsub = self.remote.redis.pubsub(ignore_subscribe_messages=True)
+            try:
+                await pubsub.subscribe(INVALIDATION_CHANNEL)
+                # Announcements may have been missed before subscribing
+                self.local.clear()
+                async for message in pubsub.listen():
+                    node_id, _, key = message["data"].decode().partition(" ")
+                    if node_id != self.node_id:
+                        self.local.delete(key)
+            except Exception as e:
+                logger.warning(f"Cache invalidation channel failed: {e}")
+                self.local.clear()
+                await asyncio.sleep(1)
+            finally:
+                await pubsub.aclose()
+
 
 class InMemoryCacheBackend(CacheBackend):
     """In-memory cache backend implementation."""
 
-    def __init__(self):
-        self.cache: dict[str, dict[str, Any]] = {}
-        self._cleanup_lock = asyncio.Lock()
-
-    async def get(self, key: str) -> str | None:
-        # Clean expired items occasionally
-        if len(self.cache) > 100:  # Simple heuristic to avoid cleaning too often
-            asyncio.create_task(self._cleanup_expired())
-
-        item = self.cache.get(key)
-        if not item:
-            return None
-
-        # Check if expired
-        if item["expires"] < asyncio.get_event_loop().time():
-            del self.cache[key]
-            return None
-
-        return item["value"]
-
-    async def set(self, key: str, value: str, timeout: int) -> None:
-        expires = asyncio.get_event_loop().time() + timeout
-        self.cache[key] = {"value": value, "expires": expires}
-
-    async def _cleanup_expired(self) -> None:
-        # Use a lock to prevent multiple cleanups at once
-        async with self._cleanup_lock:
-            now = asyncio.get_event_loop().time()
-            expired_keys = [
-                key for key, item in self.cache.items() if item["expires"] < now
-            ]
-            for key in expired_keys:
-                del self.cache[key]
+    def __init__(
+        self,
+        max_entries: int = 100_000,
+        max_bytes: int = 256 * 1024 * 1024,
+        tinylfu: bool = False,
+    ):
+        """
+        Args:
+            max_entries: Entries kept at most
+            max_bytes: Bytes of keys and values kept at most
+            tinylfu: Admit new keys based on their recent popularity
+        """
+        self.cache = LRUCache(max_entries, max_bytes, tinylfu=tinylfu)
+        self.counts: dict[str, Counter[str]] = {}
+
+    async def get(self, key: str) -> bytes | None:
+        return self.cache.get(key)
+
+    async def set(self, key: str, value: bytes | str, timeout: int) -> None:
+        # Hand back bytes like Redis does
+        if isinstance(value, str):
+            value = value.encode("utf-8")
+        self.cache.set(key, value, timeout)
+
+    async def increment(self, key: str, counts: dict[str, int], timeout: int) -> None:
+        # Process-local like everything else here, so kept without expiry
+        self.counts.setdefault(key, Counter()).update(counts)
+
+    async def get_counts(self, key: str) -> dict[str, int]:
+        return dict(self.counts.get(key, {}))
+
+    def get_metrics(self) -> dict[str, Any]:
+        return self.cache.get_metrics()
@@ -0,0 +1,85 @@
+import struct
+from typing import NamedTuple, Self
+
+# version, status, gzip flag, fresh until, ETag, content type and headers lengths
+_HEADER = struct.Struct("!BH?dHHI")
+_VERSION = 1
+
+
+class CacheEntry(NamedTuple):
+    """
+    A cached response stored as a small binary header followed by its body.
+
+    The body is kept byte for byte as the application produced it, gzipped
+    when the gzip flag is set, so a hit needs neither JSON parsing nor
+    re-serialization.
+    """
+
+    status: int
+    etag: str
+    content_type: str
+    body: bytes
+    fresh_until: float
+    gzip: bool = False
+    headers: tuple[tuple[str, str], ...] = ()
+
+    def dumps(self) -> bytes:
+        """Serialize for the cache."""
+        etag = self.etag.encode("latin-1")
+        content_type = self.content_type.encode("latin-1")
+        headers = "".join(f"{k}: {v}\r\n" for k, v in self.headers).encode("latin-1")
+        return b"".join(
+            (
+                _HEADER.pack(
+                    _VERSION,
+                    self.status,
+                    self.gzip,
+                    self.fresh_until,
+                    len(etag),
+                    len(content_type),
+                    len(headers),
+                ),
+                etag,
+                content_type,
+                headers,
+                self.body,
+            )
+        )
+
+    @classmethod
+    def loads(cls, value: bytes) -> Self | None:
+        """
+        Deserialize a value written by dumps.
+
+        Returns:
+            The entry, or None for values in another format (e.g. written by
+            an older version), which are then treated as a miss
+        """
+        if len(value) < _HEADER.size or value[0] != _VERSION:
+            return None
+
+        _, status, gzip, fresh_until, etag_len, content_type_len, headers_len = (
+            _HEADER.unpack_from(value)
+        )
+        offset = _HEADER.size
+        etag = value[offset : offset + etag_len].decode("latin-1")
+        offset += etag_len
+        content_type = value[offset : offset + content_type_len].decode("latin-1")
+        offset += content_type_len
+        headers = tuple(
+            tuple(line.split(": ", 1))
+            for line in value[offset : offset + headers_len]
+            .decode("latin-1")
+            .split("\r\n")
+            if line
+        )
+        offset += headers_len
+        return cls(
+            status=status,
+            etag=etag,
+            content_type=content_type,
+            body=value[offset:],
+            fresh_until=fresh_until,
+            gzip=gzip,
+            headers=headers,  # type: ignore[arg-type]
+        )
@@ -0,0 +1,187 @@
+import heapq
+import time
+from collections import OrderedDict
+from typing import Any
+
+# Rough per-entry cost of the key, the tuple and the dict slot
+ENTRY_OVERHEAD = 100
+
+# Odd multipliers deriving the four row indexes of a key from its hash
+_SEED0, _SEED1, _SEED2, _SEED3 = 0x9E3779B1, 0x85EBCA77, 0xC2B2AE3D, 0x27D4EB2F
+_HALVE = bytes(count >> 1 for count in range(256))
+
+
+class FrequencySketch:
+    """
+    Count-min sketch of recent key popularity with 4-bit counters.
+
+    All counters are halved once width * 10 increments were recorded, so the
+    estimates follow changes in popularity.
+    """
+
+    def __init__(self, width: int):
+        self.width = 1 << max(width - 1, 15).bit_length()
+        self._mask = self.width - 1
+        self._rows = [bytearray(self.width) for _ in range(4)]
+        self._additions = 0
+        self._sample_size = self.width * 10
+
+    def increment(self, key: str) -> None:
+        h, mask = hash(key), self._mask
+        row0, row1, row2, row3 = self._rows
+        i = (h * _SEED0 >> 16) & mask
+        if row0[i] < 15:
+            row0[i] += 1
+        i = (h * _SEED1 >> 16) & mask
+        if row1[i] < 15:
+            row1[i] += 1
+        i = (h * _SEED2 >> 16) & mask
+        if row2[i] < 15:
+            row2[i] += 1
+        i = (h * _SEED3 >> 16) & mask
+        if row3[i] < 15:
+            row3[i] += 1
+        self._additions += 1
+        if self._additions >= self._sample_size:
+            self._rows = [row.translate(_HALVE) for row in self._rows]
+            self._additions //= 2
+
+    def estimate(self, key: str) -> int:
+        h, mask = hash(key), self._mask
+        row0, row1, row2, row3 = self._rows
+        return min(
+            row0[(h * _SEED0 >> 16) & mask],
+            row1[(h * _SEED1 >> 16) & mask],
+            row2[(h * _SEED2 >> 16) & mask],
+            row3[(h * _SEED3 >> 16) & mask],
+        )
+
+
+class LRUCache:
+    """
+    Bounded in-process cache with per-entry expiry.
+
+    Evicts the least recently used entries once either the entry count or
+    the total size of keys and values exceeds its limit. Expiry times are
+    kept in a heap, so expired entries are dropped as writes come in without
+    ever scanning the whole cache. With tinylfu, a new key only displaces
+    the least recently used entry when it was requested more often lately,
+    which keeps one-off keys (crawlers, the warm-up walking every ilce) from
+    flushing the popular ones.
+
+    Reads never block: every operation is synchronous and the event loop
+    runs one at a time.
+    """
+
+    def __init__(self, max_entries: int, max_bytes: int, tinylfu: bool = False):
+        """
+        Args:
+            max_entries: Entries kept at most
+            max_bytes: Bytes of keys and values kept at most
+            tinylfu: Admit new keys based on their recent popularity
+        """
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.size = 0
+        self._entries: OrderedDict[str, tuple[bytes, float]] = OrderedDict()
+        self._expiry: list[tuple[float, str]] = []
+        self._sketch = FrequencySketch(max_entries) if tinylfu else None
+        self.metrics = {
+            "hits": 0,
+            "misses": 0,
+            "expired": 0,
+            "evictions": 0,
+            "rejections": 0,
+        }
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> bytes | None:
+        if self._sketch is not None:
+            self._sketch.increment(key)
+
+        item = self._entries.get(key)
+        if item is None:
+            self.metrics["misses"] += 1
+            return None
+
+        value, expires = item
+        if expires <= time.monotonic():
+            self.delete(key)
+            self.metrics["expired"] += 1
+            self.metrics["misses"] += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.metrics["hits"] += 1
+        return value
+
+    def set(self, key: str, value: bytes, timeout: float) -> None:
+        now = time.monotonic()
+        self._drop_expired(now)
+
+        cost = _cost(key, value)
+        is_new = key not in self._entries
+        self.delete(key)
+        if timeout <= 0 or cost > self.max_bytes:
+            return
+        if is_new and not self._admit(key, cost):
+            self.metrics["rejections"] += 1
+            return
+
+        expires = now + timeout
+        self._entries[key] = (value, expires)
+        self.size += cost
+        heapq.heappush(self._expiry, (expires, key))
+        while len(self._entries) > self.max_entries or self.size > self.max_bytes:
+            evicted, (evicted_value, _) = self._entries.popitem(last=False)
+            self.size -= _cost(evicted, evicted_value)
+            self.metrics["evictions"] += 1
+
+        # Replaced and evicted entries leave their expiry behind, rebuild the
+        # heap before it outgrows the cache
+        if len(self._expiry) > 2 * len(self._entries) + 1024:
+            self._expiry = [(exp, k) for k, (_, exp) in self._entries.items()]
+            heapq.heapify(self._expiry)
+
+    def delete(self, key: str) -> None:
+        item = self._entries.pop(key, None)
+        if item is not None:
+            self.size -= _cost(key, item[0])
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self._expiry.clear()
+        self.size = 0
+
+    def get_metrics(self) -> dict[str, Any]:
+        lookups = self.metrics["hits"] + self.metrics["misses"]
+        return {
+            **self.metrics,
+            "hit_ratio": round(self.metrics["hits"] / lookups, 3) if lookups else None,
+            "entries": len(self._entries),
+            "bytes": self.size,
+        }
+
+    def _drop_expired(self, now: float) -> None:
+        expiry = self._expiry
+        while expiry and expiry[0][0] <= now:
+            expires, key = heapq.heappop(expiry)
+            item = self._entries.get(key)
+            # Skip heap items left behind by replaced or evicted entries
+            if item is not None and item[1] == expires:
+                self.delete(key)
+                self.metrics["expired"] += 1
+
+    def _admit(self, key: str, cost: int) -> bool:
+        if self._sketch is None or not self._entries:
+            return True
+        if len(self._entries) < self.max_entries and self.size + cost <= self.max_bytes:
+            return True
+        victim = next(iter(self._entries))
+        return self._sketch.estimate(key) > self._sketch.estimate(victim)
+
+
+def _cost(key: str, value: bytes) -> int:
+    return len(key) + len(value) + ENTRY_OVERHEAD
@@ -1,8 +1,18 @@
 import logging
+from contextlib import AbstractAsyncContextManager
+from datetime import datetime, time, timedelta
+from functools import lru_cache
+from typing import Any
 
 from fastapi import Request
 
-from app.infrastructure.cache.backends import InMemoryCacheBackend, RedisCacheBackend
+from app.core.config import get_settings
+from app.infrastructure.cache.backends import (
+    InMemoryCacheBackend,
+    RedisCacheBackend,
+    TieredCacheBackend,
+)
+from app.infrastructure.cache.lru import LRUCache
 
 logger = logging.getLogger(__name__)
 
@@ -15,6 +25,12 @@ class CacheService:
         cache_type: str,
         default_timeout: int,
         redis_url: str = "redis://localhost:6379/0",
+        local_ttl: int = 0,
+        local_max_entries: int = 10_000,
+        local_max_bytes: int = 64 * 1024 * 1024,
+        memory_max_entries: int = 100_000,
+        memory_max_bytes: int = 256 * 1024 * 1024,
+        memory_policy: str = "lru",
     ):
         """
         Initialize the cache service.
@@ -23,26 +39,98 @@ class CacheService:
             cache_type: Type of cache - "redis" or "memory"
             default_timeout: Default cache expiry time in seconds
             redis_url: Redis connection URL when using Redis cache
+            local_ttl: Seconds Redis entries are also kept in this process
+                (0 disables the local tier)
+            local_max_entries: Entries kept in this process at most
+            local_max_bytes: Bytes kept in this process at most
+            memory_max_entries: Entries kept at most by the in-memory cache
+            memory_max_bytes: Bytes kept at most by the in-memory cache
+            memory_policy: Eviction policy of the in-memory cache and the
+                local tier - "lru" or "tinylfu"
         """
         self.default_timeout = default_timeout
+        tinylfu = memory_policy.lower() == "tinylfu"
 
         if cache_type.lower() == "redis":
             logger.info(f"Using Redis cache backend with URL: {redis_url}")
             self.backend = RedisCacheBackend(redis_url)
+            if local_ttl > 0:
+                logger.info(f"Keeping Redis entries locally for {local_ttl}s")
+                self.backend = TieredCacheBackend(
+                    self.backend,
+                    LRUCache(local_max_entries, local_max_bytes, tinylfu=tinylfu),
+                    local_ttl,
+                )
         else:
             logger.info("Using in-memory cache backend")
-            self.backend = InMemoryCacheBackend()
+            self.backend = InMemoryCacheBackend(
+                memory_max_entries, memory_max_bytes, tinylfu=tinylfu
+            )
 
-    async def get(self, key: str) -> str | None:
+    async def get(self, key: str) -> bytes | None:
         """Get cached value by key."""
         return await self.backend.get(key)
 
-    async def set(self, key: str, value: str, timeout: int | None = None) -> None:
+    async def get_many(self, keys: list[str]) -> list[bytes | None]:
+        """Get cached values of several keys in one round trip."""
+        return await self.backend.get_many(keys)
+
+    async def set(
+        self, key: str, value: bytes | str, timeout: int | None = None
+    ) -> None:
         """Set value in cache with timeout."""
         await self.backend.set(
             key, value, self.default_timeout if timeout is None else timeout
         )
 
+    async def increment(
+        self, key: str, counts: dict[str, int], timeout: int | None = None
+    ) -> None:
+        """Add to the counters of a key, atomically across workers."""
+        await self.backend.increment(
+            key, counts, self.default_timeout if timeout is None else timeout
+        )
+
+    async def get_counts(self, key: str) -> dict[str, int]:
+        """Counters of a key, empty if there are none."""
+        return await self.backend.get_counts(key)
+
+    def lock(
+        self, key: str, timeout: int, blocking: bool = True
+    ) -> AbstractAsyncContextManager[bool]:
+        """
+        Lock held across workers (no-op for the in-memory backend).
+
+        Yields whether the lock was acquired; a blocking lock waits up to
+        timeout, then proceeds without it.
+        """
+        return self.backend.lock(key, timeout, blocking)
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Counters of the backend, such as local hits and misses."""
+        return self.backend.get_metrics()
+
+    async def close(self) -> None:
+        """Release the backend's connections and background tasks."""
+        await self.backend.close()
+
+
+@lru_cache
+def get_cache_service() -> CacheService:
+    """Returns the cache service shared by the middleware and the routes."""
+    settings = get_settings()
+    return CacheService(
+        cache_type=settings.cache_type,
+        default_timeout=settings.cache_default_timeout,
+        redis_url=settings.redis_url,
+        local_ttl=settings.cache_local_ttl,
+        local_max_entries=settings.cache_local_max_entries,
+        local_max_bytes=settings.cache_local_max_bytes,
+        memory_max_entries=settings.cache_memory_max_entries,
+        memory_max_bytes=settings.cache_memory_max_bytes,
+        memory_policy=settings.cache_memory_policy,
+    )
+
 
 def generate_cache_key(request: Request) -> str:
     """Generate a cache key from request information."""
@@ -56,5 +144,11 @@ def custom_cache_timeout(path: str, default_timeout: int) -> int:
     if any(path.startswith(prefix) for prefix in ["/ulkeler", "/sehirler", "/ilceler"]):
         return 15 * 24 * 60 * 60  # 15 days
 
-    # All other paths (including /vakitler) use the default timeout (5 days)
+    # Prayer times are served from today on, so the response changes at midnight
+    if path.startswith("/vakitler"):
+        now = datetime.now()
+        midnight = datetime.combine(now.date() + timedelta(days=1), time.min)
+        return min(default_timeout, max(int((midnight - now).total_seconds()), 1))
+
+    # All other paths use the default timeout (5 days)
     return default_timeout
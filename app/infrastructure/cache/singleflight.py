@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from collections.abc import Awaitable, Callable
+from typing import Any
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce concurrent calls for the same key into a single execution."""
+
+    def __init__(self):
+        self._flights: dict[str, asyncio.Task] = {}
+        self.metrics = {"calls": 0, "executions": 0, "shared": 0}
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Run fn for key unless a call for the same key is already in flight.
+
+        Every caller waiting on the same key receives the same result (or
+        exception). The call runs in its own task, so a cancelled caller does
+        not cancel the work the other waiters depend on.
+
+        Args:
+            key: Identifies the work being coalesced
+            fn: Coroutine function performing the work
+
+        Returns:
+            The result of fn
+        """
+        self.metrics["calls"] += 1
+        task = self._flights.get(key)
+        if task is None:
+            self.metrics["executions"] += 1
+            task = asyncio.ensure_future(fn())
+            self._flights[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+        else:
+            self.metrics["shared"] += 1
+            logger.debug(f"Joining in-flight call for {key}")
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task) -> None:
+        if self._flights.get(key) is task:
+            del self._flights[key]
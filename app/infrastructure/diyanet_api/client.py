@@ -1,4 +1,6 @@
+import importlib.util
 import logging
+from typing import Any
 
 import httpx
 from fastapi import HTTPException
@@ -12,7 +14,15 @@ class ApiClient:
     """Client for accessing the Diyanet Namaz Vakti API."""
 
     def __init__(
-        self, api_url: str, api_username: str, api_password: str, timeout: int = 30
+        self,
+        api_url: str,
+        api_username: str,
+        api_password: str,
+        timeout: int = 30,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        keepalive_expiry: float = 30.0,
+        http2: bool = False,
     ):
         """
         Initialize the API client.
@@ -22,11 +32,79 @@ class ApiClient:
             api_username: API username
             api_password: API password
             timeout: Request timeout in seconds
+            max_connections: Upper bound of concurrent upstream connections
+            max_keepalive_connections: Idle connections kept open for reuse
+            keepalive_expiry: Seconds an idle connection is kept open
+            http2: Negotiate HTTP/2 with the upstream (requires the h2 package)
         """
         self.api_username = api_username
         self.api_password = api_password
         self.api_url = api_url
         self.timeout = timeout
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry,
+        )
+        self.http2 = http2
+        if http2 and importlib.util.find_spec("h2") is None:
+            logger.warning("HTTP/2 requested but the h2 package is missing")
+            self.http2 = False
+
+        self._client: httpx.AsyncClient | None = None
+        self.metrics = {
+            "requests": 0,
+            "in_flight": 0,
+            "max_in_flight": 0,
+            "connections_opened": 0,
+            "errors": 0,
+        }
+
+    async def open(self) -> None:
+        """Open the shared connection pool (called from the app lifespan)."""
+        if self._client is not None:
+            return
+
+        self._client = httpx.AsyncClient(
+            auth=httpx.BasicAuth(
+                username=self.api_username, password=self.api_password
+            ),
+            timeout=self.timeout,
+            limits=self.limits,
+            http2=self.http2,
+            headers={
+                "Accept-Encoding": "gzip",
+                "Connection": "Keep-Alive",
+                "Host": "namazvakti.diyanet.gov.tr",
+                "User-Agent": "okhttp/5.0.0-alpha.3",
+            },
+        )
+        logger.info(f"Opened Diyanet API connection pool (http2={self.http2})")
+
+    async def close(self) -> None:
+        """Close the shared connection pool and its idle connections."""
+        if self._client is None:
+            return
+
+        await self._client.aclose()
+        self._client = None
+        logger.info(f"Closed Diyanet API connection pool: {self.get_metrics()}")
+
+    def get_metrics(self) -> dict[str, Any]:
+        """Return connection pool usage and reuse counters."""
+        requests = self.metrics["requests"]
+        reused = max(requests - self.metrics["connections_opened"], 0)
+        return {
+            **self.metrics,
+            "connections_reused": reused,
+            "reuse_ratio": round(reused / requests, 3) if requests else 0.0,
+            "http2": self.http2,
+        }
+
+    async def _trace(self, event: str, info: dict[str, Any]) -> None:
+        # httpcore emits this once per newly established connection
+        if event == "connection.connect_tcp.started":
+            self.metrics["connections_opened"] += 1
 
     async def get_monthly_prayer_times(self, ilce_id: str) -> ExternalApiResponse:
         """
@@ -44,45 +122,50 @@ class ApiClient:
         url = f"{self.api_url}/NamazVakti/Aylik"
         params = {"ilceId": ilce_id}
 
-        headers = {
-            "Accept-Encoding": "gzip",
-            "Connection": "Keep-Alive",
-            "Host": "namazvakti.diyanet.gov.tr",
-            "User-Agent": "okhttp/5.0.0-alpha.3",
-        }
-
-        auth = httpx.BasicAuth(username=self.api_username, password=self.api_password)
+        if self._client is None:
+            await self.open()
+        assert self._client is not None
 
+        metrics = self.metrics
+        metrics["requests"] += 1
+        metrics["in_flight"] += 1
+        metrics["max_in_flight"] = max(metrics["max_in_flight"], metrics["in_flight"])
         try:
             logger.debug(f"Requesting prayer times for ilceID: {ilce_id}")
-            async with httpx.AsyncClient(auth=auth, timeout=self.timeout) as client:
-                response = await client.get(url, params=params, headers=headers)
-                response.raise_for_status()
-
-                # Parse the response into our model
-                try:
-                    data = response.json()
-                    logger.debug("Successfully received API response")
-                    return ExternalApiResponse.model_validate(data)
-                except ValueError as e:
-                    logger.error(f"Failed to parse API response: {e}")
-                    raise HTTPException(
-                        status_code=500, detail="Failed to parse Diyanet API response"
-                    ) from e
-                except Exception as e:
-                    logger.error(f"Unexpected error processing API response: {e}")
-                    raise HTTPException(
-                        status_code=500, detail="Error processing API response"
-                    ) from e
+            response = await self._client.get(
+                url, params=params, extensions={"trace": self._trace}
+            )
+            response.raise_for_status()
+
+            # Parse the response into our model
+            try:
+                # Decode and validate straight from the raw bytes in one pass
+                api_response = ExternalApiResponse.model_validate_json(response.content)
+                logger.debug("Successfully received API response")
+                return api_response
+            except ValueError as e:
+                logger.error(f"Failed to parse API response: {e}")
+                raise HTTPException(
+                    status_code=500, detail="Failed to parse Diyanet API response"
+                ) from e
+            except Exception as e:
+                logger.error(f"Unexpected error processing API response: {e}")
+                raise HTTPException(
+                    status_code=500, detail="Error processing API response"
+                ) from e
 
         except httpx.HTTPStatusError as e:
+            metrics["errors"] += 1
             r = e.response
             logger.exception(f"HTTP error from Diyanet API: {r.status_code} - {r.text}")
             raise HTTPException(
                 status_code=r.status_code, detail=f"Diyanet API error: {r.text}"
             ) from e
         except httpx.RequestError as e:
+            metrics["errors"] += 1
             logger.error(f"Request error to Diyanet API: {str(e)}")
             raise HTTPException(
                 status_code=503, detail="Unable to connect to Diyanet API"
             ) from e
+        finally:
+            metrics["in_flight"] -= 1
@@ -1,29 +1,81 @@
-from fastapi import FastAPI, Request
+import asyncio
+import contextlib
+import logging
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.middleware.gzip import GZipMiddleware
 from requests.exceptions import RequestException
 
 from app.core.config import get_settings
 from app.core.errors import diyanet_exception_handler
-from app.infrastructure.cache.service import CacheService, custom_cache_timeout
+from app.infrastructure.cache.service import get_cache_service
 from app.middleware.cache import CacheMiddleware
-from app.routes import router
+from app.middleware.gzip import GZipMiddleware
+from app.middleware.hits import HitCounterMiddleware
+from app.routes import api_client, catalog, prayer_times, router, warmup
+
+logger = logging.getLogger(__name__)
 
 settings = get_settings()
 
+STATIC_LOCATION_PATHS = ["/ulkeler", "/sehirler", "/ilceler", "/lookup"]
+
+# Answered from in-memory indexes; their query strings are too varied to cache
+INDEXED_PATHS = ["/ara", "/yakin"]
+
+# Streamed as each part completes, buffering them for the cache would defeat that
+STREAMED_PATHS = ["/vakitler/sehir"]
+
+# Change at midnight; answered from the prayer times held per ilce, a cached
+# copy could be served stale into the next day
+DAILY_PATH_SUFFIXES = ["/bugun"]
+
+# Date ranges are sliced from the prayer times held per ilce, caching every
+# range on top of them would only multiply the entries
+SLICE_QUERY_PARAMS = ["tarih", "baslangic", "bitis"]
+
+# Responses from this size on are gzipped, on the fly or once in the cache
+GZIP_MINIMUM_SIZE = 500
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Load the static location data once so requests never touch the disk
+    catalog.load()
+    if settings.static_preserialized:
+        catalog.prepare()
+
+    await api_client.open()
+    warmup_task = None
+    if settings.warmup_on_startup:
+        warmup_task = asyncio.create_task(warmup.run_forever())
+    try:
+        yield
+    finally:
+        if warmup_task is not None:
+            warmup_task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await warmup_task
+        try:
+            # Keep this worker's hit counts to rank the next warm-up
+            await warmup.save_popularity()
+        except Exception:
+            logger.exception("Could not save ilce popularity")
+        await api_client.close()
+        await get_cache_service().close()
+
+
 app = FastAPI(
     title=settings.api_title,
     description=settings.api_description,
     summary="Diyanet İşleri Başkanlığı tarafından yayınlanan ezan vakitlerini sağlar.",
     version=settings.api_version,
+    lifespan=lifespan,
 )
 
 # Initialize cache service
-cache_service = CacheService(
-    cache_type=settings.cache_type,
-    default_timeout=settings.cache_default_timeout,
-    redis_url=settings.redis_url,
-)
+cache_service = get_cache_service()
 
 # Add middleware in order (order matters for middleware)
 # Cache middleware should be before GZip to cache uncompressed responses
@@ -33,41 +85,31 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Link", "X-Total-Count"],
 )
+# Pre-serialized location responses are already in memory, skip the cache for them
+cache_excluded_paths = [
+    *settings.cache_excluded_paths,
+    *INDEXED_PATHS,
+    *STREAMED_PATHS,
+]
+if settings.static_preserialized:
+    cache_excluded_paths = [*cache_excluded_paths, *STATIC_LOCATION_PATHS]
+
 app.add_middleware(
     CacheMiddleware,  # type: ignore
     cache_service=cache_service,
-    excluded_paths=settings.cache_excluded_paths,
+    excluded_paths=cache_excluded_paths,
+    excluded_path_suffixes=DAILY_PATH_SUFFIXES,
+    cache_control_excluded_paths=settings.cache_excluded_paths,
+    excluded_query_params=SLICE_QUERY_PARAMS,
+    stale_while_revalidate=settings.cache_stale_while_revalidate,
+    stale_if_error=settings.cache_stale_if_error,
+    compress_min_size=GZIP_MINIMUM_SIZE,
 )
-app.add_middleware(GZipMiddleware, minimum_size=500)  # type: ignore[arg-type]
-
-
-@app.middleware("http")
-async def add_cache_control_header(request: Request, call_next):
-    response = await call_next(request)
-
-    # Add Cache-Control header for GET requests to relevant endpoints
-    if request.method == "GET" and not any(
-        request.url.path.startswith(path) for path in settings.cache_excluded_paths
-    ):
-        # Calculate appropriate timeout for this path
-        path_timeout = custom_cache_timeout(
-            request.url.path, settings.cache_default_timeout
-        )
-        response.headers["Cache-Control"] = f"public, max-age={path_timeout}"
-
-    return response
-
-
-@app.middleware("http")
-async def set_utf8_charset(request: Request, call_next):
-    response = await call_next(request)
-
-    # Ensure JSON responses include UTF-8 charset for non-ASCII characters
-    if response.headers.get("content-type") == "application/json":
-        response.headers["content-type"] = "application/json; charset=utf-8"
-
-    return response
+# Outside the cache, so requests answered from it still count as demand
+app.add_middleware(HitCounterMiddleware, hits=prayer_times.hits)  # type: ignore[arg-type]
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)  # type: ignore[arg-type]
 
 
 app.include_router(router)
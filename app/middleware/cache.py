@@ -1,134 +1,432 @@
-import hashlib
-import json
+import asyncio
+import gzip
 import logging
-from collections.abc import Callable
+import time
+from typing import Any
+from urllib.parse import parse_qsl
 
-from fastapi import Request, Response
-from starlette.middleware.base import BaseHTTPMiddleware
-from starlette.responses import JSONResponse
-from starlette.responses import Response as StarletteResponse
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.requests import Request
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+from app.infrastructure.cache.entry import CacheEntry
 from app.infrastructure.cache.service import (
     CacheService,
     custom_cache_timeout,
     generate_cache_key,
 )
+from app.utils import etag_matches, make_etag, preferred_encoding
 
 logger = logging.getLogger(__name__)
 
+# Headers kept in the fixed part of a cache entry or recomputed on a hit
+_ENTRY_HEADERS = {"content-type", "content-length", "content-encoding", "etag"}
+
+
+class CacheMiddleware:
+    """
+    Pure ASGI layer caching JSON responses and setting the response headers.
+
+    Successful JSON responses to GET/HEAD requests are cached with an ETag
+    and tagged with X-Cache. The ETag is also kept under a small key of its
+    own, so conditional requests are answered without loading the body.
+    Every GET response outside the excluded paths gets a Cache-Control
+    header matching its cache timeout (max-age=0 plus the stale windows when
+    served stale), and bare application/json content types get an explicit
+    UTF-8 charset.
+    """
 
-class CacheMiddleware(BaseHTTPMiddleware):
     def __init__(
         self,
-        app,
+        app: ASGIApp,
         cache_service: CacheService,
         excluded_paths: list[str] | None = None,
+        excluded_path_suffixes: list[str] | None = None,
+        cache_control_excluded_paths: list[str] | None = None,
+        excluded_query_params: list[str] | None = None,
+        stale_while_revalidate: int = 0,
+        stale_if_error: int = 0,
+        compress_min_size: int | None = None,
     ):
-        super().__init__(app)
+        """
+        Args:
+            app: The downstream ASGI application
+            cache_service: Cache storing the responses
+            excluded_paths: Path prefixes never cached
+            excluded_path_suffixes: Path suffixes never cached
+            cache_control_excluded_paths: Path prefixes never given a
+                Cache-Control header (defaults to excluded_paths)
+            excluded_query_params: Requests with any of these query parameters
+                are never cached
+            stale_while_revalidate: Seconds past its timeout an entry is still
+                served while it is refreshed in the background
+            stale_if_error: Further seconds an entry is kept to be served when
+                the refresh fails with a server error
+            compress_min_size: Bodies from this size on are stored gzipped and
+                sent as is to clients accepting gzip (None stores them as is)
+        """
+        self.app = app
         self.cache_service = cache_service
-        self.excluded_paths = excluded_paths or ["/up"]
+        self.excluded_paths = tuple(excluded_paths or ["/up"])
+        self.excluded_path_suffixes = tuple(excluded_path_suffixes or ())
+        self.cache_control_excluded_paths = (
+            tuple(cache_control_excluded_paths)
+            if cache_control_excluded_paths is not None
+            else self.excluded_paths
+        )
+        self.excluded_query_params = frozenset(excluded_query_params or ())
+        self.stale_while_revalidate = stale_while_revalidate
+        self.stale_if_error = stale_if_error
+        self.compress_min_size = compress_min_size
+        # Already stale here: clients may only reuse it within the same windows
+        stale_cache_control = ["public", "max-age=0"]
+        if stale_while_revalidate:
+            stale_cache_control.append(
+                f"stale-while-revalidate={stale_while_revalidate}"
+            )
+        if stale_if_error:
+            stale_cache_control.append(f"stale-if-error={stale_if_error}")
+        self._stale_cache_control = ", ".join(stale_cache_control)
+        self._revalidating: dict[str, asyncio.Task] = {}
 
-    def generate_etag(self, content: str) -> str:
+    def generate_etag(self, content: bytes) -> str:
         """Generate an ETag for the given content."""
-        return hashlib.md5(content.encode()).hexdigest()
+        return make_etag(content)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        path = scope["path"]
+        send = self._with_headers(method, path, send)
 
-    async def dispatch(self, request: Request, call_next: Callable) -> Response:
         # Skip caching for excluded paths or non-GET/HEAD requests
-        if request.method not in ("GET", "HEAD") or any(
-            request.url.path.startswith(path) for path in self.excluded_paths
+        if (
+            method not in ("GET", "HEAD")
+            or path.startswith(self.excluded_paths)
+            or path.endswith(self.excluded_path_suffixes)
+            or self._has_excluded_param(scope)
         ):
-            return await call_next(request)
+            await self.app(scope, receive, send)
+            return
 
-        # Generate cache key from request
+        request = Request(scope)
         cache_key = generate_cache_key(request)
 
+        # Revalidations are answered from the small ETag index, without
+        # loading the body
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match and await self._not_modified(
+            scope, send, cache_key, if_none_match
+        ):
+            return
+
         # Try to get from cache
         cached_response = await self.cache_service.get(cache_key)
-        if cached_response:
-            logger.debug(f"Cache hit for {request.url.path}")
-            cached_data = json.loads(cached_response)
-
-            # Recreate the response from cached data
-            content = cached_data["content"]
-            status_code = cached_data["status_code"]
-            headers = cached_data["headers"]
-
-            # Generate ETag
-            etag = cached_data.get("etag") or self.generate_etag(json.dumps(content))
-
-            # Check if client sent If-None-Match header
-            if_none_match = request.headers.get("If-None-Match")
-            if if_none_match and if_none_match == etag:
-                # Return 304 Not Modified if ETags match
-                response = StarletteResponse(status_code=304)
-                response.headers["ETag"] = etag
-                return response
-
-            # Create normal response with content
-            response = JSONResponse(content=content, status_code=status_code)
-
-            # Apply headers from cached response
-            for key, value in headers.items():
-                if key.lower() not in ("content-length", "content-encoding"):
-                    response.headers[key] = value
-
-            # Set ETag header
-            response.headers["ETag"] = etag
-            # Set cache header to indicate a cache hit
-            response.headers["X-Cache"] = "HIT"
-            return response
-
-        # Process the request if not in cache
-        response = await call_next(request)
-
-        # Only cache successful JSON responses
-        if (
-            hasattr(response, "status_code")
-            and response.status_code == 200
-            and response.headers.get("content-type", "").startswith("application/json")
+        entry = CacheEntry.loads(cached_response) if cached_response else None
+        if entry is None:
+            await self._call_and_store(scope, receive, send, cache_key)
+            return
+
+        x_cache = "HIT"
+        now = time.time()
+        fresh_until = entry.fresh_until
+        if now >= fresh_until + self.stale_while_revalidate:
+            # Past the hard TTL: refresh now, fall back to the stale entry
+            if await self._call_and_store(scope, receive, send, cache_key, stale=True):
+                return
+            logger.warning(f"Serving stale {path} after upstream error")
+            x_cache = "STALE-IF-ERROR"
+        elif now >= fresh_until:
+            self._revalidate(scope, cache_key)
+            x_cache = "STALE"
+
+        logger.debug(f"Cache {x_cache.lower()} for {path}")
+        await self._send_cached(request, send, entry, x_cache)
+
+    def _has_excluded_param(self, scope: Scope) -> bool:
+        query_string = scope.get("query_string")
+        if not self.excluded_query_params or not query_string:
+            return False
+        return any(
+            name in self.excluded_query_params
+            for name, _ in parse_qsl(query_string.decode("latin-1"))
+        )
+
+    async def _not_modified(
+        self, scope: Scope, send: Send, cache_key: str, if_none_match: str
+    ) -> bool:
+        """
+        Answer 304 Not Modified if the client has the cached version.
+
+        Returns:
+            False if there is no usable ETag to compare with, or it differs
+        """
+        value = await self.cache_service.get(f"etag:{cache_key}")
+        if not value:
+            return False
+
+        fresh_until, _, etag = value.decode("latin-1").partition(" ")
+        now = time.time()
+        if now >= float(fresh_until) + self.stale_while_revalidate or not (
+            etag_matches(if_none_match, etag)
         ):
-            # Need to extract the response content for caching
-            response_body = b""
-
-            async for chunk in response.body_iterator:
-                response_body += chunk
-
-            # Reconstruct response for the client
-            response = Response(
-                content=response_body,
-                status_code=response.status_code,
-                headers=dict(response.headers),
-                media_type=response.media_type,
+            return False
+
+        x_cache = "HIT"
+        if now >= float(fresh_until):
+            self._revalidate(scope, cache_key)
+            x_cache = "STALE"
+        await self._send_not_modified(send, etag, x_cache)
+        return True
+
+    async def _send_not_modified(self, send: Send, etag: str, x_cache: str) -> None:
+        headers = MutableHeaders()
+        headers["ETag"] = etag
+        headers["X-Cache"] = x_cache
+        await send(
+            {"type": "http.response.start", "status": 304, "headers": headers.raw}
+        )
+        await send({"type": "http.response.body", "body": b""})
+
+    def _with_headers(self, method: str, path: str, send: Send) -> Send:
+        """Wrap send to add Cache-Control and the JSON charset to responses."""
+        cache_control = None
+        if method == "GET" and not path.startswith(self.cache_control_excluded_paths):
+            # Calculate appropriate timeout for this path
+            path_timeout = custom_cache_timeout(
+                path, self.cache_service.default_timeout
             )
+            cache_control = f"public, max-age={path_timeout}"
 
-            try:
-                # Parse the JSON content
-                json_content = json.loads(response_body)
+        async def send_with_headers(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(scope=message)
+                if cache_control is not None:
+                    if headers.get("x-cache", "").startswith("STALE"):
+                        headers["Cache-Control"] = self._stale_cache_control
+                    else:
+                        headers["Cache-Control"] = cache_control
+                # Ensure JSON responses include UTF-8 charset for non-ASCII text
+                if headers.get("content-type") == "application/json":
+                    headers["content-type"] = "application/json; charset=utf-8"
+            await send(message)
 
-                # Generate ETag for the response
-                etag = self.generate_etag(json.dumps(json_content))
-                response.headers["ETag"] = etag
+        return send_with_headers
 
-                # Get appropriate timeout for this path
-                path_timeout = custom_cache_timeout(
-                    request.url.path, self.cache_service.default_timeout
-                )
+    async def _call_and_store(
+        self,
+        scope: Scope,
+        receive: Receive,
+        send: Send,
+        cache_key: str,
+        stale: bool = False,
+    ) -> bool:
+        """
+        Run the downstream app, caching a successful JSON response.
 
-                # Store response in cache with the custom timeout
-                cache_data = {
-                    "content": json_content,
-                    "status_code": response.status_code,
-                    "headers": dict(response.headers),
-                    "etag": etag,
-                }
-                await self.cache_service.set(
-                    cache_key, json.dumps(cache_data), timeout=path_timeout
-                )
+        Cacheable responses are buffered to compute their ETag, anything else
+        (including bodies the app already encoded for this client) is streamed
+        through untouched.
 
-                # Add header to indicate this was a cache miss
-                response.headers["X-Cache"] = "MISS"
+        Args:
+            stale: A stale entry can stand in for a server error; such
+                responses are then dropped instead of sent
 
-            except Exception as e:
-                logger.error(f"Error caching response: {str(e)}")
+        Returns:
+            False if the response was dropped in favour of the stale entry
+        """
+        start: Message | None = None
+        chunks: list[bytes] = []
+        dropped = responded = False
 
-        return response
+        async def send_wrapper(message: Message) -> None:
+            nonlocal start, dropped, responded
+            if message["type"] == "http.response.start":
+                if stale and message["status"] >= 500:
+                    dropped = True
+                    return
+                if self._cacheable(message):
+                    start = message
+                    return
+                responded = True
+            elif message["type"] == "http.response.body":
+                if dropped:
+                    return
+                if start is not None:
+                    chunks.append(message.get("body", b""))
+                    if message.get("more_body", False):
+                        return
+                    await self._send_stored(scope, send, cache_key, start, chunks)
+                    return
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        except Exception:
+            # Nothing sent yet: fall back to the stale entry like a server error
+            if not stale or start is not None or responded:
+                raise
+            logger.exception(f"Refreshing {scope['path']} failed")
+            return False
+        return not dropped
+
+    @staticmethod
+    def _cacheable(start: Message) -> bool:
+        """Whether a response can be stored: a 200 with a plain JSON body."""
+        headers = Headers(raw=start.get("headers", []))
+        # An encoded body was negotiated for one client; the entry would lose
+        # its Content-Encoding and be served as is to every other client
+        return (
+            start.get("status") == 200
+            and headers.get("content-type", "").startswith("application/json")
+            and "content-encoding" not in headers
+        )
+
+    async def _send_stored(
+        self,
+        scope: Scope,
+        send: Send,
+        cache_key: str,
+        start: Message,
+        chunks: list[bytes],
+    ) -> None:
+        """Cache a buffered response and send it to the client."""
+        body = b"".join(chunks)
+        headers = MutableHeaders(scope=start)
+        try:
+            etag = await self._store(scope["path"], cache_key, body, headers)
+        except Exception as e:
+            logger.error(f"Error caching response: {str(e)}")
+            etag = self.generate_etag(body)
+        else:
+            # Add header to indicate this was a cache miss
+            headers["X-Cache"] = "MISS"
+        headers["ETag"] = etag
+
+        # The client may already have this version even though the cache was cold
+        if etag_matches(Headers(scope=scope).get("if-none-match"), etag):
+            await self._send_not_modified(send, etag, "MISS")
+            return
+
+        await send(start)
+        await send({"type": "http.response.body", "body": body})
+
+    async def _send_cached(
+        self,
+        request: Request,
+        send: Send,
+        entry: CacheEntry,
+        x_cache: str,
+    ) -> None:
+        """Send a response straight from the bytes of a cache entry."""
+        # Return 304 Not Modified if the client already has this version
+        if etag_matches(request.headers.get("if-none-match"), entry.etag):
+            await self._send_not_modified(send, entry.etag, x_cache)
+            return
+
+        headers = MutableHeaders()
+        headers["ETag"] = entry.etag
+        body = entry.body
+        for key, value in entry.headers:
+            headers.append(key, value)
+        headers["content-type"] = entry.content_type
+        if entry.gzip:
+            headers.add_vary_header("Accept-Encoding")
+            if preferred_encoding(request.headers.get("accept-encoding"), ("gzip",)):
+                # Already compressed: GZipMiddleware passes it through as is
+                headers["content-encoding"] = "gzip"
+            else:
+                body = gzip.decompress(body)
+        headers["content-length"] = str(len(body))
+        # Set cache header to indicate a cache hit (or a stale one)
+        headers["X-Cache"] = x_cache
+
+        await send(
+            {
+                "type": "http.response.start",
+                "status": entry.status,
+                "headers": headers.raw,
+            }
+        )
+        await send({"type": "http.response.body", "body": body})
+
+    async def _store(
+        self, path: str, cache_key: str, body: bytes, headers: Headers
+    ) -> str:
+        """Store a response body and its ETag in the cache, return the ETag."""
+        etag = self.generate_etag(body)
+
+        # Get appropriate timeout for this path, keeping the entry around for
+        # the stale windows on top of it
+        path_timeout = custom_cache_timeout(path, self.cache_service.default_timeout)
+        storage_timeout = path_timeout + self.stale_while_revalidate
+        storage_timeout += self.stale_if_error
+
+        fresh_until = time.time() + path_timeout
+        compress = (
+            self.compress_min_size is not None and len(body) >= self.compress_min_size
+        )
+        entry = CacheEntry(
+            status=200,
+            etag=etag,
+            content_type=headers["content-type"],
+            body=gzip.compress(body, mtime=0) if compress else body,
+            fresh_until=fresh_until,
+            gzip=compress,
+            headers=tuple(
+                (key, value)
+                for key, value in headers.items()
+                if key not in _ENTRY_HEADERS
+            ),
+        )
+
+        # Store response in cache with the custom timeout
+        await self.cache_service.set(cache_key, entry.dumps(), timeout=storage_timeout)
+        # Revalidations only need this much: "<fresh until> <etag>"
+        await self.cache_service.set(
+            f"etag:{cache_key}", f"{fresh_until} {etag}", timeout=storage_timeout
+        )
+        return etag
+
+    def _revalidate(self, scope: Scope, cache_key: str) -> None:
+        """Refresh a stale entry in the background, once per key per worker."""
+        if cache_key in self._revalidating:
+            return
+
+        task = asyncio.create_task(self._refresh(scope, cache_key))
+        self._revalidating[cache_key] = task
+        task.add_done_callback(lambda _: self._revalidating.pop(cache_key, None))
+
+    async def _refresh(self, scope: Scope, cache_key: str) -> None:
+        # Replay the request against the downstream app, outside of the client
+        # connection, and collect the response
+        scope = {**scope, "method": "GET"}
+        started: dict[str, Any] = {}
+        chunks: list[bytes] = []
+
+        async def receive() -> Message:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                started.update(message)
+            elif message["type"] == "http.response.body":
+                chunks.append(message.get("body", b""))
+
+        path = scope["path"]
+        try:
+            await self.app(scope, receive, send)
+            if not self._cacheable(started):
+                logger.warning(
+                    f"Background refresh of {path} returned "
+                    f"{started.get('status')}, keeping the stale entry"
+                )
+                return
+            headers = Headers(raw=started["headers"])
+            await self._store(path, cache_key, b"".join(chunks), headers)
+            logger.debug(f"Refreshed stale cache entry for {path}")
+        except Exception:
+            logger.exception(f"Background refresh of {path} failed")
@@ -0,0 +1,46 @@
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.middleware.gzip import GZipMiddleware as StarletteGZipMiddleware
+from starlette.middleware.gzip import GZipResponder, IdentityResponder
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.utils import preferred_encoding
+
+
+class GZipMiddleware(StarletteGZipMiddleware):
+    """
+    Starlette's GZipMiddleware, honouring q-values and sending each Vary once.
+
+    Starlette gzips whenever "gzip" appears in Accept-Encoding, even as
+    gzip;q=0, and appends Accept-Encoding to Vary on every response it looks
+    at, even when the app (a prepared or cached response) already listed it.
+    """
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        responder: ASGIApp
+        accept_encoding = Headers(scope=scope).get("accept-encoding")
+        # Only the arguments every supported Starlette version takes; the
+        # others keep their defaults, as this app never sets them
+        if preferred_encoding(accept_encoding, ("gzip",)):
+            responder = GZipResponder(
+                self.app, self.minimum_size, compresslevel=self.compresslevel
+            )
+        else:
+            responder = IdentityResponder(self.app, self.minimum_size)
+
+        async def send_vary_once(message: Message) -> None:
+            if message["type"] == "http.response.start":
+                headers = MutableHeaders(raw=list(message["headers"]))
+                if vary := ", ".join(headers.getlist("vary")):
+                    names: dict[str, str] = {}
+                    for name in vary.split(","):
+                        if name := name.strip():
+                            names.setdefault(name.lower(), name)
+                    headers["vary"] = ", ".join(names.values())
+                    message["headers"] = headers.raw
+            await send(message)
+
+        await responder(scope, receive, send_vary_once)
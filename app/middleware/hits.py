@@ -0,0 +1,46 @@
+import re
+from collections import Counter
+from urllib.parse import parse_qsl
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# /vakitler/{ilce} and /vakitler/{ilce}/bugun; /vakitler?ilce= is read below
+_VAKITLER_PATH = re.compile(r"/vakitler/(\d+)(?:/bugun)?")
+
+
+class HitCounterMiddleware:
+    """
+    Pure ASGI layer counting prayer time requests per ilce.
+
+    Sits in front of the response cache, so cache hits are counted too and
+    the counts follow demand rather than cache misses. The counts rank the
+    ilces of the next warm-up.
+    """
+
+    def __init__(self, app: ASGIApp, hits: Counter[int]):
+        """
+        Args:
+            app: The downstream ASGI application
+            hits: Requests per IlceID, incremented in place
+        """
+        self.app = app
+        self.hits = hits
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] == "http" and scope["method"] in ("GET", "HEAD"):
+            ilce = self._ilce(scope)
+            if ilce is not None:
+                self.hits[ilce] += 1
+        await self.app(scope, receive, send)
+
+    @staticmethod
+    def _ilce(scope: Scope) -> int | None:
+        path = scope["path"]
+        if match := _VAKITLER_PATH.fullmatch(path):
+            return int(match[1])
+        if path == "/vakitler":
+            query = parse_qsl(scope.get("query_string", b"").decode("latin-1"))
+            ilce = dict(query).get("ilce", "")
+            if ilce.isdigit():
+                return int(ilce)
+        return None
@@ -0,0 +1,177 @@
+import json
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from datetime import date
+from typing import Self
+
+from app.models.domain import Vakit
+
+# Vakit fields holding an "HH:MM" time, stored as minutes since midnight
+TIME_FIELDS = (
+    "Imsak",
+    "Gunes",
+    "Ogle",
+    "Ikindi",
+    "Aksam",
+    "Yatsi",
+    "GunesDogus",
+    "GunesBatis",
+    "KibleSaati",
+)
+
+# Vakit fields that only depend on the date, shared by every ilce
+LABEL_FIELDS = (
+    "HicriTarihKisa",
+    "HicriTarihUzun",
+    "AyinSekliURL",
+    "MiladiTarihKisa",
+    "MiladiTarihUzun",
+    "MiladiTarihUzunIso8601",
+)
+
+_TIME_STRINGS = [f"{minutes // 60:02d}:{minutes % 60:02d}" for minutes in range(1440)]
+_LABELS: dict[tuple[str, ...], tuple[str, ...]] = {}
+
+
+def _to_minutes(hhmm: str) -> int:
+    return int(hhmm[:2]) * 60 + int(hhmm[3:5])
+
+
+def _to_hhmm(minutes: int) -> str:
+    if minutes < 1440:
+        return _TIME_STRINGS[minutes]
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def _shared_labels(labels: tuple[str, ...]) -> tuple[str, ...]:
+    # Every ilce has the same labels for a given date: keep one tuple per date
+    shared = _LABELS.get(labels)
+    if shared is None:
+        shared = tuple(sys.intern(label) for label in labels)
+        _LABELS[shared] = shared
+    return shared
+
+
+class PrayerDays:
+    """
+    Prayer times of one ilce stored column-wise.
+
+    Days are kept sorted as date ordinals, the nine daily times as minutes
+    since midnight in one flat array, and the date labels (hijri dates, moon
+    image URL, long dates) as tuples shared by every ilce. The Vakit shape
+    is only rebuilt when a response is serialized.
+    """
+
+    __slots__ = ("fetched_on", "ordinals", "times", "labels")
+
+    def __init__(
+        self,
+        fetched_on: date | None = None,
+        ordinals: array | None = None,
+        times: array | None = None,
+        labels: list[tuple[str, ...]] | None = None,
+    ):
+        self.fetched_on = fetched_on
+        self.ordinals = ordinals if ordinals is not None else array("l")
+        self.times = times if times is not None else array("H")
+        self.labels = labels if labels is not None else []
+
+    def __len__(self) -> int:
+        return len(self.ordinals)
+
+    def __contains__(self, day: date) -> bool:
+        return day.toordinal() in self.ordinals
+
+    @property
+    def last_day(self) -> date | None:
+        return date.fromordinal(self.ordinals[-1]) if self.ordinals else None
+
+    @classmethod
+    def from_vakitler(cls, vakitler: list[Vakit], fetched_on: date) -> Self:
+        """Build the compact form of a list of Vakit."""
+        days = cls(fetched_on=fetched_on)
+        for vakit in sorted(vakitler, key=lambda v: v.MiladiTarihUzunIso8601):
+            day = date.fromisoformat(vakit.MiladiTarihUzunIso8601[:10])
+            days.ordinals.append(day.toordinal())
+            days.times.extend(_to_minutes(getattr(vakit, f)) for f in TIME_FIELDS)
+            days.labels.append(
+                _shared_labels(tuple(getattr(vakit, f) for f in LABEL_FIELDS))
+            )
+        return days
+
+    def merge(self, newer: Self, since: date) -> Self:
+        """Combine with newer days, dropping the days before since."""
+        start = since.toordinal()
+        rows = {
+            ordinal: (self.times[i * 9 : i * 9 + 9], self.labels[i])
+            for i, ordinal in enumerate(self.ordinals)
+            if ordinal >= start
+        }
+        rows.update(
+            (ordinal, (newer.times[i * 9 : i * 9 + 9], newer.labels[i]))
+            for i, ordinal in enumerate(newer.ordinals)
+        )
+
+        merged = type(self)(fetched_on=newer.fetched_on)
+        for ordinal in sorted(rows):
+            times, labels = rows[ordinal]
+            merged.ordinals.append(ordinal)
+            merged.times.extend(times)
+            merged.labels.append(labels)
+        return merged
+
+    def to_vakitler(self, since: date, until: date | None = None) -> list[Vakit]:
+        """Rebuild the Vakit list served by the API from since on (until included)."""
+        start = bisect_left(self.ordinals, since.toordinal())
+        end = (
+            len(self.ordinals)
+            if until is None
+            else bisect_right(self.ordinals, until.toordinal())
+        )
+        vakitler = []
+        for i in range(start, end):
+            fields = dict(zip(LABEL_FIELDS, self.labels[i], strict=True))
+            fields.update(
+                zip(
+                    TIME_FIELDS,
+                    map(_to_hhmm, self.times[i * 9 : i * 9 + 9]),
+                    strict=True,
+                )
+            )
+            vakitler.append(
+                Vakit.model_construct(
+                    **fields,
+                    HicriTarihKisaIso8601=None,  # Keep it for backward compatibility
+                    HicriTarihUzunIso8601=None,  # Keep it for backward compatibility
+                    MiladiTarihKisaIso8601=fields["MiladiTarihKisa"],
+                    GreenwichOrtalamaZamani=3.0,  # Keep it for backward compatibility
+                )
+            )
+        return vakitler
+
+    def dumps(self) -> str:
+        """Serialize for the cache."""
+        return json.dumps(
+            {
+                "fetched_on": self.fetched_on.isoformat() if self.fetched_on else None,
+                "ordinals": self.ordinals.tolist(),
+                "times": self.times.tolist(),
+                "labels": self.labels,
+            },
+            ensure_ascii=False,
+            separators=(",", ":"),
+        )
+
+    @classmethod
+    def loads(cls, value: str | bytes) -> Self:
+        """Deserialize a value written by dumps."""
+        data = json.loads(value)
+        return cls(
+            fetched_on=date.fromisoformat(data["fetched_on"])
+            if data["fetched_on"]
+            else None,
+            ordinals=array("l", data["ordinals"]),
+            times=array("H", data["times"]),
+            labels=[_shared_labels(tuple(labels)) for labels in data["labels"]],
+        )
@@ -58,3 +58,9 @@ class Lookup(BaseModel):
     IlceID: str
     lat: float
     lon: float
+
+
+class Yakin(Lookup):
+    """Nearby district model, distance from the requested point."""
+
+    Mesafe: float  # km
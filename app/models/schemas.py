@@ -62,6 +62,9 @@ class ExternalApiResponse(BaseModel):
     resultObject: ResultObject
 
 
+_TIME_PATTERN = re.compile(r"T(\d{2}:\d{2})")
+
+
 def _extract_time(iso_str: str) -> str:
     """
     Extract time component from an ISO format string.
@@ -78,7 +81,13 @@ def _extract_time(iso_str: str) -> str:
     if not iso_str:
         raise ValueError("Empty input string provided")
 
-    time_match = re.search(r"T(\d{2}:\d{2})", iso_str)
+    # Fast path: Diyanet always sends "YYYY-MM-DDTHH:MM:SS", slice it directly
+    if len(iso_str) >= 16 and iso_str[10] == "T" and iso_str[13] == ":":
+        time_str = iso_str[11:16]
+        if time_str.isascii() and time_str[:2].isdigit() and time_str[3:].isdigit():
+            return time_str
+
+    time_match = _TIME_PATTERN.search(iso_str)
     if not time_match:
         raise ValueError(f"Could not extract time from ISO string: {iso_str}")
 
@@ -91,9 +100,10 @@ def convert_vakit_response(external_data: ExternalApiResponse) -> list[Vakit]:
 
     vakitler = []
 
+    # The fields were validated as NamazVakti already, skip validating them again
     for namaz_vakti in external_data.resultObject.namazVakti:
         vakitler.append(
-            Vakit(
+            Vakit.model_construct(
                 HicriTarihKisa=namaz_vakti.hicri_tarih_kisa,
                 HicriTarihKisaIso8601=None,  # Keep it for backward compatibility
                 HicriTarihUzun=namaz_vakti.hicri_tarih_uzun,
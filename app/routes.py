@@ -1,14 +1,23 @@
-import json
+from datetime import date
 from pathlib import Path
+from typing import Annotated, Literal
 
-from fastapi import APIRouter, HTTPException, Request
-from starlette.responses import FileResponse
+from fastapi import APIRouter, Body, HTTPException, Query, Request
+from pydantic import TypeAdapter
+from starlette.responses import FileResponse, StreamingResponse
 
 from app.core.config import get_settings
+from app.core.security import is_trusted_client
+from app.infrastructure.cache.service import get_cache_service
 from app.infrastructure.diyanet_api.client import ApiClient
-from app.models.domain import Ilce, Lookup, Sehir, Ulke, Vakit
-from app.models.schemas import convert_vakit_response
-from app.utils import STATIC_DATA_PATH, get_int_param, load_json_data
+from app.models.domain import Ilce, Lookup, Sehir, Ulke, Vakit, Yakin
+from app.services.catalog import LocationCatalog
+from app.services.lookup import LOOKUP_FIELDS
+from app.services.prepared import prepared_response
+from app.services.streaming import model_lines, ndjson_response
+from app.services.vakitler import PrayerTimesService
+from app.services.warmup import WarmupJob
+from app.utils import get_int_param
 
 router = APIRouter(
     tags=["Ezan Vakti"],
@@ -24,6 +33,32 @@ api_client = ApiClient(
     api_username=settings.api_username,
     api_password=settings.api_password,
     timeout=settings.api_timeout,
+    max_connections=settings.api_max_connections,
+    max_keepalive_connections=settings.api_max_keepalive_connections,
+    keepalive_expiry=settings.api_keepalive_expiry,
+    http2=settings.api_http2,
+)
+prayer_times = PrayerTimesService(
+    api_client=api_client,
+    cache_service=get_cache_service(),
+    distributed=settings.singleflight_distributed
+    and settings.cache_type.lower() == "redis",
+    lock_timeout=settings.api_timeout + 5,
+    min_days_ahead=settings.vakitler_min_days_ahead,
+)
+
+_vakitler_adapter = TypeAdapter(list[Vakit])
+
+# Static location data, loaded once in the application lifespan
+catalog = LocationCatalog()
+
+warmup = WarmupJob(
+    prayer_times=prayer_times,
+    catalog=catalog,
+    cache_service=get_cache_service(),
+    concurrency=settings.warmup_concurrency,
+    rate=settings.warmup_rate,
+    max_retries=settings.warmup_max_retries,
 )
 
 
@@ -38,27 +73,105 @@ async def up():
     return {"status": "up"}
 
 
+@router.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    if not await is_trusted_client(request):
+        raise HTTPException(status_code=404, detail="Not Found")
+    return {
+        "diyanet_api": api_client.get_metrics(),
+        "singleflight": prayer_times.singleflight.metrics,
+        "cache": get_cache_service().get_metrics(),
+        "warmup": warmup.progress,
+    }
+
+
 @router.get("/lookup", include_in_schema=False)
-async def lookup(request: Request) -> list[Lookup]:
-    try:
-        file_path = STATIC_DATA_PATH / "lookup.json"
-        with open(file_path, encoding="utf-8") as f:
-            countries_data = json.load(f)
-        return countries_data
-    except FileNotFoundError:
-        return []
+async def lookup(
+    request: Request,
+    ulke: Annotated[str | None, Query(min_length=1, max_length=100)] = None,
+    sehir: Annotated[str | None, Query(min_length=1, max_length=100)] = None,
+    fields: Annotated[str | None, Query(max_length=200)] = None,
+    cursor: Annotated[int, Query(ge=0)] = 0,
+    limit: Annotated[int | None, Query(ge=1, le=10_000)] = None,
+    format_: Annotated[
+        Literal["json", "columns", "ndjson"], Query(alias="format")
+    ] = "json",
+) -> list[Lookup]:
+    if not request.query_params:
+        if payload := catalog.get_payload("/lookup"):
+            return prepared_response(request, payload)  # type: ignore[return-value]
+        return catalog.lookup  # type: ignore[return-value]
+
+    selected = LOOKUP_FIELDS
+    if fields is not None:
+        selected = tuple(field.strip() for field in fields.split(",") if field.strip())
+        unknown = set(selected) - set(LOOKUP_FIELDS)
+        if unknown or not selected:
+            raise HTTPException(
+                status_code=400,
+                detail=f"fields must be a comma separated subset of "
+                f"{','.join(LOOKUP_FIELDS)}",
+            )
+
+    if format_ == "ndjson":
+        lines = catalog.lookup_index.lines(
+            ulke=ulke, sehir=sehir, fields=selected, cursor=cursor, limit=limit
+        )
+        headers = _page_headers(request, lines.total, lines.next_cursor)
+        return ndjson_response(lines.lines, headers)  # type: ignore[return-value]
+
+    page = catalog.lookup_index.page(
+        ulke=ulke,
+        sehir=sehir,
+        fields=selected,
+        cursor=cursor,
+        limit=limit,
+        columnar=format_ == "columns",
+    )
+    headers = _page_headers(request, page.total, page.next_cursor)
+    return prepared_response(request, page.payload, headers)  # type: ignore[return-value]
+
+
+def _page_headers(
+    request: Request, total: int, next_cursor: int | None
+) -> dict[str, str]:
+    headers = {"X-Total-Count": str(total)}
+    if next_cursor is not None:
+        next_url = request.url.include_query_params(cursor=next_cursor)
+        headers["Link"] = f'<{next_url.path}?{next_url.query}>; rel="next"'
+    return headers
+
+
+@router.get("/ara")
+@router.head("/ara", include_in_schema=False)
+async def ara(
+    q: Annotated[str, Query(min_length=1, max_length=100)],
+    limit: Annotated[int, Query(ge=1, le=50)] = 10,
+) -> list[Lookup]:
+    return catalog.search.search(q, limit)  # type: ignore[return-value]
+
+
+@router.get("/yakin")
+@router.head("/yakin", include_in_schema=False)
+async def yakin(
+    lat: Annotated[float, Query(ge=-90, le=90)],
+    lon: Annotated[float, Query(ge=-180, le=180)],
+    k: Annotated[int, Query(ge=1, le=50)] = 5,
+) -> list[Yakin]:
+    return [
+        Yakin(**record, Mesafe=round(distance, 3))
+        for distance, record in catalog.nearby.nearest(lat, lon, k)
+    ]
 
 
 @router.get("/ulkeler")
 @router.head("/ulkeler", include_in_schema=False)
 async def ulkeler(request: Request) -> list[Ulke]:
-    try:
-        file_path = STATIC_DATA_PATH / "countries.json"
-        with open(file_path, encoding="utf-8") as f:
-            countries_data = json.load(f)
-        return countries_data
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail="Ulke not found") from None
+    if not catalog.ulkeler:
+        raise HTTPException(status_code=404, detail="Ulke not found")
+    if payload := catalog.get_payload("/ulkeler"):
+        return prepared_response(request, payload)  # type: ignore[return-value]
+    return catalog.ulkeler  # type: ignore[return-value]
 
 
 # backward compatibility sehirler?ulke=1 -> sehirler/1
@@ -72,39 +185,120 @@ async def sehirler(request: Request, ulke: int | None = None) -> list[Sehir]:
     if ulke is None:
         ulke = get_int_param(request, "ulke")
 
-    data = load_json_data("sehirler", ulke, "Sehir not found")
-    return data
+    if payload := catalog.get_payload(f"/sehirler/{ulke}"):
+        return prepared_response(request, payload)  # type: ignore[return-value]
+    data = catalog.get_sehirler(ulke)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Sehir not found")
+    return data  # type: ignore[return-value]
 
 
 @router.get("/ilceler", include_in_schema=False)
 @router.get("/ilceler/{sehir}")
 @router.head("/ilceler", include_in_schema=False)
 @router.head("/ilceler/{sehir}", include_in_schema=False)
-async def ilceler(request: Request, sehir: int | None = None) -> list[Ilce]:
+async def ilceler(
+    request: Request,
+    sehir: int | None = None,
+    format_: Annotated[Literal["json", "ndjson"], Query(alias="format")] = "json",
+) -> list[Ilce]:
     if sehir is None:
         sehir = get_int_param(request, "sehir")
 
-    data = load_json_data("ilceler", sehir, "Ilce not found")
-    return data
+    if format_ == "json" and (payload := catalog.get_payload(f"/ilceler/{sehir}")):
+        return prepared_response(request, payload)  # type: ignore[return-value]
+    data = catalog.get_ilceler(sehir)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Ilce not found")
+    if format_ == "ndjson":
+        return ndjson_response(model_lines(data, Ilce))  # type: ignore[return-value]
+    return data  # type: ignore[return-value]
 
 
 @router.get("/vakitler", include_in_schema=False)
 @router.get("/vakitler/{ilce}")
 @router.head("/vakitler", include_in_schema=False)
 @router.head("/vakitler/{ilce}", include_in_schema=False)
-async def vakitler(request: Request, ilce: int | None = None) -> list[Vakit]:
+async def vakitler(
+    request: Request,
+    ilce: int | None = None,
+    tarih: date | None = None,
+    baslangic: date | None = None,
+    bitis: date | None = None,
+) -> list[Vakit]:
     if ilce is None:
         ilce = get_int_param(request, "ilce")
 
-    try:
-        # Fetch prayer times from the API
-        api_response = await api_client.get_monthly_prayer_times(str(ilce))
+    if tarih is not None:
+        if baslangic is not None or bitis is not None:
+            raise HTTPException(
+                status_code=400,
+                detail="tarih cannot be combined with baslangic or bitis",
+            )
+        baslangic = bitis = tarih
+    if baslangic is not None and bitis is not None and baslangic > bitis:
+        raise HTTPException(status_code=400, detail="baslangic must not be after bitis")
+
+    return await _get_vakitler(ilce, since=baslangic, until=bitis)
 
-        # Transform the API response to the expected format
-        transformed_response = convert_vakit_response(api_response)
 
-        return transformed_response
+@router.get("/vakitler/{ilce}/bugun")
+@router.head("/vakitler/{ilce}/bugun", include_in_schema=False)
+async def vakitler_bugun(ilce: int) -> Vakit:
+    today = date.today()
+    vakitler = await _get_vakitler(ilce, since=today, until=today)
+    if not vakitler:
+        raise HTTPException(status_code=404, detail="Vakit not found")
+    return vakitler[0]
+
+
+async def _get_vakitler(
+    ilce: int, since: date | None = None, until: date | None = None
+) -> list[Vakit]:
+    try:
+        # Concurrent misses for the same ilce share a single upstream call
+        return await prayer_times.get_monthly(ilce, since=since, until=until)
     except Exception as e:
         raise HTTPException(
             status_code=502, detail="Diyanet İşleri Başkanlığı servisine bağlanılamıyor"
         ) from e
+
+
+@router.post("/vakitler/batch")
+async def vakitler_batch(
+    ilceler: Annotated[
+        list[int], Body(min_length=1, max_length=settings.vakitler_batch_max_ilces)
+    ],
+) -> dict[str, list[Vakit] | None]:
+    return _stream_vakitler(ilceler)  # type: ignore[return-value]
+
+
+@router.get("/vakitler/sehir/{sehir}")
+async def vakitler_sehir(sehir: int) -> dict[str, list[Vakit] | None]:
+    data = catalog.get_ilceler(sehir)
+    if data is None:
+        raise HTTPException(status_code=404, detail="Ilce not found")
+    return _stream_vakitler([int(ilce["IlceID"]) for ilce in data])  # type: ignore[return-value]
+
+
+def _stream_vakitler(ilceler: list[int]) -> StreamingResponse:
+    """
+    Stream the prayer times of several ilces as a JSON object keyed by IlceID.
+
+    Each ilce is written as soon as it is available, stored ones first;
+    ilces that could not be served map to null.
+    """
+
+    async def body():
+        separator = b"{"
+        async for ilce, vakitler in prayer_times.get_many_monthly(
+            ilceler, concurrency=settings.vakitler_batch_concurrency
+        ):
+            value = (
+                b"null" if vakitler is None else _vakitler_adapter.dump_json(vakitler)
+            )
+            yield b'%s"%d":%s' % (separator, ilce, value)
+            separator = b","
+        yield b"{}" if separator == b"{" else b"}"
+
+    return StreamingResponse(body(), media_type="application/json")
@@ -0,0 +1,269 @@
+import mmap
+import struct
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any, NamedTuple
+
+from app.services.prepared import PreparedPayload
+
+Record = dict[str, Any]
+
+# Written by scripts/transform.py next to the JSON files it was built from
+BUNDLE_NAME = "locations.bin"
+
+# Layout, little-endian, every offset from the start of the file:
+#
+#   header    magic, version, then (offset, count) of each section below
+#   strings   UTF-8 names back to back, referenced as (offset, length)
+#   ulkeler   PLACE records: ID, name, English name
+#   sehirler  PLACE records, the cities of each country next to each other
+#   ilceler   PLACE records, the districts of each city next to each other
+#   lookup    LOOKUP records: ilce, sehir and ulke names, IlceID, lat, lon
+#   groups    GROUP records sorted by (kind, ID), one per list the API serves:
+#             its records, and its JSON body plain, gzipped and brotli
+#             compressed (size 0 if brotli was not installed) with the digest
+#             of the plain body
+#   bodies    the JSON bodies the groups point to
+#
+# scripts/transform.py writes the file with these same definitions.
+MAGIC = b"EZANLOC\0"
+VERSION = 2
+HEADER = struct.Struct("<8sI12I")
+PLACE = struct.Struct("<IIHIH")
+LOOKUP = struct.Struct("<IHIHIHIdd")
+GROUP = struct.Struct("<BIIIIIIIII16s")
+GROUP_KEY = struct.Struct("<BI")  # leading (kind, ID) of a GROUP record
+GROUP_KINDS = ("ulkeler", "sehirler", "ilceler", "lookup")
+
+PLACE_FIELDS = {
+    "ulkeler": ("UlkeID", "UlkeAdi", "UlkeAdiEn"),
+    "sehirler": ("SehirID", "SehirAdi", "SehirAdiEn"),
+    "ilceler": ("IlceID", "IlceAdi", "IlceAdiEn"),
+}
+
+
+class _Section(NamedTuple):
+    offset: int
+    count: int
+
+
+class _Group(NamedTuple):
+    kind: int
+    id: int
+    first: int
+    count: int
+    body_offset: int
+    body_size: int
+    gzip_offset: int
+    gzip_size: int
+    br_offset: int
+    br_size: int
+    digest: bytes
+
+
+class LocationBundle:
+    """
+    Read-only view of locations.bin, the packed location data.
+
+    The file is mapped into memory and only its header is read when it is
+    opened: records are decoded when asked for, and the JSON bodies are
+    served as slices of the mapping, so the bundle itself costs neither
+    startup time nor memory as the data set grows. Payloads are kept once
+    asked for; they only hold views of the mapping. Indexes built over the
+    bundle decode every record they cover, see LocationCatalog.load.
+    """
+
+    def __init__(self, path: Path):
+        """
+        Map a bundle.
+
+        Args:
+            path: Bundle file
+
+        Raises:
+            OSError: If the file cannot be read
+            ValueError: If it is not a bundle of this version
+        """
+        with open(path, "rb") as f:
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._map)
+        if len(self._map) < HEADER.size:
+            raise ValueError(f"Not a location bundle: {path}")
+        magic, version, *sections = HEADER.unpack_from(self._map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"Unsupported location bundle: {path}")
+        (
+            self._strings,
+            self._ulkeler,
+            self._sehirler,
+            self._ilceler,
+            self._lookup,
+            self._groups,
+        ) = (
+            _Section(offset, count)
+            for offset, count in zip(sections[::2], sections[1::2], strict=True)
+        )
+        self.sehirler = _GroupMapping(self, "sehirler")
+        self.ilceler = _GroupMapping(self, "ilceler")
+        self._payloads: dict[tuple[str, int], PreparedPayload] = {}
+
+    def ulkeler(self) -> list[Record]:
+        """Every country."""
+        return self.records("ulkeler", 0) or []
+
+    def lookup(self) -> list[Record]:
+        """Every lookup entry, names shared between entries."""
+        group = self._group("lookup", 0)
+        if group is None:
+            return []
+        names: dict[int, str] = {}
+
+        def name(offset: int, size: int) -> str:
+            if offset not in names:
+                names[offset] = self._string(offset, size)
+            return names[offset]
+
+        records = []
+        for position in range(group.first, group.first + group.count):
+            ilce, ilce_size, sehir, sehir_size, ulke, ulke_size, ilce_id, lat, lon = (
+                LOOKUP.unpack_from(
+                    self._map, self._lookup.offset + position * LOOKUP.size
+                )
+            )
+            records.append(
+                {
+                    "IlceAdi": name(ilce, ilce_size),
+                    "SehirAdi": name(sehir, sehir_size),
+                    "UlkeAdi": name(ulke, ulke_size),
+                    "IlceID": str(ilce_id),
+                    "lat": lat,
+                    "lon": lon,
+                }
+            )
+        return records
+
+    def records(self, kind: str, group_id: int) -> list[Record] | None:
+        """
+        Decode the records of one list.
+
+        Args:
+            kind: "ulkeler", "sehirler" (by UlkeID) or "ilceler" (by SehirID)
+            group_id: ID the list belongs to, 0 for ulkeler
+
+        Returns:
+            The records, or None if there is no such list
+        """
+        group = self._group(kind, group_id)
+        if group is None:
+            return None
+        section = getattr(self, f"_{kind}")
+        return [
+            self._place(kind, section.offset + position * PLACE.size)
+            for position in range(group.first, group.first + group.count)
+        ]
+
+    def payload(self, kind: str, group_id: int) -> PreparedPayload | None:
+        """
+        JSON response of one list, as slices of the mapped file.
+
+        Args:
+            kind: "ulkeler", "sehirler", "ilceler" or "lookup"
+            group_id: ID the list belongs to, 0 for ulkeler and lookup
+
+        Returns:
+            The payload, or None if there is no such list
+        """
+        payload = self._payloads.get((kind, group_id))
+        if payload is not None:
+            return payload
+        group = self._group(kind, group_id)
+        if group is None:
+            # Not kept, IDs asked for by clients are unbounded
+            return None
+        view = self._view
+        payload = PreparedPayload(
+            body=view[group.body_offset : group.body_offset + group.body_size],
+            gzip=view[group.gzip_offset : group.gzip_offset + group.gzip_size],
+            br=view[group.br_offset : group.br_offset + group.br_size]
+            if group.br_size
+            else None,
+            etag=f'"{group.digest.hex()}"',
+        )
+        self._payloads[kind, group_id] = payload
+        return payload
+
+    def group_ids(self, kind: str) -> Iterator[int]:
+        """IDs of every list of a kind, ascending."""
+        kind_index = GROUP_KINDS.index(kind)
+        start = self._groups.offset
+        for group_kind, group_id, *_ in GROUP.iter_unpack(
+            self._view[start : start + self._groups.count * GROUP.size]
+        ):
+            if group_kind == kind_index:
+                yield group_id
+
+    def _group(self, kind: str, group_id: int) -> _Group | None:
+        offset = self._find(
+            self._groups, GROUP, GROUP_KEY, (GROUP_KINDS.index(kind), group_id)
+        )
+        if offset is None:
+            return None
+        return _Group._make(GROUP.unpack_from(self._map, offset))
+
+    def _find(
+        self,
+        section: _Section,
+        layout: struct.Struct,
+        key_layout: struct.Struct,
+        key: tuple[int, ...],
+    ) -> int | None:
+        """Offset of the first record of a sorted section starting with key."""
+        lo, hi = 0, section.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if (
+                key_layout.unpack_from(self._map, section.offset + mid * layout.size)
+                < key
+            ):
+                lo = mid + 1
+            else:
+                hi = mid
+        offset = section.offset + lo * layout.size
+        if lo == section.count or key_layout.unpack_from(self._map, offset) != key:
+            return None
+        return offset
+
+    def _place(self, kind: str, offset: int) -> Record:
+        record_id, name, name_size, name_en, name_en_size = PLACE.unpack_from(
+            self._map, offset
+        )
+        id_field, name_field, name_en_field = PLACE_FIELDS[kind]
+        return {
+            name_field: self._string(name, name_size),
+            name_en_field: self._string(name_en, name_en_size),
+            id_field: str(record_id),
+        }
+
+    def _string(self, offset: int, size: int) -> str:
+        start = self._strings.offset + offset
+        return str(self._map[start : start + size], "utf-8")
+
+
+class _GroupMapping(Mapping[int, list[Record]]):
+    """The lists of one kind by ID, decoded from the bundle on access."""
+
+    def __init__(self, bundle: LocationBundle, kind: str):
+        self._bundle = bundle
+        self._kind = kind
+
+    def __getitem__(self, group_id: int) -> list[Record]:
+        records = self._bundle.records(self._kind, group_id)
+        if records is None:
+            raise KeyError(group_id)
+        return records
+
+    def __iter__(self) -> Iterator[int]:
+        return self._bundle.group_ids(self._kind)
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
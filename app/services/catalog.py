@@ -0,0 +1,168 @@
+import json
+import logging
+import sys
+import time
+from collections.abc import Mapping
+from pathlib import Path
+from typing import Any
+
+from app.models.domain import Ilce, Lookup, Sehir, Ulke
+from app.services.bundle import BUNDLE_NAME, LocationBundle
+from app.services.lookup import LookupIndex
+from app.services.nearby import NearestIlceIndex
+from app.services.prepared import PreparedPayload, prepare_payload
+from app.services.search import PlaceSearchIndex
+from app.utils import STATIC_DATA_PATH
+
+logger = logging.getLogger(__name__)
+
+Record = dict[str, Any]
+
+
+class LocationCatalog:
+    """In-memory index of the static location data (ulke, sehir, ilce, lookup)."""
+
+    def __init__(self, data_path: Path = STATIC_DATA_PATH):
+        """
+        Initialize an empty catalog.
+
+        Args:
+            data_path: Directory containing countries.json, lookup.json and the
+                sehirler/ and ilceler/ subdirectories, or locations.bin
+        """
+        self.data_path = data_path
+        self.bundle: LocationBundle | None = None
+        self.ulkeler: list[Record] = []
+        self.sehirler: Mapping[int, list[Record]] = {}
+        self.ilceler: Mapping[int, list[Record]] = {}
+        self.lookup: list[Record] = []
+        self.payloads: dict[str, PreparedPayload] = {}
+        self.prepared = False
+        self.lookup_index = LookupIndex([])
+        self.nearby = NearestIlceIndex([])
+        self.search = PlaceSearchIndex([])
+
+    def load(self) -> None:
+        """
+        Read the location data and index it by its numeric ID.
+
+        With a locations.bin bundle, sehir and ilce lists stay in the mapped
+        file and are decoded on access; otherwise every JSON file is read.
+
+        Either way the lookup, nearby and search indexes are built here: they
+        decode every lookup entry and every sehir and ilce list once, so
+        their build time and memory still grow with the data set. With a
+        bundle only the indexes and the lookup entries are kept, the decoded
+        sehir and ilce lists are dropped once indexed.
+        """
+        started = time.perf_counter()
+
+        self.bundle = self._open_bundle(self.data_path / BUNDLE_NAME)
+        if self.bundle is not None:
+            self.ulkeler = self.bundle.ulkeler()
+            self.sehirler = self.bundle.sehirler
+            self.ilceler = self.bundle.ilceler
+            self.lookup = self.bundle.lookup()
+        else:
+            self.ulkeler = self._read(self.data_path / "countries.json") or []
+            self.sehirler = self._read_dir(self.data_path / "sehirler")
+            self.ilceler = self._read_dir(self.data_path / "ilceler")
+            self.lookup = self._read(self.data_path / "lookup.json") or []
+        self.lookup_index = LookupIndex(self.lookup, self.ulkeler, self.sehirler)
+        self.nearby = NearestIlceIndex(self.lookup)
+        self.search = PlaceSearchIndex(
+            self.lookup, self.ulkeler, self.sehirler, self.ilceler
+        )
+
+        logger.info(
+            f"Loaded location catalog: {len(self.ulkeler)} ulke, "
+            f"{len(self.sehirler)} sehir files, {len(self.ilceler)} ilce files, "
+            f"{len(self.lookup)} lookup entries in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def prepare(self) -> None:
+        """Pre-serialize every location file, keyed by the path serving it."""
+        self.prepared = True
+        if self.bundle is not None:
+            # Every body is in the bundle, serialized and compressed already
+            return
+        started = time.perf_counter()
+
+        payloads = {
+            "/ulkeler": prepare_payload(self.ulkeler, Ulke),
+            "/lookup": prepare_payload(self.lookup, Lookup),
+        }
+        for ulke_id, sehirler in self.sehirler.items():
+            payloads[f"/sehirler/{ulke_id}"] = prepare_payload(sehirler, Sehir)
+        for sehir_id, ilceler in self.ilceler.items():
+            payloads[f"/ilceler/{sehir_id}"] = prepare_payload(ilceler, Ilce)
+        self.payloads = payloads
+
+        logger.info(
+            f"Pre-serialized {len(payloads)} location payloads in "
+            f"{(time.perf_counter() - started) * 1000:.1f} ms"
+        )
+
+    def get_payload(self, path: str) -> PreparedPayload | None:
+        """Return the pre-serialized response for a path, if prepared."""
+        if self.bundle is None or not self.prepared:
+            return self.payloads.get(path)
+        kind, _, group_id = path.lstrip("/").partition("/")
+        return self.bundle.payload(kind, int(group_id or 0))
+
+    def get_sehirler(self, ulke_id: int) -> list[Record] | None:
+        """Return the cities of a country, or None if the country is unknown."""
+        return self.sehirler.get(ulke_id)
+
+    def get_ilceler(self, sehir_id: int) -> list[Record] | None:
+        """Return the districts of a city, or None if the city is unknown."""
+        return self.ilceler.get(sehir_id)
+
+    @staticmethod
+    def _open_bundle(path: Path) -> LocationBundle | None:
+        if not path.exists():
+            return None
+        try:
+            return LocationBundle(path)
+        except Exception:
+            logger.exception(f"Error loading location bundle, using JSON: {path}")
+            return None
+
+    def _read_dir(self, directory: Path) -> dict[int, list[Record]]:
+        index: dict[int, list[Record]] = {}
+        if not directory.is_dir():
+            logger.warning(f"Location data directory not found: {directory}")
+            return index
+
+        for file_path in directory.glob("*.json"):
+            try:
+                file_id = int(file_path.stem)
+            except ValueError:
+                continue
+            records = self._read(file_path)
+            if records is not None:
+                index[file_id] = records
+        return index
+
+    @staticmethod
+    def _read(file_path: Path) -> list[Record] | None:
+        try:
+            with open(file_path, encoding="utf-8") as f:
+                records = json.load(f)
+        except FileNotFoundError:
+            logger.warning(f"Location data file not found: {file_path}")
+            return None
+        except Exception:
+            logger.exception(f"Error loading location data: {file_path}")
+            return None
+
+        # Names and IDs repeat heavily across files (lookup.json repeats every
+        # sehir and ulke name), so share a single string object per value.
+        return [
+            {
+                sys.intern(key): sys.intern(value) if isinstance(value, str) else value
+                for key, value in record.items()
+            }
+            for record in records
+        ]
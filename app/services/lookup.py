@@ -0,0 +1,230 @@
+import json
+from bisect import bisect_left
+from collections import OrderedDict
+from collections.abc import Iterator, Mapping
+from typing import Any, NamedTuple
+
+from pydantic import TypeAdapter
+
+from app.models.domain import Lookup
+from app.services.prepared import LazyPayload
+from app.services.search import PlaceNames, fold
+
+Record = dict[str, Any]
+
+LOOKUP_FIELDS = tuple(Lookup.model_fields)
+
+# Compact, UTF-8 output like pydantic's dump_json; one encoder instead of one
+# per json.dumps call with these options
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(",", ":")).encode
+
+# Serialized pages kept per worker, bounded by count and by body size
+MAX_PAGES = 1024
+MAX_PAGES_BYTES = 32 * 1024 * 1024
+
+
+class LookupPage(NamedTuple):
+    """One serialized slice of lookup.json."""
+
+    payload: LazyPayload
+    total: int  # entries matching the filters, over all pages
+    next_cursor: int | None
+
+
+class LookupLines(NamedTuple):
+    """One slice of lookup.json, serialized lazily one entry per line."""
+
+    lines: Iterator[bytes]
+    total: int  # entries matching the filters, over all pages
+    next_cursor: int | None
+
+
+class LookupIndex:
+    """
+    Filtered, paginated and projected views of lookup.json.
+
+    Records are validated through the Lookup model once, then every view is
+    plain dict slicing and json.dumps, producing the same bytes the route
+    would. Pages are kept serialized, keyed by the entries they hold rather
+    than the cursor asked for, and compressed for each encoding the first
+    time it is requested, so a repeated request costs a dict lookup.
+
+    Cursors are positions in lookup.json: the next page starts at the first
+    matching entry at or after the cursor, so they stay valid for any filter
+    and page size.
+    """
+
+    def __init__(
+        self,
+        lookup: list[Record],
+        ulkeler: list[Record] | None = None,
+        sehirler: Mapping[int, list[Record]] | None = None,
+    ):
+        """
+        Build the index.
+
+        Args:
+            lookup: Lookup entries
+            ulkeler: Countries, so entries can be filtered by UlkeID or English name
+            sehirler: Cities per country ID, so entries can be filtered by SehirID
+                or English name
+        """
+        adapter = TypeAdapter(list[Lookup])
+        self._records: list[Record] = adapter.dump_python(
+            adapter.validate_python(lookup), mode="json"
+        )
+        names = PlaceNames(ulkeler or [], sehirler or {}, {})
+
+        # folded name or ID -> positions of the matching entries, ascending
+        self._by_ulke: dict[str, list[int]] = {}
+        self._by_sehir: dict[str, list[int]] = {}
+        for position, record in enumerate(lookup):
+            ulke = names.ulke_record(record) or {}
+            for key in _keys(
+                record["UlkeAdi"],
+                ulke.get("UlkeAdi"),
+                ulke.get("UlkeAdiEn"),
+                ulke.get("UlkeID"),
+            ):
+                self._by_ulke.setdefault(key, []).append(position)
+            sehir = names.sehir_record(record) or {}
+            for key in _keys(
+                record["SehirAdi"], sehir.get("SehirAdiEn"), sehir.get("SehirID")
+            ):
+                self._by_sehir.setdefault(key, []).append(position)
+
+        self._pages: OrderedDict[tuple, LookupPage] = OrderedDict()
+        self._pages_size = 0
+
+    def __len__(self) -> int:
+        return len(self._records)
+
+    def page(
+        self,
+        ulke: str | None = None,
+        sehir: str | None = None,
+        fields: tuple[str, ...] = LOOKUP_FIELDS,
+        cursor: int = 0,
+        limit: int | None = None,
+        columnar: bool = False,
+    ) -> LookupPage:
+        """
+        Serialized page of the entries matching the filters.
+
+        Args:
+            ulke: Country name (Turkish or English, any case or accents) or UlkeID
+            sehir: City name (Turkish or English, any case or accents) or SehirID
+            fields: Fields to include, a subset of LOOKUP_FIELDS
+            cursor: Position to start from, as returned in next_cursor
+            limit: Entries per page, all remaining entries if None
+            columnar: Serialize as one array per field instead of one object
+                per entry
+
+        Returns:
+            The page with its serialized body
+        """
+        fields = tuple(field for field in LOOKUP_FIELDS if field in fields)
+        ulke, sehir = ulke and fold(ulke), sehir and fold(sehir)
+        positions, start, end = self._window(ulke, sehir, cursor, limit)
+        key = (ulke, sehir, fields, start, end, columnar)
+        page = self._pages.get(key)
+        if page is not None:
+            self._pages.move_to_end(key)
+            return page
+
+        page = self._build_page(positions, start, end, fields, columnar)
+        self._pages[key] = page
+        self._pages_size += _size(page)
+        while len(self._pages) > MAX_PAGES or self._pages_size > MAX_PAGES_BYTES:
+            _, evicted = self._pages.popitem(last=False)
+            self._pages_size -= _size(evicted)
+        return page
+
+    def lines(
+        self,
+        ulke: str | None = None,
+        sehir: str | None = None,
+        fields: tuple[str, ...] = LOOKUP_FIELDS,
+        cursor: int = 0,
+        limit: int | None = None,
+    ) -> LookupLines:
+        """
+        Entries matching the filters, serialized one at a time as they are read.
+
+        Nothing is kept: the same arguments as page(), for streaming responses
+        too large to hold or too rarely requested to be worth keeping.
+        """
+        fields = tuple(field for field in LOOKUP_FIELDS if field in fields)
+        positions, start, end = self._window(
+            ulke and fold(ulke), sehir and fold(sehir), cursor, limit
+        )
+        records = self._records
+
+        def lines() -> Iterator[bytes]:
+            for position in positions[start:end]:
+                record = records[position]
+                if fields != LOOKUP_FIELDS:
+                    record = {field: record[field] for field in fields}
+                yield _encode(record).encode()
+
+        return LookupLines(
+            lines=lines(),
+            total=len(positions),
+            next_cursor=_next_cursor(positions, end),
+        )
+
+    def _build_page(
+        self,
+        positions: list[int],
+        start: int,
+        end: int,
+        fields: tuple[str, ...],
+        columnar: bool,
+    ) -> LookupPage:
+        records = [self._records[position] for position in positions[start:end]]
+
+        body: Any
+        if columnar:
+            body = {field: [record[field] for record in records] for field in fields}
+        elif fields == LOOKUP_FIELDS:
+            body = records
+        else:
+            body = [{field: record[field] for field in fields} for record in records]
+
+        return LookupPage(
+            payload=LazyPayload(_encode(body).encode()),
+            total=len(positions),
+            next_cursor=_next_cursor(positions, end),
+        )
+
+    def _window(
+        self, ulke: str | None, sehir: str | None, cursor: int, limit: int | None
+    ) -> tuple[list[int], int, int]:
+        """Positions of every match, and the bounds of one page of them."""
+        positions = self._select(ulke, sehir)
+        start = bisect_left(positions, cursor)
+        end = len(positions) if limit is None else min(start + limit, len(positions))
+        return positions, start, end
+
+    def _select(self, ulke: str | None, sehir: str | None) -> list[int]:
+        if ulke is None and sehir is None:
+            return range(len(self._records))  # type: ignore[return-value]
+        if sehir is None:
+            return self._by_ulke.get(ulke, [])  # type: ignore[arg-type]
+        if ulke is None:
+            return self._by_sehir.get(sehir, [])
+        in_ulke = set(self._by_ulke.get(ulke, ()))
+        return [p for p in self._by_sehir.get(sehir, ()) if p in in_ulke]
+
+
+def _keys(*values: Any) -> set[str]:
+    return {fold(str(value)) for value in values if value is not None}
+
+
+def _next_cursor(positions: list[int], end: int) -> int | None:
+    return positions[end] if end < len(positions) else None
+
+
+def _size(page: LookupPage) -> int:
+    # Compressed variants are made later; together they stay below the body
+    return 2 * len(page.payload.body)
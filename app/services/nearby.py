@@ -0,0 +1,128 @@
+import heapq
+import math
+from typing import Any
+
+Record = dict[str, Any]
+
+# Mean Earth radius in km
+EARTH_RADIUS = 6371.0088
+
+# Segments this small are scanned instead of split further
+_LEAF_SIZE = 8
+
+
+def haversine(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+    """Great-circle distance in km between two points given in degrees."""
+    phi1, phi2 = math.radians(lat1), math.radians(lat2)
+    a = (
+        math.sin((phi2 - phi1) / 2) ** 2
+        + math.cos(phi1) * math.cos(phi2) * math.sin(math.radians(lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS * math.asin(min(1.0, math.sqrt(a)))
+
+
+def _to_xyz(lat: float, lon: float) -> tuple[float, float, float]:
+    phi, lam = math.radians(lat), math.radians(lon)
+    return (math.cos(phi) * math.cos(lam), math.cos(phi) * math.sin(lam), math.sin(phi))
+
+
+class NearestIlceIndex:
+    """
+    KD-tree over the coordinates of every ilce in lookup.json.
+
+    Points are placed on the unit sphere, where the straight-line distance
+    grows with the great-circle distance, so the tree finds the exact nearest
+    ilces by haversine distance without special cases at the poles or the
+    antimeridian. The tree is stored in place: each segment of the point
+    list is split at its median on the axis with the largest spread.
+    """
+
+    def __init__(self, records: list[Record]):
+        """
+        Build the index.
+
+        Args:
+            records: Lookup records with lat and lon, records without
+                coordinates are left out
+        """
+        points = [
+            (_to_xyz(record["lat"], record["lon"]), record)
+            for record in records
+            if isinstance(record.get("lat"), int | float)
+            and isinstance(record.get("lon"), int | float)
+        ]
+        self._axes = [0] * len(points)
+        self._build(points, 0, len(points))
+        self._points = [xyz for xyz, _ in points]
+        self._records = [record for _, record in points]
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def _build(self, points: list, lo: int, hi: int) -> None:
+        if hi - lo <= _LEAF_SIZE:
+            return
+        segment = points[lo:hi]
+        axis = max(
+            range(3),
+            key=lambda a: max(p[0][a] for p in segment) - min(p[0][a] for p in segment),
+        )
+        segment.sort(key=lambda p: p[0][axis])
+        points[lo:hi] = segment
+        mid = (lo + hi) // 2
+        self._axes[mid] = axis
+        self._build(points, lo, mid)
+        self._build(points, mid + 1, hi)
+
+    def nearest(self, lat: float, lon: float, k: int = 1) -> list[tuple[float, Record]]:
+        """
+        Find the k ilces closest to a point.
+
+        Args:
+            lat: Latitude in degrees
+            lon: Longitude in degrees
+            k: Number of ilces to return
+
+        Returns:
+            (distance in km, lookup record) pairs, closest first
+        """
+        qx, qy, qz = query = _to_xyz(lat, lon)
+        points, axes = self._points, self._axes
+        # max-heap of (-squared chord distance, index) holding the best k so far
+        best: list[tuple[float, int]] = []
+
+        def consider(i: int) -> None:
+            px, py, pz = points[i]
+            d2 = (px - qx) ** 2 + (py - qy) ** 2 + (pz - qz) ** 2
+            if len(best) < k:
+                heapq.heappush(best, (-d2, i))
+            elif d2 < -best[0][0]:
+                heapq.heapreplace(best, (-d2, i))
+
+        def search(lo: int, hi: int) -> None:
+            if hi - lo <= _LEAF_SIZE:
+                for i in range(lo, hi):
+                    consider(i)
+                return
+            mid = (lo + hi) // 2
+            consider(mid)
+            diff = query[axes[mid]] - points[mid][axes[mid]]
+            near, far = (
+                ((lo, mid), (mid + 1, hi)) if diff < 0 else ((mid + 1, hi), (lo, mid))
+            )
+            search(*near)
+            # The other side can only hold closer points if the splitting
+            # plane is closer than the current k-th best
+            if len(best) < k or diff * diff < -best[0][0]:
+                search(*far)
+
+        if k > 0:
+            search(0, len(points))
+
+        return [
+            (
+                haversine(lat, lon, self._records[i]["lat"], self._records[i]["lon"]),
+                self._records[i],
+            )
+            for _, i in sorted(best, key=lambda item: (-item[0], item[1]))
+        ]
@@ -0,0 +1,221 @@
+import heapq
+import unicodedata
+from bisect import bisect_left
+from collections import Counter
+from collections.abc import Mapping
+from functools import lru_cache
+from typing import Any
+
+Record = dict[str, Any]
+
+# Weight of a match depending on the name it is found in
+ILCE_WEIGHT = 1.0
+SEHIR_WEIGHT = 0.6
+ULKE_WEIGHT = 0.3
+
+# Terms sharing fewer trigrams than this (Dice coefficient) are not a typo match
+MIN_SIMILARITY = 0.5
+
+# Dotted and dotless I are different letters in Turkish, fold both to "i"
+# before lowercasing so "İSTANBUL", "ISTANBUL" and "istanbul" all match
+_TURKISH_I = str.maketrans({"İ": "i", "I": "i", "ı": "i"})
+
+
+@lru_cache(maxsize=65536)
+def fold(text: str) -> str:
+    """
+    Fold a name for matching: Turkish-aware lowercase, accents removed.
+
+    Punctuation becomes spaces, so "BAD-HOMBURG" matches "bad homburg".
+    """
+    text = unicodedata.normalize("NFKD", text.translate(_TURKISH_I).lower())
+    return " ".join(
+        "".join(
+            char if char.isalnum() else " "
+            for char in text
+            if not unicodedata.combining(char)
+        ).split()
+    )
+
+
+def _trigrams(term: str) -> set[str]:
+    padded = f"  {term} "
+    return {padded[i : i + 3] for i in range(len(padded) - 2)}
+
+
+class PlaceSearchIndex:
+    """
+    Search index over the ilce, sehir and ulke names of every lookup entry.
+
+    Every word of every name, in Turkish and English, is folded into a
+    sorted term list for prefix matching, and into a trigram index for typo
+    tolerant matching. Each query word has to match every result; results
+    are ranked by how well and in which name (ilce before sehir before ulke)
+    each word matched.
+    """
+
+    def __init__(
+        self,
+        lookup: list[Record],
+        ulkeler: list[Record] | None = None,
+        sehirler: Mapping[int, list[Record]] | None = None,
+        ilceler: Mapping[int, list[Record]] | None = None,
+    ):
+        """
+        Build the index.
+
+        Args:
+            lookup: Lookup entries, the documents searched
+            ulkeler: Countries, for the English names of the ulke
+            sehirler: Cities per country ID, for the English names of the sehir
+            ilceler: Districts per city ID, for the English names of the ilce
+        """
+        self._docs = lookup
+        names = PlaceNames(ulkeler or [], sehirler or {}, ilceler or {})
+
+        # term -> {doc: weight of the best field the term appears in}
+        postings: dict[str, dict[int, float]] = {}
+        for doc, record in enumerate(lookup):
+            fields = (
+                (ILCE_WEIGHT, record["IlceAdi"], names.ilce(record)),
+                (SEHIR_WEIGHT, record["SehirAdi"], names.sehir(record)),
+                (ULKE_WEIGHT, record["UlkeAdi"], names.ulke(record)),
+            )
+            for weight, *field_names in fields:
+                for name in field_names:
+                    for term in fold(name or "").split():
+                        docs = postings.setdefault(term, {})
+                        if docs.get(doc, 0.0) < weight:
+                            docs[doc] = weight
+
+        self._terms = sorted(postings)
+        self._postings = [tuple(postings[term].items()) for term in self._terms]
+        trigrams: dict[str, list[int]] = {}
+        for term_id, term in enumerate(self._terms):
+            for trigram in _trigrams(term):
+                trigrams.setdefault(trigram, []).append(term_id)
+        self._trigrams = trigrams
+        self._sort_keys = [(len(r["IlceAdi"]), r["IlceAdi"]) for r in lookup]
+
+    def __len__(self) -> int:
+        return len(self._docs)
+
+    def search(self, query: str, limit: int = 10) -> list[Record]:
+        """
+        Find the lookup entries best matching a query.
+
+        Args:
+            query: Words to search for, in any case, with or without accents
+            limit: Number of entries to return at most
+
+        Returns:
+            Matching lookup entries, best first
+        """
+        words = fold(query).split()
+        if not words:
+            return []
+
+        scores: dict[int, float] | None = None
+        for word in words:
+            matches = self._match(word)
+            if scores is None:
+                scores = matches
+            else:
+                scores = {
+                    doc: score + matches[doc]
+                    for doc, score in scores.items()
+                    if doc in matches
+                }
+            if not scores:
+                return []
+
+        assert scores is not None
+        sort_keys = self._sort_keys
+        best = heapq.nsmallest(
+            limit, scores, key=lambda doc: (-scores[doc], *sort_keys[doc], doc)
+        )
+        return [self._docs[doc] for doc in best]
+
+    def _match(self, word: str) -> dict[int, float]:
+        """Score of every document matching a query word."""
+        terms = self._terms
+        scores: dict[int, float] = {}
+        matched = set()
+
+        # Exact and prefix matches, the closer the length the better
+        i = bisect_left(terms, word)
+        while i < len(terms) and terms[i].startswith(word):
+            term = terms[i]
+            score = 1.0 if term == word else 0.5 + 0.4 * len(word) / len(term)
+            self._add(scores, i, score)
+            matched.add(i)
+            i += 1
+
+        # Typo tolerant matches by shared trigrams, ranked below prefixes
+        if len(word) >= 3:
+            word_trigrams = _trigrams(word)
+            shared: Counter[int] = Counter()
+            for trigram in word_trigrams:
+                shared.update(self._trigrams.get(trigram, ()))
+            for term_id, count in shared.items():
+                if term_id in matched:
+                    continue
+                similarity = 2 * count / (len(word_trigrams) + len(terms[term_id]) + 1)
+                if similarity >= MIN_SIMILARITY:
+                    self._add(scores, term_id, 0.5 * similarity)
+
+        return scores
+
+    def _add(self, scores: dict[int, float], term_id: int, score: float) -> None:
+        for doc, weight in self._postings[term_id]:
+            weighted = score * weight
+            if scores.get(doc, 0.0) < weighted:
+                scores[doc] = weighted
+
+
+class PlaceNames:
+    """Resolves the ulke, sehir and ilce records a lookup entry refers to by name."""
+
+    def __init__(
+        self,
+        ulkeler: list[Record],
+        sehirler: Mapping[int, list[Record]],
+        ilceler: Mapping[int, list[Record]],
+    ):
+        # lookup.json names countries sometimes in Turkish, sometimes in English
+        self._ulkeler = {
+            fold(record[field]): record
+            for record in ulkeler
+            for field in ("UlkeAdi", "UlkeAdiEn")
+            if record.get(field)
+        }
+        self._sehirler = {
+            (ulke_id, fold(record["SehirAdi"])): record
+            for ulke_id, records in sehirler.items()
+            for record in records
+        }
+        self._ilceler = {
+            record["IlceID"]: record["IlceAdiEn"]
+            for records in ilceler.values()
+            for record in records
+        }
+
+    def ulke_record(self, lookup: Record) -> Record | None:
+        return self._ulkeler.get(fold(lookup["UlkeAdi"]))
+
+    def sehir_record(self, lookup: Record) -> Record | None:
+        ulke = self.ulke_record(lookup)
+        if ulke is None:
+            return None
+        return self._sehirler.get((int(ulke["UlkeID"]), fold(lookup["SehirAdi"])))
+
+    def ulke(self, lookup: Record) -> str | None:
+        ulke = self.ulke_record(lookup)
+        return ulke and ulke.get("UlkeAdiEn")
+
+    def sehir(self, lookup: Record) -> str | None:
+        sehir = self.sehir_record(lookup)
+        return sehir and sehir.get("SehirAdiEn")
+
+    def ilce(self, lookup: Record) -> str | None:
+        return self._ilceler.get(lookup["IlceID"])
@@ -0,0 +1,54 @@
+from collections.abc import Iterable, Iterator
+from functools import lru_cache
+from typing import Any
+
+from pydantic import BaseModel, TypeAdapter
+from starlette.responses import StreamingResponse
+
+NDJSON_MEDIA_TYPE = "application/x-ndjson"
+
+# Lines sent per chunk: large enough to keep the per-chunk overhead (thread
+# hop, gzip flush) negligible, small enough for a first chunk of a few KB
+STREAM_BATCH_SIZE = 128
+
+
+def model_lines(records: Iterable[Any], model: type[BaseModel]) -> Iterator[bytes]:
+    """Validate and serialize records one at a time, as the route would."""
+    adapter = _adapter(model)
+    for record in records:
+        yield adapter.dump_json(adapter.validate_python(record))
+
+
+def ndjson_response(
+    lines: Iterable[bytes], headers: dict[str, str] | None = None
+) -> StreamingResponse:
+    """
+    Stream JSON documents as newline delimited JSON.
+
+    Lines are produced lazily in batches, so nothing but the current batch
+    is held in memory and the first entries go out before the last ones are
+    serialized.
+
+    Args:
+        lines: One serialized JSON document per entry, without newline
+        headers: Extra response headers
+    """
+
+    def chunks() -> Iterator[bytes]:
+        batch: list[bytes] = []
+        for line in lines:
+            batch.append(line)
+            if len(batch) >= STREAM_BATCH_SIZE:
+                batch.append(b"")
+                yield b"\n".join(batch)
+                batch = []
+        if batch:
+            batch.append(b"")
+            yield b"\n".join(batch)
+
+    return StreamingResponse(chunks(), headers=headers, media_type=NDJSON_MEDIA_TYPE)
+
+
+@lru_cache
+def _adapter(model: type[BaseModel]) -> TypeAdapter:
+    return TypeAdapter(model)
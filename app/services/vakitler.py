@@ -0,0 +1,243 @@
+import asyncio
+import contextlib
+import logging
+from collections import Counter
+from collections.abc import AsyncIterator
+from datetime import date, timedelta
+
+from app.infrastructure.cache.service import CacheService
+from app.infrastructure.cache.singleflight import SingleFlight
+from app.infrastructure.diyanet_api.client import ApiClient
+from app.models.compact import PrayerDays
+from app.models.domain import Vakit
+from app.models.schemas import convert_vakit_response
+
+logger = logging.getLogger(__name__)
+
+
+class PrayerTimesService:
+    """
+    Prayer times kept as one record per (ilce, date).
+
+    Responses are assembled from the stored days starting today. The upstream
+    is only called when the stored range no longer covers enough days ahead,
+    with at most one call in flight per ilce. Days are kept in compact form in
+    the worker and shared with the other workers through the cache.
+    """
+
+    def __init__(
+        self,
+        api_client: ApiClient,
+        cache_service: CacheService,
+        distributed: bool = False,
+        lock_timeout: int = 35,
+        min_days_ahead: int = 15,
+    ):
+        """
+        Initialize the service.
+
+        Args:
+            api_client: Client for the Diyanet API
+            cache_service: Cache holding the day records and cross-worker lock
+            distributed: Also coalesce refreshes across workers through a lock
+            lock_timeout: Seconds a cross-worker lock is held at most
+            min_days_ahead: Refresh once fewer days than this are stored ahead
+        """
+        self.api_client = api_client
+        self.cache_service = cache_service
+        self.distributed = distributed
+        self.lock_timeout = lock_timeout
+        self.min_days_ahead = min_days_ahead
+        self.singleflight = SingleFlight()
+        self._days: dict[int, PrayerDays] = {}
+        # requests per ilce in this worker, used to warm popular ilces first;
+        # single ilces are counted by HitCounterMiddleware, ahead of the cache
+        self.hits: Counter[int] = Counter()
+
+    async def get_monthly(
+        self,
+        ilce: int,
+        today: date | None = None,
+        since: date | None = None,
+        until: date | None = None,
+    ) -> list[Vakit]:
+        """
+        Return the stored prayer times of an ilce.
+
+        Every range is sliced from the same stored days, refreshed as needed
+        to cover today.
+
+        Args:
+            ilce: IlceID
+            today: Current date
+            since: First day returned, today by default
+            until: Last day returned, the last stored day by default
+        """
+        today = today or date.today()
+        stored = await self._ensure_covered(
+            ilce, await self._stored(ilce, today), today
+        )
+        return stored.to_vakitler(since=since or today, until=until)
+
+    async def get_many_monthly(
+        self, ilces: list[int], concurrency: int = 8, today: date | None = None
+    ) -> AsyncIterator[tuple[int, list[Vakit] | None]]:
+        """
+        Return the stored prayer times of several ilces as each becomes ready.
+
+        The stored days of every ilce not held by this worker are read in one
+        cache round trip and yielded right away; the ilces needing a refresh
+        are then fetched concurrently, at most concurrency at a time, and
+        yielded as their upstream calls complete.
+
+        Args:
+            ilces: IlceIDs, duplicates are served once
+            concurrency: Upstream calls in flight at most
+            today: First day served
+
+        Yields:
+            (ilce, prayer times) pairs, prayer times None if the ilce could
+            not be served
+        """
+        today = today or date.today()
+        ilces = list(dict.fromkeys(ilces))
+        self.hits.update(ilces)
+
+        stale: dict[int, PrayerDays] = {}
+        missing = []
+        for ilce in ilces:
+            stored = self._days.get(ilce)
+            if stored is not None and self._covers(stored, today):
+                yield ilce, stored.to_vakitler(since=today)
+            else:
+                missing.append(ilce)
+
+        values = await self.cache_service.get_many(
+            [f"vakitler:days:{ilce}" for ilce in missing]
+        )
+        for ilce, value in zip(missing, values, strict=True):
+            stored = self._decode(ilce, value)
+            if self._covers(stored, today):
+                yield ilce, stored.to_vakitler(since=today)
+            else:
+                stale[ilce] = stored
+
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def serve(ilce: int) -> tuple[int, list[Vakit] | None]:
+            async with semaphore:
+                try:
+                    stored = await self._ensure_covered(ilce, stale[ilce], today)
+                    return ilce, stored.to_vakitler(since=today)
+                except Exception:
+                    logger.exception(f"Could not serve ilce {ilce} in a batch")
+                    return ilce, None
+
+        tasks = [asyncio.create_task(serve(ilce)) for ilce in stale]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            # The client went away; refreshes already started finish in their
+            # single-flight task and are stored for the next request
+            for task in tasks:
+                task.cancel()
+
+    async def _ensure_covered(
+        self, ilce: int, stored: PrayerDays, today: date
+    ) -> PrayerDays:
+        if not self._covers(stored, today):
+            try:
+                stored = await self._refresh_once(ilce, today)
+            except Exception:
+                # Keep serving what is stored as long as it still has today
+                if today not in stored:
+                    raise
+                logger.exception(f"Refresh failed for ilce {ilce}, serving stored")
+
+        return stored
+
+    async def needs_refresh(self, ilce: int, today: date | None = None) -> bool:
+        """Check whether fewer days than required are stored ahead for an ilce."""
+        today = today or date.today()
+        return not self._covers(await self._stored(ilce, today), today)
+
+    async def warm(self, ilce: int, today: date | None = None) -> bool:
+        """
+        Make sure enough days ahead are stored for an ilce.
+
+        Returns:
+            True if the days had to be refreshed, False if already covered
+
+        Raises:
+            Exception: Whatever the upstream call raised
+        """
+        today = today or date.today()
+        if not await self.needs_refresh(ilce, today):
+            return False
+        await self._refresh_once(ilce, today)
+        return True
+
+    async def _stored(self, ilce: int, today: date) -> PrayerDays:
+        stored = self._days.get(ilce)
+        if stored is None or not self._covers(stored, today):
+            stored = await self._load(ilce)
+        return stored
+
+    async def _refresh_once(self, ilce: int, today: date) -> PrayerDays:
+        key = f"vakitler:{ilce}"
+        return await self.singleflight.do(key, lambda: self._refresh(key, ilce, today))
+
+    def _covers(self, stored: PrayerDays, today: date) -> bool:
+        if today not in stored:
+            return False
+        # Upstream may return fewer days than asked for; don't refetch it all day
+        if stored.fetched_on == today:
+            return True
+        last_day = stored.last_day
+        return last_day is not None and (
+            last_day >= today + timedelta(days=self.min_days_ahead)
+        )
+
+    async def _refresh(self, key: str, ilce: int, today: date) -> PrayerDays:
+        lock = (
+            self.cache_service.lock(key, timeout=self.lock_timeout)
+            if self.distributed
+            else contextlib.nullcontext()
+        )
+        async with lock:
+            # Another worker may have refreshed the days while we waited
+            stored = await self._load(ilce)
+            if self._covers(stored, today):
+                return stored
+
+            api_response = await self.api_client.get_monthly_prayer_times(str(ilce))
+            fetched = PrayerDays.from_vakitler(
+                convert_vakit_response(api_response), fetched_on=today
+            )
+            stored = stored.merge(fetched, since=today)
+            await self._save(ilce, stored, today)
+            return stored
+
+    async def _load(self, ilce: int) -> PrayerDays:
+        return self._decode(ilce, await self.cache_service.get(f"vakitler:days:{ilce}"))
+
+    def _decode(self, ilce: int, value: bytes | None) -> PrayerDays:
+        stored = PrayerDays.loads(value) if value else PrayerDays()
+        if stored:
+            self._days[ilce] = stored
+        return stored
+
+    async def _save(self, ilce: int, stored: PrayerDays, today: date) -> None:
+        last_day = stored.last_day
+        if last_day is None:
+            return
+
+        self._days[ilce] = stored
+        # Keep the records until the last stored day has passed
+        days_left = (last_day - today).days + 1
+        await self.cache_service.set(
+            f"vakitler:days:{ilce}",
+            stored.dumps(),
+            timeout=max(days_left, 1) * 24 * 60 * 60,
+        )
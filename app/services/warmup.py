@@ -0,0 +1,258 @@
+import argparse
+import asyncio
+import json
+import logging
+import random
+import time
+from collections import Counter
+from datetime import date, datetime, timedelta
+from typing import Any
+
+from app.infrastructure.cache.service import CacheService
+from app.services.catalog import LocationCatalog
+from app.services.vakitler import PrayerTimesService
+
+logger = logging.getLogger(__name__)
+
+# Hash of hit counts by IlceID, incremented by every worker
+POPULARITY_KEY = "warmup:hits"
+PROGRESS_KEY = "warmup:progress"
+# A run is assumed dead after this long and another worker may take over
+LOCK_TIMEOUT = 6 * 60 * 60
+
+
+class RateLimiter:
+    """Spaces out acquisitions to at most rate per second across all tasks."""
+
+    def __init__(self, rate: float):
+        self.interval = 1.0 / rate if rate > 0 else 0.0
+        self._next = 0.0
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if not self.interval:
+            return
+        async with self._lock:
+            now = time.monotonic()
+            wait = self._next - now
+            self._next = max(now, self._next) + self.interval
+        if wait > 0:
+            await asyncio.sleep(wait)
+
+
+class WarmupJob:
+    """
+    Fetch the prayer times of every ilce in the catalog ahead of demand.
+
+    Ilces are walked most requested first, with bounded concurrency, a global
+    rate limit and retries with exponential backoff. Ilces whose stored days
+    already cover enough days ahead are skipped, so an interrupted run picks
+    up where it stopped. Progress is kept in the cache under PROGRESS_KEY.
+    """
+
+    def __init__(
+        self,
+        prayer_times: PrayerTimesService,
+        catalog: LocationCatalog,
+        cache_service: CacheService,
+        concurrency: int = 8,
+        rate: float = 10.0,
+        max_retries: int = 5,
+    ):
+        """
+        Initialize the job.
+
+        Args:
+            prayer_times: Service whose store is filled
+            catalog: Static catalog listing every ilce
+            cache_service: Cache holding the popularity ranking and progress
+            concurrency: Upstream requests in flight at most
+            rate: Upstream requests started per second at most
+            max_retries: Attempts per ilce after the first one fails
+        """
+        self.prayer_times = prayer_times
+        self.catalog = catalog
+        self.cache_service = cache_service
+        self.concurrency = concurrency
+        self.rate = rate
+        self.max_retries = max_retries
+        self.progress: dict[str, Any] = {}
+
+    async def ranked_ilces(self) -> list[int]:
+        """Every ilce in the catalog, the most requested ones first."""
+        hits = await self._popularity()
+        ilce_ids = {
+            int(ilce["IlceID"])
+            for ilceler in self.catalog.ilceler.values()
+            for ilce in ilceler
+        }
+        return sorted(ilce_ids, key=lambda ilce: (-hits[ilce], ilce))
+
+    async def save_popularity(self) -> None:
+        """Add this worker's hit counts to the shared ranking."""
+        hits = Counter(self.prayer_times.hits)
+        if not hits:
+            return
+        self.prayer_times.hits.clear()
+        try:
+            await self.cache_service.increment(
+                POPULARITY_KEY,
+                {str(ilce): count for ilce, count in hits.items()},
+                timeout=30 * 24 * 60 * 60,
+            )
+        except Exception:
+            # Keep them for the next attempt
+            self.prayer_times.hits.update(hits)
+            raise
+
+    async def run(self, limit: int | None = None) -> dict[str, Any]:
+        """
+        Warm every ilce once.
+
+        Args:
+            limit: Only warm this many of the most requested ilces
+
+        Returns:
+            The final progress report
+        """
+        today = date.today()
+        ilce_ids = (await self.ranked_ilces())[:limit]
+        self.progress = {
+            "date": today.isoformat(),
+            "total": len(ilce_ids),
+            "done": 0,
+            "fetched": 0,
+            "skipped": 0,
+            "failed": 0,
+            "started_at": time.time(),
+            "finished_at": None,
+        }
+        logger.info(f"Warming prayer times of {len(ilce_ids)} ilces")
+
+        queue: asyncio.Queue[int] = asyncio.Queue()
+        for ilce in ilce_ids:
+            queue.put_nowait(ilce)
+
+        limiter = RateLimiter(self.rate)
+        workers = [
+            asyncio.create_task(self._worker(queue, limiter, today))
+            for _ in range(self.concurrency)
+        ]
+        try:
+            await asyncio.gather(*workers)
+        finally:
+            for worker in workers:
+                worker.cancel()
+            self.progress["finished_at"] = time.time()
+            await self._report()
+
+        return self.progress
+
+    async def run_forever(self) -> None:
+        """
+        Warm at startup, then shortly after every local midnight.
+
+        Only one worker runs each warm-up; the others skip it rather than
+        wait for the lock.
+        """
+        await self._run_logged()
+        while True:
+            now = datetime.now()
+            next_run = datetime.combine(
+                now.date() + timedelta(days=1), datetime.min.time()
+            )
+            await asyncio.sleep((next_run - now).total_seconds() + 5 * 60)
+            await self._run_logged()
+
+    async def _run_logged(self) -> None:
+        try:
+            await self.save_popularity()
+            async with self.cache_service.lock(
+                "warmup", timeout=LOCK_TIMEOUT, blocking=False
+            ) as acquired:
+                if not acquired:
+                    logger.info("Warm-up already running in another worker")
+                    return
+                await self.run()
+        except Exception:
+            logger.exception("Prayer times warm-up failed")
+
+    async def _worker(
+        self, queue: asyncio.Queue[int], limiter: RateLimiter, today: date
+    ) -> None:
+        while not queue.empty():
+            ilce = queue.get_nowait()
+            result = await self._warm(ilce, limiter, today)
+            self.progress[result] += 1
+            self.progress["done"] += 1
+            if self.progress["done"] % 100 == 0:
+                await self._report()
+
+    async def _warm(self, ilce: int, limiter: RateLimiter, today: date) -> str:
+        # Only upstream calls count against the rate limit
+        if not await self.prayer_times.needs_refresh(ilce, today):
+            return "skipped"
+
+        for attempt in range(self.max_retries + 1):
+            await limiter.acquire()
+            try:
+                refreshed = await self.prayer_times.warm(ilce, today)
+                return "fetched" if refreshed else "skipped"
+            except Exception as e:
+                if attempt == self.max_retries:
+                    logger.error(f"Giving up warming ilce {ilce}: {e}")
+                    return "failed"
+                backoff = min(2**attempt, 60) + random.random()
+                logger.warning(
+                    f"Warming ilce {ilce} failed ({e}), retry in {backoff:.1f}s"
+                )
+                await asyncio.sleep(backoff)
+        return "failed"
+
+    async def _popularity(self) -> Counter[int]:
+        counts = await self.cache_service.get_counts(POPULARITY_KEY)
+        hits: Counter[int] = Counter(
+            {int(ilce): count for ilce, count in counts.items()}
+        )
+        hits.update(self.prayer_times.hits)
+        return hits
+
+    async def _report(self) -> None:
+        progress = self.progress
+        logger.info(
+            f"Warm-up {progress['done']}/{progress['total']}: "
+            f"{progress['fetched']} fetched, {progress['skipped']} already stored, "
+            f"{progress['failed']} failed"
+        )
+        await self.cache_service.set(
+            PROGRESS_KEY, json.dumps(progress), timeout=7 * 24 * 60 * 60
+        )
+
+
+async def main() -> None:
+    """Run a single warm-up from the command line."""
+    from app.routes import api_client, catalog, warmup
+
+    parser = argparse.ArgumentParser(description="Warm the prayer times cache")
+    parser.add_argument("--limit", type=int, help="only the N most requested ilces")
+    parser.add_argument("--concurrency", type=int)
+    parser.add_argument("--rate", type=float, help="upstream requests per second")
+    args = parser.parse_args()
+
+    if args.concurrency:
+        warmup.concurrency = args.concurrency
+    if args.rate:
+        warmup.rate = args.rate
+
+    catalog.load()
+    await api_client.open()
+    try:
+        progress = await warmup.run(limit=args.limit)
+    finally:
+        await api_client.close()
+    print(json.dumps(progress, indent=2))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(message)s")
+    asyncio.run(main())
@@ -1,6 +1,5 @@
-import json
+import hashlib
 from pathlib import Path
-from typing import Any
 
 from fastapi import HTTPException
 from starlette.requests import Request
@@ -24,15 +23,71 @@ def get_int_param(request: Request, param_name: str) -> int:
         ) from None
 
 
-def load_json_data(subdir: str, file_id: int, error_detail: str) -> Any:
-    """Load JSON data from a static file."""
-    try:
-        file_path = STATIC_DATA_PATH / subdir / f"{file_id}.json"
-        with open(file_path, encoding="utf-8") as f:
-            return json.load(f)
-    except FileNotFoundError:
-        raise HTTPException(status_code=404, detail=error_detail) from None
-    except (json.JSONDecodeError, IOError) as e:
-        raise HTTPException(
-            status_code=500, detail=f"Error loading data: {error_detail}"
-        ) from e
+def make_etag(body: bytes) -> str:
+    """Strong ETag of a response body."""
+    return f'"{hashlib.blake2b(body, digest_size=16).hexdigest()}"'
+
+
+def etag_matches(if_none_match: str | None, etag: str) -> bool:
+    """Check an If-None-Match header value against an ETag."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+def accepted_encodings(accept_encoding: str | None) -> dict[str, float]:
+    """
+    Parse an Accept-Encoding header value into codings and their q-values.
+
+    Codings listed with q=0 are kept with 0.0, so they can be told apart from
+    codings not listed at all (which fall back to "*", if present).
+    """
+    encodings: dict[str, float] = {}
+    for item in (accept_encoding or "").split(","):
+        coding, *params = (part.strip() for part in item.split(";"))
+        if not coding:
+            continue
+        quality = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = min(max(float(value), 0.0), 1.0)
+                except ValueError:
+                    quality = 0.0
+        encodings[coding.lower()] = quality
+    return encodings
+
+
+def encoding_quality(encodings: dict[str, float], coding: str) -> float:
+    """q-value of a coding in parsed Accept-Encoding, 0.0 if not acceptable."""
+    return encodings.get(coding, encodings.get("*", 0.0))
+
+
+def preferred_encoding(
+    accept_encoding: str | None, codings: tuple[str, ...]
+) -> str | None:
+    """
+    Pick the content coding to send a response with.
+
+    Args:
+        accept_encoding: Accept-Encoding header value of the request
+        codings: Codings the response is available in, preferred first on
+            equal q-values
+
+    Returns:
+        The acceptable coding with the highest q-value, None to send the
+        body as is
+    """
+    encodings = accepted_encodings(accept_encoding)
+    best, best_quality = None, 0.0
+    for coding in codings:
+        quality = encoding_quality(encodings, coding)
+        if quality > best_quality:
+            best, best_quality = coding, quality
+    return best
@@ -0,0 +1,1087 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmarks for the hot paths of the API.
+Run from the repository root: python -m scripts.benchmark <name>
+"""
+
+import argparse
+import asyncio
+import gc
+import json
+import math
+import os
+import resource
+import sys
+import time
+import tracemalloc
+from collections.abc import Callable
+from datetime import date, timedelta
+from pathlib import Path
+from typing import Any
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+
+def _rss_kb() -> int:
+    """Current resident set size in KB (falls back to peak RSS off Linux)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() // 1024
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def bench_catalog() -> None:
+    """Startup time and resident memory of the location catalog, JSON vs. bundle."""
+    import multiprocessing
+    import shutil
+    import tempfile
+    from concurrent.futures import ProcessPoolExecutor
+
+    from app.services.bundle import BUNDLE_NAME
+    from app.utils import STATIC_DATA_PATH
+
+    json_only = Path(tempfile.mkdtemp())
+    shutil.copytree(
+        STATIC_DATA_PATH,
+        json_only,
+        dirs_exist_ok=True,
+        ignore=shutil.ignore_patterns(BUNDLE_NAME),
+    )
+    # Every load in a fresh process, so nothing of an earlier one is still
+    # alive, or freed, while it is measured
+    spawn = multiprocessing.get_context("spawn")
+    try:
+        for name, data_path in (("json", json_only), ("bundle", STATIC_DATA_PATH)):
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                elapsed, rss_growth, payload_us = pool.submit(
+                    _load_catalog, data_path, False
+                ).result()
+            with ProcessPoolExecutor(1, mp_context=spawn) as pool:
+                current, peak = pool.submit(_load_catalog, data_path, True).result()
+            print(f"== {name}")
+            print(f"load and prepare:    {elapsed * 1000:8.1f} ms")
+            print(
+                f"prepared heap size:  {current / 1024:8.0f} KB "
+                f"(peak {peak / 1024:.0f} KB)"
+            )
+            print(f"process RSS growth:  {rss_growth:8d} KB")
+            print(f"payload lookup:      {payload_us:8.2f} us")
+    finally:
+        shutil.rmtree(json_only)
+
+
+def _load_catalog(data_path: Path, trace: bool) -> tuple:
+    """
+    Load and prepare a catalog in this process.
+
+    Returns:
+        (heap size, peak heap size) in bytes if trace is set, else (load time
+        in seconds, RSS growth in KB, payload lookup time in us);
+        tracemalloc would skew the timing
+    """
+    from app.services.catalog import LocationCatalog
+
+    gc.collect()
+    rss_before = _rss_kb()
+    if trace:
+        tracemalloc.start()
+    started = time.perf_counter()
+    catalog = LocationCatalog(data_path)
+    catalog.load()
+    catalog.prepare()
+    elapsed = time.perf_counter() - started
+    if trace:
+        return tracemalloc.get_traced_memory()
+    gc.collect()
+    rss_growth = _rss_kb() - rss_before
+    payload_us = _timeit(lambda: catalog.get_payload("/ilceler/539"), 10_000)
+    return elapsed, rss_growth, payload_us
+
+
+def _timeit(fn: Callable[[], object], rounds: int) -> float:
+    """Mean wall time of fn in microseconds."""
+    started = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started) / rounds * 1e6
+
+
+def bench_static() -> None:
+    """Per-request cost of serializing location responses vs. prepared bytes."""
+    import json
+
+    from pydantic import TypeAdapter
+    from starlette.requests import Request
+
+    from app.models.domain import Ilce, Lookup, Ulke
+    from app.services.catalog import LocationCatalog
+    from app.services.prepared import prepared_response
+
+    catalog = LocationCatalog()
+    catalog.load()
+    catalog.prepare()
+
+    request = Request(
+        {
+            "type": "http",
+            "method": "GET",
+            "path": "/",
+            "headers": [(b"accept-encoding", b"gzip, deflate, br")],
+        }
+    )
+    largest_ilce = max(catalog.ilceler, key=lambda k: len(catalog.ilceler[k]))
+    cases = [
+        ("/ulkeler", catalog.ulkeler, Ulke),
+        (f"/ilceler/{largest_ilce}", catalog.ilceler[largest_ilce], Ilce),
+        ("/lookup", catalog.lookup, Lookup),
+    ]
+    for path, records, model in cases:
+        adapter = TypeAdapter(list[model])
+        payload = catalog.get_payload(path)
+        assert payload is not None
+        rounds = 20 if model is Lookup else 500
+
+        def serialize(records=records, adapter=adapter):
+            # validate + encode (route) and decode + re-encode (CacheMiddleware)
+            body = json.dumps(
+                adapter.dump_python(adapter.validate_python(records)),
+                ensure_ascii=False,
+                separators=(",", ":"),
+            )
+            json.dumps(json.loads(body))
+
+        serialized = _timeit(serialize, rounds)
+        prepared = _timeit(lambda p=payload: prepared_response(request, p), rounds)
+        print(
+            f"{path:14} serialize {serialized:10.1f} us   prepared {prepared:6.1f} us"
+            f"   x{serialized / prepared:.0f}"
+        )
+
+
+def _app_env() -> None:
+    """Settings the app needs to import, pointing at an unreachable upstream."""
+    os.environ.setdefault("API_USERNAME", "benchmark")
+    os.environ.setdefault("API_PASSWORD", "benchmark")
+    os.environ.setdefault("API_URL", "http://127.0.0.1:9")
+    os.environ.setdefault("CACHE_TYPE", "memory")
+
+
+def _fake_api_response(days: int = 30, start: date | None = None) -> dict:
+    """A monthly Diyanet payload in the recorded upstream format."""
+    start = start or date.today()
+    times = {
+        "imsak": "06:41",
+        "gunes": "08:12",
+        "ogle": "13:08",
+        "ikindi": "15:35",
+        "aksam": "17:53",
+        "yatsi": "19:19",
+        "gunes_dogus": "08:12",
+        "gunes_batis": "17:53",
+        "kible_saati": "11:55",
+    }
+    namaz_vakti = []
+    for offset in range(days):
+        day = start + timedelta(days=offset)
+        namaz_vakti.append(
+            {
+                **{
+                    name: f"{day.isoformat()}T{hhmm}:00" for name, hhmm in times.items()
+                },
+                "hicri_tarih_uzun": f"{offset + 1} Recep 1446",
+                "hicri_tarih_kisa": f"{offset + 1}.7.1446",
+                "miladi_tarih_uzun": day.strftime("%d %B %Y %A"),
+                "miladi_tarih_uzun_Iso8601": f"{day}T00:00:00.0000000+03:00",
+                "miladi_tarih_kisa_Iso8601": day.strftime("%d.%m.%Y"),
+                "ayin_sekli_url": "https://namazvakti.diyanet.gov.tr/images/r1.gif",
+            }
+        )
+    return {
+        "success": True,
+        "resultMessage": {"messageType": 0, "messageContent": "", "messageCode": 0},
+        "resultObject": {
+            "konum": {"konum_Id": 9146, "timezone": "Europe/Istanbul"},
+            "namazVakti": namaz_vakti,
+        },
+    }
+
+
+def bench_singleflight() -> None:
+    """Upstream calls produced by N concurrent /vakitler misses for one ilce."""
+    _app_env()
+    import httpx
+
+    from app.main import app
+    from app.models.schemas import ExternalApiResponse
+    from app.routes import api_client
+
+    upstream_calls = 0
+    api_response = ExternalApiResponse.model_validate(_fake_api_response())
+
+    async def fake_upstream(ilce_id: str) -> ExternalApiResponse:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.05)  # upstream latency
+        return api_response
+
+    api_client.get_monthly_prayer_times = fake_upstream  # type: ignore[method-assign]
+
+    async def burst(n: int, ilce: int) -> tuple[int, float]:
+        nonlocal upstream_calls
+        upstream_calls = 0
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            started = time.perf_counter()
+            responses = await asyncio.gather(
+                *(c.get(f"/vakitler/{ilce}") for _ in range(n))
+            )
+            elapsed = time.perf_counter() - started
+        assert all(r.status_code == 200 for r in responses)
+        return upstream_calls, elapsed
+
+    for ilce, n in enumerate((1, 10, 100, 1000), start=1):
+        calls, elapsed = asyncio.run(burst(n, ilce))
+        print(
+            f"{n:5d} concurrent misses -> {calls} upstream call(s) in {elapsed:.2f} s"
+        )
+
+
+async def _asgi_get(
+    app: Any, path: str, headers: dict[str, str] | None = None
+) -> list[tuple[float, bytes]]:
+    """
+    GET a path straight through the ASGI app.
+
+    Returns:
+        (perf_counter when sent, body) of every body chunk; unlike the httpx
+        transport, this shows when streamed chunks leave the app
+    """
+    received = False
+    chunks: list[tuple[float, bytes]] = []
+
+    async def receive() -> dict:
+        nonlocal received
+        if received:
+            await asyncio.Event().wait()
+        received = True
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message: dict) -> None:
+        if message["type"] == "http.response.body":
+            chunks.append((time.perf_counter(), message.get("body", b"")))
+
+    path, _, query_string = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "root_path": "",
+        "query_string": query_string.encode(),
+        "headers": [
+            (b"host", b"benchmark"),
+            *((k.encode(), v.encode()) for k, v in (headers or {}).items()),
+        ],
+        "client": ("127.0.0.1", 1),
+        "server": ("benchmark", 80),
+    }
+    await app(scope, receive, send)
+    return chunks
+
+
+def bench_batch() -> None:
+    """Prayer times of every ilce of a sehir: one request each vs. one batch."""
+    _app_env()
+    import httpx
+
+    from app.main import app
+    from app.models.schemas import ExternalApiResponse
+    from app.routes import api_client, catalog, prayer_times
+
+    catalog.load()
+    api_response = ExternalApiResponse.model_validate(_fake_api_response())
+    upstream_calls = 0
+
+    async def fake_upstream(ilce_id: str) -> ExternalApiResponse:
+        nonlocal upstream_calls
+        upstream_calls += 1
+        await asyncio.sleep(0.05)  # upstream latency
+        return api_response
+
+    api_client.get_monthly_prayer_times = fake_upstream  # type: ignore[method-assign]
+
+    async def run(sehir: int) -> None:
+        nonlocal upstream_calls
+        ilces = [int(ilce["IlceID"]) for ilce in catalog.get_ilceler(sehir) or []]
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://b") as c:
+            for state in ("cold", "warm"):
+                # Forget the worker's copy so both runs start from the cache
+                prayer_times._days.clear()
+                upstream_calls = 0
+                started = time.perf_counter()
+                chunks = await _asgi_get(app, f"/vakitler/sehir/{sehir}")
+                first = chunks[0][0] - started
+                batch = chunks[-1][0] - started
+                served = json.loads(b"".join(chunk for _, chunk in chunks))
+                assert sorted(map(int, served)) == sorted(ilces)
+                assert all(vakitler for vakitler in served.values())
+                print(
+                    f"sehir {sehir} ({len(ilces)} ilces) {state}: batch "
+                    f"{batch * 1000:7.1f} ms (first bytes {first * 1000:5.1f} ms, "
+                    f"{upstream_calls} upstream calls)"
+                )
+
+            prayer_times._days.clear()
+            started = time.perf_counter()
+            for ilce in ilces:
+                await c.get(f"/vakitler/{ilce}", headers={"cache-control": "no-cache"})
+            print(
+                f"sehir {sehir} ({len(ilces)} ilces) warm: one request each "
+                f"{(time.perf_counter() - started) * 1000:7.1f} ms"
+            )
+
+    for sehir in (539, 506):
+        asyncio.run(run(sehir))
+
+
+def bench_streaming() -> None:
+    """Time to first byte and memory of the largest location responses."""
+    _app_env()
+    import statistics
+
+    from app.main import app
+    from app.routes import catalog
+
+    catalog.load()
+    catalog.prepare()
+    payloads = catalog.payloads
+    largest = max(catalog.ilceler, key=lambda sehir: len(catalog.ilceler[sehir]))
+
+    async def measure(path: str) -> tuple[float, float, int]:
+        started = time.perf_counter()
+        chunks = await _asgi_get(app, path, {"accept-encoding": "gzip"})
+        return (
+            chunks[0][0] - started,
+            chunks[-1][0] - started,
+            sum(len(chunk) for _, chunk in chunks),
+        )
+
+    async def rss_growth(path: str, concurrency: int = 20) -> int:
+        gc.collect()
+        before = peak = _rss_kb()
+
+        async def one() -> None:
+            nonlocal peak
+            await _asgi_get(app, path, {"accept-encoding": "gzip"})
+            peak = max(peak, _rss_kb())
+
+        await asyncio.gather(*(one() for _ in range(concurrency)))
+        return peak - before
+
+    # Least memory hungry first: RSS rarely shrinks once grown
+    modes = (
+        ("json, prepared", "", True),
+        ("ndjson", "format=ndjson", False),
+        ("json, serialized", "", False),
+    )
+    for base in ("/lookup", f"/ilceler/{largest}"):
+        for name, query, prepared in modes:
+            catalog.payloads = payloads if prepared else {}
+            path = f"{base}?{query}" if query else base
+            runs = [asyncio.run(measure(path)) for _ in range(20)]
+            ttfb = statistics.median(run[0] for run in runs) * 1000
+            total = statistics.median(run[1] for run in runs) * 1000
+
+            gc.collect()
+            tracemalloc.start()
+            asyncio.run(measure(path))
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            growth = asyncio.run(rss_growth(path))
+            print(
+                f"{base:13} {name:17} first byte {ttfb:6.2f} ms  "
+                f"last {total:6.2f} ms  {runs[0][2]:6} B gzip  "
+                f"peak heap {peak / 1024:6.0f} KB  RSS +{growth} KB (20 concurrent)"
+            )
+    catalog.payloads = payloads
+
+
+def bench_middleware() -> None:
+    """Requests per second through the full app with a local load generator."""
+    _app_env()
+    from app.main import app
+    from app.models.schemas import ExternalApiResponse
+    from app.routes import api_client, catalog
+
+    api_response = ExternalApiResponse.model_validate(_fake_api_response())
+
+    async def fake_upstream(ilce_id: str) -> ExternalApiResponse:
+        return api_response
+
+    api_client.get_monthly_prayer_times = fake_upstream  # type: ignore[method-assign]
+    catalog.load()
+    catalog.prepare()
+
+    etags: dict[str, bytes] = {}
+
+    async def request(path: str, headers: list[tuple[bytes, bytes]]) -> int:
+        status = 0
+        path, _, query = path.partition("?")
+        scope = {
+            "type": "http",
+            "asgi": {"version": "3.0"},
+            "http_version": "1.1",
+            "method": "GET",
+            "scheme": "http",
+            "path": path,
+            "raw_path": path.encode(),
+            "query_string": query.encode(),
+            "root_path": "",
+            "headers": [(b"host", b"benchmark"), *headers],
+            "client": ("127.0.0.1", 50000),
+            "server": ("127.0.0.1", 80),
+        }
+
+        async def receive() -> dict:
+            return {"type": "http.request", "body": b"", "more_body": False}
+
+        async def send(message: dict) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                etags[path] = dict(message["headers"]).get(b"etag", b"")
+
+        await app(scope, receive, send)
+        return status
+
+    async def load(
+        paths: Callable[[int], str],
+        headers: list[tuple[bytes, bytes]],
+        total: int,
+        concurrency: int = 50,
+    ) -> float:
+        counter = iter(range(total))
+
+        async def client() -> None:
+            for i in counter:
+                assert await request(paths(i), headers) in (200, 304)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(concurrency)))
+        return total / (time.perf_counter() - started)
+
+    async def run() -> None:
+        plain: list[tuple[bytes, bytes]] = []
+        gzip = [(b"accept-encoding", b"gzip")]
+        revalidate: list[tuple[bytes, bytes]] = []
+        cases = [
+            ("/up (uncached)", lambda i: "/up", plain, 5_000),
+            ("/ulkeler (prepared)", lambda i: "/ulkeler", plain, 5_000),
+            ("/vakitler miss", lambda i: f"/vakitler/{10_000 + i}", plain, 2_000),
+            ("/vakitler hit", lambda i: "/vakitler/9146", plain, 5_000),
+            ("/vakitler hit gzip", lambda i: "/vakitler/9146", gzip, 5_000),
+            ("/vakitler 304", lambda i: "/vakitler/9146", revalidate, 5_000),
+        ]
+        await request("/vakitler/9146", plain)
+        revalidate.append((b"if-none-match", etags["/vakitler/9146"]))
+        for name, paths, headers, total in cases:
+            await load(paths, headers, total // 10)
+            if name == "/vakitler miss":
+                # the warm-up round above used the first ilces, start afresh
+                paths = lambda i: f"/vakitler/{20_000 + i}"  # noqa: E731
+            rate = await load(paths, headers, total)
+            print(f"{name:20} {rate:8.0f} req/s")
+
+    asyncio.run(run())
+
+
+def bench_cache_entry() -> None:
+    """Hit cost and stored size of a cached /vakitler response, JSON vs binary."""
+    import gzip
+    import hashlib
+    import json
+
+    from pydantic import TypeAdapter
+
+    from app.infrastructure.cache.entry import CacheEntry
+    from app.models.domain import Vakit
+    from app.models.schemas import ExternalApiResponse, convert_vakit_response
+
+    vakitler = convert_vakit_response(
+        ExternalApiResponse.model_validate(_fake_api_response())
+    )
+    body = TypeAdapter(list[Vakit]).dump_json(vakitler)
+    headers = {"content-type": "application/json", "content-length": str(len(body))}
+
+    # The previous format: the parsed body nested in a JSON wrapper
+    content = json.loads(body)
+    etag = hashlib.md5(json.dumps(content).encode()).hexdigest()
+    json_value = json.dumps(
+        {
+            "content": content,
+            "status_code": 200,
+            "headers": {**headers, "etag": etag},
+            "etag": etag,
+            "fresh_until": time.time(),
+        }
+    ).encode()
+
+    def json_hit() -> bytes:
+        cached_data = json.loads(json_value.decode("utf-8"))
+        return json.dumps(
+            cached_data["content"],
+            ensure_ascii=False,
+            allow_nan=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+
+    def json_hit_gzip() -> bytes:
+        return gzip.compress(json_hit())
+
+    entry = CacheEntry(
+        status=200,
+        etag=hashlib.md5(body).hexdigest(),
+        content_type="application/json",
+        body=body,
+        fresh_until=time.time(),
+    )
+    binary_value = entry.dumps()
+    gzip_value = entry._replace(body=gzip.compress(body, mtime=0), gzip=True).dumps()
+
+    def binary_hit(value: bytes = binary_value) -> bytes:
+        entry = CacheEntry.loads(value)
+        assert entry is not None
+        return entry.body
+
+    def gzip_hit_identity() -> bytes:
+        return gzip.decompress(binary_hit(gzip_value))
+
+    cases = [
+        ("json", json_value, json_hit, json_hit_gzip),
+        ("binary", binary_value, binary_hit, lambda: gzip.compress(binary_hit())),
+        ("binary+gzip", gzip_value, gzip_hit_identity, lambda: binary_hit(gzip_value)),
+    ]
+    print(f"{'':12} {'stored':>8} {'hit':>10} {'hit (gzip)':>12}")
+    for name, value, hit, hit_gzip in cases:
+        print(
+            f"{name:12} {len(value):6d} B {_timeit(hit, 2_000):7.1f} us"
+            f" {_timeit(hit_gzip, 2_000):9.1f} us"
+        )
+
+    # Redis adds its own overhead per key; measure it when a server is reachable
+    import redis
+
+    from app.core.config import get_settings
+
+    _app_env()
+    client = redis.Redis.from_url(get_settings().redis_url)
+    try:
+        for name, value, _, _ in cases:
+            client.set(f"benchmark:{name}", value)
+            usage = client.memory_usage(f"benchmark:{name}")
+            client.delete(f"benchmark:{name}")
+            print(f"{name:12} redis MEMORY USAGE {usage} B")
+    except redis.ConnectionError:
+        print("redis not reachable, skipping MEMORY USAGE")
+
+
+class _ScanningMemoryBackend:
+    """The previous InMemoryCacheBackend: unbounded, scanned on every get."""
+
+    def __init__(self):
+        self.cache: dict[str, dict] = {}
+        self._cleanup_lock = asyncio.Lock()
+
+    async def get(self, key: str) -> bytes | None:
+        if len(self.cache) > 100:
+            asyncio.create_task(self._cleanup_expired())
+        item = self.cache.get(key)
+        if not item:
+            return None
+        if item["expires"] < asyncio.get_event_loop().time():
+            del self.cache[key]
+            return None
+        return item["value"]
+
+    async def set(self, key: str, value: bytes, timeout: int) -> None:
+        expires = asyncio.get_event_loop().time() + timeout
+        self.cache[key] = {"value": value, "expires": expires}
+
+    async def _cleanup_expired(self) -> None:
+        async with self._cleanup_lock:
+            now = asyncio.get_event_loop().time()
+            expired = [k for k, item in self.cache.items() if item["expires"] < now]
+            for key in expired:
+                del self.cache[key]
+
+
+def bench_cache_replay() -> None:
+    """Replay request-shaped key distributions against the in-memory cache."""
+    import random
+
+    from app.infrastructure.cache.backends import InMemoryCacheBackend
+    from app.services.catalog import LocationCatalog
+
+    catalog = LocationCatalog()
+    catalog.load()
+    ilce_ids = [
+        int(ilce["IlceID"]) for ilceler in catalog.ilceler.values() for ilce in ilceler
+    ]
+    rng = random.Random(42)
+    rng.shuffle(ilce_ids)  # popularity does not follow the ID order
+    total = 200_000
+    value = rng.randbytes(1000)  # a gzipped /vakitler entry
+
+    def zipf(n: int) -> list[str]:
+        # Request popularity of ilces roughly follows Zipf's law
+        weights = [1 / rank for rank in range(1, len(ilce_ids) + 1)]
+        return [
+            f"GET:/vakitler/{ilce}:"
+            for ilce in rng.choices(ilce_ids, weights=weights, k=n)
+        ]
+
+    def with_warmup(keys: list[str]) -> list[str]:
+        # The warm-up walks every ilce once while requests keep coming in
+        walk = iter(f"vakitler:days:{ilce}" for ilce in ilce_ids * 100)
+        return [key if i % 3 else next(walk) for i, key in enumerate(keys)]
+
+    traces = {
+        "zipf": (zipf(total), 24 * 60 * 60),
+        "zipf+warmup": (with_warmup(zipf(total)), 24 * 60 * 60),
+        "zipf, 1 s ttl": (zipf(total), 1),
+    }
+    backends: dict[str, Callable[[], object]] = {
+        "unbounded+scan": _ScanningMemoryBackend,
+        "lru 1000": lambda: InMemoryCacheBackend(1000, 2**30),
+        "tinylfu 1000": lambda: InMemoryCacheBackend(1000, 2**30, tinylfu=True),
+    }
+
+    async def replay(backend, keys: list[str], timeout: int) -> tuple[float, float]:
+        hits = 0
+        started = time.perf_counter()
+        for key in keys:
+            if await backend.get(key) is not None:
+                hits += 1
+            else:
+                await backend.set(key, value, timeout)
+        await asyncio.sleep(0)  # let pending cleanups finish
+        return len(keys) / (time.perf_counter() - started), hits / len(keys)
+
+    print(f"{len(ilce_ids)} ilces, {total} requests per trace")
+    for trace, (keys, timeout) in traces.items():
+        for name, backend in backends.items():
+            # The scanning backend is too slow for the whole trace
+            sample = keys[: total // 20] if name == "unbounded+scan" else keys
+            rate, hit_ratio = asyncio.run(replay(backend(), sample, timeout))
+            print(f"{trace:14} {name:15} {rate:9.0f} ops/s  hit ratio {hit_ratio:.3f}")
+
+
+def bench_nearby() -> None:
+    """Nearest-ilce queries: KD-tree vs. brute force, checked against each other."""
+    import random
+
+    from app.services.catalog import LocationCatalog
+    from app.services.nearby import NearestIlceIndex, haversine
+
+    catalog = LocationCatalog()
+    catalog.load()
+    records = catalog.lookup
+
+    started = time.perf_counter()
+    index = NearestIlceIndex(records)
+    print(
+        f"index of {len(index)} ilces built in "
+        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+
+    def brute_force(lat: float, lon: float, k: int) -> list[float]:
+        return sorted(haversine(lat, lon, r["lat"], r["lon"]) for r in records)[:k]
+
+    rng = random.Random(42)
+    # Uniform points on the sphere, and points close to ilces as users would be
+    uniform = [
+        (math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180))
+        for _ in range(500)
+    ]
+    near_ilces = [
+        (r["lat"] + rng.gauss(0, 0.05), r["lon"] + rng.gauss(0, 0.05))
+        for r in rng.sample(records, 500)
+    ]
+
+    for name, points in (("uniform", uniform), ("near ilces", near_ilces)):
+        for k in (1, 5, 50):
+            for lat, lon in points:
+                distances = [d for d, _ in index.nearest(lat, lon, k)]
+                expected = brute_force(lat, lon, k)
+                assert all(
+                    math.isclose(a, b, abs_tol=1e-9)
+                    for a, b in zip(distances, expected, strict=True)
+                ), (lat, lon, k)
+
+            queries = iter(points * 1000)
+            tree = _timeit(lambda k=k, q=queries: index.nearest(*next(q), k), 2_000)
+            brute = _timeit(lambda k=k, q=queries: brute_force(*next(q), k), 50)
+            print(
+                f"{name:10} k={k:<3} kd-tree {tree:7.1f} us   brute force "
+                f"{brute:8.1f} us   x{brute / tree:.0f}"
+            )
+    print("all results match brute force")
+
+
+def bench_search() -> None:
+    """Place search: index build time and latency per kind of query."""
+    from app.services.catalog import LocationCatalog
+    from app.services.search import PlaceSearchIndex, fold
+
+    catalog = LocationCatalog()
+    catalog.load()
+
+    fold.cache_clear()
+    started = time.perf_counter()
+    index = PlaceSearchIndex(
+        catalog.lookup, catalog.ulkeler, catalog.sehirler, catalog.ilceler
+    )
+    print(
+        f"index of {len(index)} entries built in "
+        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+
+    queries = {
+        "exact": ["İSTANBUL", "ankara", "Köln", "Berlin"],
+        "ascii": ["istanbul", "izmir", "igdir", "koln", "canakkale"],
+        "prefix": ["ist", "anka", "mün", "bad h", "s"],
+        "multi-word": ["istanbul türkiye", "berlin germany", "paris fransa"],
+        "typo": ["istnbul", "ankra", "berlinn", "mnchen"],
+        "no match": ["xyzzy", "qqqq"],
+    }
+    for kind, samples in queries.items():
+        for query in samples:
+            results = index.search(query)
+            assert all(r in catalog.lookup for r in results)
+        per_query = _timeit(
+            lambda samples=samples: [index.search(q) for q in samples], 500
+        ) / len(samples)
+        top = index.search(samples[0], 1)
+        print(
+            f"{kind:10} {per_query:7.1f} us/query   "
+            f"{samples[0]!r} -> {top[0]['IlceAdi'] if top else None}"
+        )
+
+
+def bench_lookup() -> None:
+    """Body size and server time of /lookup slices vs. the full list."""
+    from pydantic import TypeAdapter
+
+    from app.models.domain import Lookup
+    from app.services.catalog import LocationCatalog
+    from app.services.lookup import LookupIndex
+
+    catalog = LocationCatalog()
+    catalog.load()
+    adapter = TypeAdapter(list[Lookup])
+
+    started = time.perf_counter()
+    index = LookupIndex(catalog.lookup, catalog.ulkeler, catalog.sehirler)
+    print(
+        f"index of {len(index)} entries built in "
+        f"{(time.perf_counter() - started) * 1000:.1f} ms"
+    )
+    full = _timeit(
+        lambda: adapter.dump_json(adapter.validate_python(catalog.lookup)), 20
+    )
+    print(f"{'validate + serialize all (before)':40} {full:9.0f} us")
+
+    cases = {
+        "all": {},
+        "ulke=turkiye": {"ulke": "turkiye"},
+        "ulke=almanya, IlceID,lat,lon": {
+            "ulke": "almanya",
+            "fields": ("IlceID", "lat", "lon"),
+        },
+        "IlceID,lat,lon columnar": {
+            "fields": ("IlceID", "lat", "lon"),
+            "columnar": True,
+        },
+        "sehir=istanbul": {"sehir": "istanbul"},
+        "limit=100": {"limit": 100},
+    }
+    base = index.page()
+    for name, params in cases.items():
+
+        def build(params: dict = params) -> None:
+            index._pages.clear()
+            index.page(**params)
+
+        built = _timeit(build, 5)
+        cached = _timeit(lambda params=params: index.page(**params), 10_000)
+        payload = index.page(**params).payload
+        print(
+            f"{name:40} build {built:7.0f} us  cached {cached:5.2f} us  "
+            f"{len(payload.body):7} B ({len(payload.gzip):6} B gzip, "
+            f"x{len(base.payload.gzip) / len(payload.gzip):.0f} smaller)"
+        )
+
+
+def bench_slices() -> None:
+    """Size and build time of /vakitler responses for a day, a week, the month."""
+    import gzip
+
+    from pydantic import TypeAdapter
+
+    from app.models.compact import PrayerDays
+    from app.models.domain import Vakit
+    from app.models.schemas import ExternalApiResponse, convert_vakit_response
+
+    today = date.today()
+    adapter = TypeAdapter(list[Vakit])
+    days = PrayerDays.from_vakitler(
+        convert_vakit_response(
+            ExternalApiResponse.model_validate(_fake_api_response())
+        ),
+        fetched_on=today,
+    )
+
+    month = adapter.dump_json(days.to_vakitler(since=today))
+    for name, until in (
+        ("month", None),
+        ("week", today + timedelta(days=6)),
+        ("today", today),
+    ):
+        body = adapter.dump_json(days.to_vakitler(since=today, until=until))
+        cost = _timeit(
+            lambda until=until: adapter.dump_json(
+                days.to_vakitler(since=today, until=until)
+            ),
+            2_000,
+        )
+        print(
+            f"{name:6} {cost:7.1f} us  {len(body):6} B "
+            f"({len(gzip.compress(body)):5} B gzip)  "
+            f"x{len(month) / len(body):.0f} smaller"
+        )
+
+
+def bench_transform() -> None:
+    """Full and no-op runs of scripts/transform.py over the shipped locations."""
+    import logging
+    import shutil
+    import tempfile
+
+    from scripts import transform
+
+    logging.getLogger(transform.__name__).setLevel(logging.WARNING)
+    shipped = Path(transform.DEST_DIR)
+    tmp = Path(tempfile.mkdtemp())
+    try:
+        # Rebuild the downloaded files the shipped ones were transformed from
+        raw = tmp / "raw"
+        countries = json.loads((shipped / "countries.json").read_text())
+        (raw / "sehirler").mkdir(parents=True)
+        (raw / "ilceler").mkdir()
+        (raw / "countries.json").write_text(
+            json.dumps(
+                [
+                    {"CountryName": c["UlkeAdiEn"], "CountryID": int(c["UlkeID"])}
+                    for c in countries
+                ]
+            )
+        )
+        for kind, key in (("sehirler", "StateList"), ("ilceler", "StateRegionList")):
+            for path in (shipped / kind).glob("*.json"):
+                records = json.loads(path.read_text())
+                (raw / kind / path.name).write_text(
+                    json.dumps({key: records, "ExtensionData": None})
+                )
+        shutil.copy(shipped / "lookup.json", raw / "lookup.json")
+
+        dest = tmp / "dest"
+        transform.DATA_DIR, transform.DEST_DIR = raw, dest
+        transform.DOWNLOAD_MANIFEST = raw / "manifest.json"
+        transform.TRANSFORM_STATE = raw / "transform-state.json"
+        transform.LOOKUP_SOURCE = raw / "lookup.json"
+
+        for name, workers in (("serial", 1), ("pool", None)):
+            shutil.rmtree(dest, ignore_errors=True)
+            started = time.perf_counter()
+            transform.process_all_data(full=True, workers=workers)
+            full = time.perf_counter() - started
+            started = time.perf_counter()
+            transform.process_all_data(full=True, workers=workers)
+            noop = time.perf_counter() - started
+            print(f"{name:6} full {full:6.2f} s   no-op {noop:6.2f} s")
+
+        different = [
+            path.relative_to(shipped)
+            for path in shipped.rglob("*")
+            if path.is_file()
+            and path.read_bytes() != (dest / path.relative_to(shipped)).read_bytes()
+        ]
+        print(f"output identical to the shipped files: {not different}")
+    finally:
+        shutil.rmtree(tmp)
+
+
+def bench_vakitler_memory() -> None:
+    """Memory of a fully warmed prayer-time dataset: Vakit lists vs PrayerDays."""
+    from app.models.compact import PrayerDays
+    from app.models.schemas import ExternalApiResponse, convert_vakit_response
+    from app.services.catalog import LocationCatalog
+
+    catalog = LocationCatalog()
+    catalog.load()
+    ilce_ids = [
+        int(ilce["IlceID"]) for ilceler in catalog.ilceler.values() for ilce in ilceler
+    ]
+    today = date.today()
+
+    # tracemalloc is slow: warm a sample and scale it to every ilce
+    sample = ilce_ids[:1000]
+
+    def warm(compact: bool) -> float:
+        gc.collect()
+        tracemalloc.start()
+        store: dict[int, object] = {}
+        for ilce_id in sample:
+            # A fresh payload per ilce, like separate upstream responses
+            api_response = ExternalApiResponse.model_validate(_fake_api_response())
+            vakitler = convert_vakit_response(api_response)
+            del api_response
+            store[ilce_id] = (
+                PrayerDays.from_vakitler(vakitler, fetched_on=today)
+                if compact
+                else vakitler
+            )
+            del vakitler
+        size, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        return size * len(ilce_ids) / len(sample)
+
+    vakit_size = warm(compact=False)
+    compact_size = warm(compact=True)
+    print(f"{len(ilce_ids)} ilces x 30 days (scaled from {len(sample)})")
+    print(f"list[Vakit]: {vakit_size / 2**20:8.1f} MB")
+    print(f"PrayerDays:  {compact_size / 2**20:8.1f} MB")
+    print(f"ratio:       {vakit_size / compact_size:8.1f}x")
+
+
+def bench_convert() -> None:
+    """Decoding and converting a monthly upstream payload into Vakit records."""
+    import json
+    import re
+
+    from app.models.domain import Vakit
+    from app.models.schemas import (
+        ExternalApiResponse,
+        _extract_time,
+        convert_vakit_response,
+    )
+
+    def regex_time(iso_str: str) -> str:
+        # The previous implementation, kept as the baseline
+        time_match = re.search(r"T(\d{2}:\d{2})", iso_str)
+        if not time_match:
+            raise ValueError(iso_str)
+        return time_match.group(1)
+
+    def validated_convert(api_response: ExternalApiResponse) -> list[Vakit]:
+        # The previous implementation: regex times, every record validated again
+        return [
+            Vakit(
+                HicriTarihKisa=v.hicri_tarih_kisa,
+                HicriTarihKisaIso8601=None,
+                HicriTarihUzun=v.hicri_tarih_uzun,
+                HicriTarihUzunIso8601=None,
+                AyinSekliURL=v.ayin_sekli_url,
+                MiladiTarihKisa=v.miladi_tarih_kisa_Iso8601,
+                MiladiTarihKisaIso8601=v.miladi_tarih_kisa_Iso8601,
+                MiladiTarihUzun=v.miladi_tarih_uzun,
+                MiladiTarihUzunIso8601=v.miladi_tarih_uzun_Iso8601,
+                GreenwichOrtalamaZamani=3.0,
+                Aksam=regex_time(v.aksam),
+                Gunes=regex_time(v.gunes),
+                GunesBatis=regex_time(v.gunes_batis),
+                GunesDogus=regex_time(v.gunes_dogus),
+                Ikindi=regex_time(v.ikindi),
+                Imsak=regex_time(v.imsak),
+                KibleSaati=regex_time(v.kible_saati),
+                Ogle=regex_time(v.ogle),
+                Yatsi=regex_time(v.yatsi),
+            )
+            for v in api_response.resultObject.namazVakti
+        ]
+
+    payload = json.dumps(_fake_api_response()).encode()
+    api_response = ExternalApiResponse.model_validate_json(payload)
+    iso_str = api_response.resultObject.namazVakti[0].imsak
+    assert _extract_time(iso_str) == regex_time(iso_str)
+    assert validated_convert(api_response) == convert_vakit_response(api_response)
+
+    cases = [
+        (
+            "extract_time",
+            lambda: regex_time(iso_str),
+            lambda: _extract_time(iso_str),
+            100_000,
+        ),
+        (
+            "decode",
+            lambda: ExternalApiResponse.model_validate(json.loads(payload)),
+            lambda: ExternalApiResponse.model_validate_json(payload),
+            2_000,
+        ),
+        (
+            "convert",
+            lambda: validated_convert(api_response),
+            lambda: convert_vakit_response(api_response),
+            2_000,
+        ),
+    ]
+    print(f"{'':14} {'before':>10} {'after':>10}")
+    for name, before, after, rounds in cases:
+        before_us = _timeit(before, rounds)
+        after_us = _timeit(after, rounds)
+        print(
+            f"{name:14} {before_us:7.2f} us {after_us:7.2f} us"
+            f"   x{before_us / after_us:.1f}"
+        )
+
+
+BENCHMARKS: dict[str, Callable[[], None]] = {
+    "catalog": bench_catalog,
+    "static": bench_static,
+    "convert": bench_convert,
+    "singleflight": bench_singleflight,
+    "middleware": bench_middleware,
+    "batch": bench_batch,
+    "streaming": bench_streaming,
+    "cache_entry": bench_cache_entry,
+    "cache_replay": bench_cache_replay,
+    "nearby": bench_nearby,
+    "search": bench_search,
+    "lookup": bench_lookup,
+    "slices": bench_slices,
+    "vakitler_memory": bench_vakitler_memory,
+    "transform": bench_transform,
+}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("names", nargs="*", help=", ".join(BENCHMARKS))
+    args = parser.parse_args()
+    if unknown := set(args.names) - BENCHMARKS.keys():
+        parser.error(f"unknown benchmark(s): {', '.join(sorted(unknown))}")
+
+    for name in args.names or BENCHMARKS:
+        print(f"== {name} ==")
+        BENCHMARKS[name]()
+
+
+if __name__ == "__main__":
+    main()
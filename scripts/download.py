@@ -1,7 +1,12 @@
+import argparse
 import asyncio
+import hashlib
 import json
 import logging
 import os
+import time
+from collections.abc import Awaitable, Callable
+from functools import partial
 from pathlib import Path
 from typing import Any
 
@@ -27,6 +32,19 @@ DATA_DIR = (
     else Path(__file__).parent.parent / "data" / "locations"
 )
 
+# Requests in flight at most, and requests per second sent to Diyanet at most
+DEFAULT_CONCURRENCY = 8
+DEFAULT_RATE = 5.0
+REQUEST_TIMEOUT = 30.0  # seconds
+
+# Validators and content hash of every downloaded file, read by transform.py
+MANIFEST_NAME = "manifest.json"
+# Files checked more recently than this are reused without a request, so a
+# retried run picks up where the failed one stopped
+DEFAULT_MAX_AGE = 12 * 60 * 60  # seconds
+
+Job = Callable[[], Awaitable[None]]
+
 
 # Data Models
 class Country(BaseModel):
@@ -62,15 +80,160 @@ class IlceResponse(BaseModel):
     StateRegionList: list[IlceItem] | None = None
 
 
+class TokenBucket:
+    """
+    Token bucket shared by every download task.
+
+    Tokens refill at rate per second up to capacity, so short bursts are
+    allowed after idle periods while the average stays at rate.
+    """
+
+    def __init__(self, rate: float, capacity: float | None = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(rate, 1.0)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        # Waiters queue on the lock, so tokens are handed out in arrival order
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(
+                self.capacity, self._tokens + (now - self._updated) * self.rate
+            )
+            self._updated = now
+            if self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._tokens = 0.0
+                self._updated = time.monotonic()
+            else:
+                self._tokens -= 1
+
+
+def content_hash(content: bytes) -> str:
+    """Hash identifying the content of a downloaded file."""
+    return hashlib.sha256(content).hexdigest()
+
+
+class Manifest:
+    """
+    ETag, Last-Modified and content hash of every downloaded file.
+
+    Entries are keyed by the file path relative to the data directory and
+    record when the file was last checked against the server and when its
+    content last changed.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.entries: dict[str, dict[str, Any]] = {}
+        try:
+            self.entries = json.loads(path.read_bytes())
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable manifest {path}: {e}")
+
+    def get(self, name: str) -> dict[str, Any]:
+        return self.entries.get(name, {})
+
+    def update(self, name: str, **fields: Any) -> None:
+        self.entries[name] = {**self.get(name), **fields}
+
+    def save(self) -> None:
+        """Write the manifest atomically, so an interrupted run keeps the old one."""
+        tmp_path = self.path.with_suffix(".tmp")
+        tmp_path.write_text(
+            json.dumps(self.entries, indent=2, sort_keys=True), encoding="utf-8"
+        )
+        tmp_path.replace(self.path)
+
+
+class DownloadStats:
+    """Counters and request latencies of a download run."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.latencies: list[float] = []
+        self.bytes = 0
+        self.existing = 0  # files reused from disk without a request
+        self.unchanged = 0  # files checked with the server and found unchanged
+        self.changed = 0  # files written
+        self.errors = 0  # failed attempts, retried or not
+        self.failed = 0  # files given up on
+
+    def record(self, latency: float, size: int) -> None:
+        self.latencies.append(latency)
+        self.bytes += size
+
+    def log_report(self) -> None:
+        elapsed = time.perf_counter() - self.started
+        latencies = sorted(self.latencies)
+        logger.info(
+            f"Downloaded {len(latencies)} files ({self.bytes / 1024 / 1024:.1f} MB) "
+            f"in {elapsed:.1f} s: {len(latencies) / elapsed:.1f} files/s, "
+            f"{self.bytes / 1024 / elapsed:.0f} KB/s"
+        )
+        if latencies:
+            logger.info(
+                "Request latency: "
+                + ", ".join(
+                    f"p{q} {_percentile(latencies, q) * 1000:.0f} ms"
+                    for q in (50, 90, 99)
+                )
+                + f", max {latencies[-1] * 1000:.0f} ms"
+            )
+        logger.info(
+            f"{self.changed} files changed, {self.unchanged} unchanged, "
+            f"{self.existing} reused without checking, {self.errors} failed "
+            f"attempts, {self.failed} files given up on"
+        )
+
+
+def _percentile(ordered: list[float], q: int) -> float:
+    return ordered[min(len(ordered) - 1, len(ordered) * q // 100)]
+
+
 class LocationDownloader:
-    """Class to handle the downloading and processing of location data."""
+    """
+    Class to handle the downloading and processing of location data.
+
+    Countries, cities and ilces are downloaded by a fixed pool of workers
+    pulling from one bounded queue, through one pooled HTTP client and one
+    token bucket, so the request rate stays even across the whole run.
+    """
+
+    def __init__(
+        self,
+        base_dir: Path = DATA_DIR,
+        concurrency: int = DEFAULT_CONCURRENCY,
+        rate: float = DEFAULT_RATE,
+        max_age: float = DEFAULT_MAX_AGE,
+    ):
+        """
+        Initialize the downloader with the specified base directory.
 
-    def __init__(self, base_dir: Path = DATA_DIR):
-        """Initialize the downloader with the specified base directory."""
+        Args:
+            base_dir: Directory the location files are written to
+            concurrency: Requests in flight at most
+            rate: Requests per second at most (0 for no limit)
+            max_age: Seconds a checked file is reused without asking the
+                server again (0 checks every file)
+        """
         self.base_dir = base_dir
         self.countries_dir = base_dir / "country"
         self.sehirler_dir = base_dir / "sehirler"
         self.ilceler_dir = base_dir / "ilceler"
+        self.concurrency = concurrency
+        self.max_age = max_age
+        self.manifest = Manifest(base_dir / MANIFEST_NAME)
+        self.bucket = TokenBucket(rate)
+        self.stats = DownloadStats()
+        self.client: httpx.AsyncClient | None = None
+        self._queue: asyncio.Queue[Job] | None = None
 
     def setup_directories(self) -> None:
         """Create necessary directories if they don't exist."""
@@ -87,7 +250,10 @@ class LocationDownloader:
     ) -> dict[str, Any]:
         """
         Download a file from a URL and save it to the specified path.
-        If the file already exists and contains valid JSON, skip downloading.
+
+        A file checked within max_age is reused as is. Otherwise the request
+        is made conditional on the ETag and Last-Modified recorded in the
+        manifest, and the file is only rewritten when its content changed.
 
         Args:
             url: The URL to download from
@@ -100,13 +266,15 @@ class LocationDownloader:
         Raises:
             httpx.HTTPError: If the download fails
         """
-        # Check if the file exists and contains valid JSON
+        name = output_path.relative_to(self.base_dir).as_posix()
+        entry = self.manifest.get(name)
+
+        # Check if the file exists, contains valid JSON and is the one recorded
+        existing = None
         if output_path.exists():
             try:
-                content = output_path.read_bytes()
-                json_content = json.loads(content)
-                logger.info(f"Using existing file: {output_path}")
-                return json_content
+                content = await asyncio.to_thread(output_path.read_bytes)
+                existing = (json.loads(content), content_hash(content))
             except json.JSONDecodeError:
                 logger.warning(
                     f"Existing file {output_path} has invalid JSON. Re-downloading."
@@ -116,17 +284,55 @@ class LocationDownloader:
                     f"Error reading existing file {output_path}: {e}. Re-downloading."
                 )
 
-        # File doesn't exist or has invalid content - proceed with download
-        async with httpx.AsyncClient() as client:
-            response = await client.get(url, params=params)
-            response.raise_for_status()
-            content = response.content
-
-            # Save to disk
-            output_path.write_bytes(content)
-
-            # Parse and return the JSON data
-            return json.loads(content)
+        headers = {}
+        if existing is not None and existing[1] == entry.get("hash"):
+            if time.time() - entry.get("checked", 0) < self.max_age:
+                logger.info(f"Using existing file: {output_path}")
+                self.stats.existing += 1
+                return existing[0]
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+
+        assert self.client is not None, "download_all_locations opens the client"
+        await self.bucket.acquire()
+        started = time.perf_counter()
+        try:
+            response = await self.client.get(url, params=params, headers=headers)
+            if response.status_code != 304:
+                response.raise_for_status()
+        except Exception:
+            self.stats.errors += 1
+            raise
+        content = response.content
+        self.stats.record(time.perf_counter() - started, len(content))
+
+        now = time.time()
+        validators = {
+            "url": str(response.request.url),
+            "etag": response.headers.get("etag", entry.get("etag")),
+            "last_modified": response.headers.get(
+                "last-modified", entry.get("last_modified")
+            ),
+            "checked": now,
+        }
+        if response.status_code == 304 and existing is not None:
+            self.stats.unchanged += 1
+            self.manifest.update(name, **validators)
+            return existing[0]
+
+        # Parse before saving so a broken response is retried, not kept
+        json_content = json.loads(content)
+        digest = content_hash(content)
+        if existing is not None and existing[1] == digest:
+            self.stats.unchanged += 1
+        else:
+            await asyncio.to_thread(output_path.write_bytes, content)
+            self.stats.changed += 1
+            validators["changed"] = now
+        self.manifest.update(name, **validators, hash=digest)
+        return json_content
 
     async def fetch_countries(self) -> list[Country]:
         """
@@ -183,10 +389,8 @@ class LocationDownloader:
             else:
                 logger.info(f"No ilce found in {city_name}")
 
-            # Add a small delay to avoid overwhelming the server
-            await asyncio.sleep(0.5)
-
         except RetryError:
+            self.stats.failed += 1
             logger.exception(
                 f"Failed to download ilceler for {city_name} after multiple retries"
             )
@@ -221,16 +425,15 @@ class LocationDownloader:
                 logger.info(f"Validated {len_city} cities in {country_name} response")
 
                 # Download ilceler for each city
-                await asyncio.gather(
-                    *(
-                        self.process_ilceler(country, city_item)
-                        for city_item in city_response.StateList
+                for city_item in city_response.StateList:
+                    await self._submit(
+                        partial(self.process_ilceler, country, city_item)
                     )
-                )
             else:
                 logger.info(f"No cities found in {country_name} response")
 
         except RetryError:
+            self.stats.failed += 1
             logger.exception(
                 f"Failed to download cities for {country_name} after multiple retries"
             )
@@ -261,21 +464,90 @@ class LocationDownloader:
     async def download_all_locations(self) -> None:
         """Main function to orchestrate the download of all location data."""
         self.setup_directories()
+        self.stats = DownloadStats()
+
+        limits = httpx.Limits(
+            max_connections=self.concurrency,
+            max_keepalive_connections=self.concurrency,
+        )
+        async with httpx.AsyncClient(limits=limits, timeout=REQUEST_TIMEOUT) as client:
+            self.client = client
+            try:
+                # Get list of countries
+                countries = await self.fetch_countries()
+
+                self._queue = asyncio.Queue(maxsize=self.concurrency * 4)
+                workers = [
+                    asyncio.create_task(self._worker()) for _ in range(self.concurrency)
+                ]
+                try:
+                    for country in countries:
+                        await self._queue.put(partial(self.process_country, country))
+                    await self._queue.join()
+                finally:
+                    for worker in workers:
+                        worker.cancel()
+                    await asyncio.gather(*workers, return_exceptions=True)
+            finally:
+                self.client = None
+                self._queue = None
+                # Keep what was checked, so a retried run skips it
+                await asyncio.to_thread(self.manifest.save)
+
+        self.stats.log_report()
+
+    async def _submit(self, job: Job) -> None:
+        """
+        Queue a job for the workers, or run it right away if the queue is full.
 
-        # Get list of countries
-        countries = await self.fetch_countries()
-
-        # Process each country concurrently in batches of 3 to avoid overwhelming the
-        # server.
-        batch_size = 3
-        for i in range(0, len(countries), batch_size):
-            batch = countries[i : i + batch_size]
-            await asyncio.gather(*(self.process_country(country) for country in batch))
+        Workers submit the cities and ilces they discover; running the job in
+        place instead of waiting for room keeps the queue bounded without
+        every worker blocking on a full queue.
+        """
+        assert self._queue is not None
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            await job()
+
+    async def _worker(self) -> None:
+        assert self._queue is not None
+        while True:
+            job = await self._queue.get()
+            try:
+                await job()
+            except Exception:
+                logger.exception("Download job failed")
+            finally:
+                self._queue.task_done()
 
 
 async def main():
     """Entry point for the script."""
-    downloader = LocationDownloader()
+    parser = argparse.ArgumentParser(description="Download Diyanet location data")
+    parser.add_argument(
+        "--concurrency",
+        type=int,
+        default=DEFAULT_CONCURRENCY,
+        help="requests in flight at most",
+    )
+    parser.add_argument(
+        "--rate",
+        type=float,
+        default=DEFAULT_RATE,
+        help="requests per second at most (0 for no limit)",
+    )
+    parser.add_argument(
+        "--max-age",
+        type=float,
+        default=DEFAULT_MAX_AGE,
+        help="seconds a checked file is reused without a request (0 checks all)",
+    )
+    args = parser.parse_args()
+
+    downloader = LocationDownloader(
+        concurrency=args.concurrency, rate=args.rate, max_age=args.max_age
+    )
     await downloader.download_all_locations()
 
 
@@ -4,13 +4,35 @@ Transformation script to convert files from web format to previous API format.
 This is done to maintain backward compatibility with existing systems.
 """
 
+import argparse
+import gzip
+import hashlib
 import json
 import logging
 import os
-import shutil
 import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+from app.services.bundle import (  # noqa: E402
+    BUNDLE_NAME,
+    GROUP,
+    GROUP_KINDS,
+    HEADER,
+    LOOKUP,
+    MAGIC,
+    PLACE,
+    VERSION,
+)
+
+try:
+    import brotli
+except ImportError:  # the bundle is then written without brotli bodies
+    brotli = None
 
 # Configure logging
 logging.basicConfig(
@@ -26,6 +48,28 @@ DATA_DIR = (
 )
 DEST_DIR = Path(__file__).parent.parent / "app" / "static" / "data"
 
+# Content hashes of the downloaded files (written by download.py), and of the
+# ones the current output was built from
+DOWNLOAD_MANIFEST = DATA_DIR / "manifest.json"
+TRANSFORM_STATE = DATA_DIR / "transform-state.json"
+
+# Coordinates of the ilces: a lookup.json placed next to the downloaded data,
+# or else the one currently shipped
+LOOKUP_SOURCE = DATA_DIR / "lookup.json"
+
+# Every list of DEST_DIR is also packed into BUNDLE_NAME, which the app maps
+# into memory; its layout is defined in app/services/bundle.py. Compressed
+# once here, so the highest brotli quality costs nothing at runtime.
+BUNDLE_BROTLI_QUALITY = 11
+
+# Fields of every list, in the order the API serializes them
+PLACE_FIELDS = {
+    "ulkeler": ("UlkeAdi", "UlkeAdiEn", "UlkeID"),
+    "sehirler": ("SehirAdi", "SehirAdiEn", "SehirID"),
+    "ilceler": ("IlceAdi", "IlceAdiEn", "IlceID"),
+}
+LOOKUP_FIELDS = ("UlkeAdi", "SehirAdi", "IlceAdi", "IlceID", "lat", "lon")
+
 
 def load_json_file(file_path: Path) -> dict:
     """Load and parse a JSON file."""
@@ -37,17 +81,47 @@ def load_json_file(file_path: Path) -> dict:
         return {}
 
 
-def save_json_file(data: Any, file_path: Path) -> None:
-    """Save data to a JSON file."""
+def render_json(data: Any) -> bytes:
+    """Serialize data the way the location files are shipped."""
+    return json.dumps(data, ensure_ascii=False, indent=2).encode("utf-8")
+
+
+def render_lookup(entries: list[dict[str, Any]]) -> bytes:
+    """Serialize lookup.json on one line, as it is fetched whole by clients."""
+    return (
+        json.dumps(entries, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+        + b"\n"
+    )
+
+
+def write_if_changed(content: bytes, file_path: Path) -> bool:
+    """
+    Write a file atomically, unless it already holds the same content.
+
+    The content is written to a temporary file in the same directory and
+    renamed over the target, so readers never see a partial file, and
+    unchanged files keep their mtime.
+
+    Returns:
+        True if the file was written
+    """
     try:
-        # Ensure the directory exists
-        file_path.parent.mkdir(parents=True, exist_ok=True)
+        existing = file_path.read_bytes()
+    except FileNotFoundError:
+        existing = None
+    if existing is not None and _digest(existing) == _digest(content):
+        return False
 
-        with file_path.open("w", encoding="utf-8") as f:
-            json.dump(data, f, ensure_ascii=False, indent=2)
-        logger.info(f"Successfully saved {file_path}")
-    except Exception as e:
-        logger.error(f"Error saving {file_path}: {e}")
+    file_path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+    tmp_path.write_bytes(content)
+    tmp_path.replace(file_path)
+    logger.info(f"Successfully saved {file_path}")
+    return True
+
+
+def _digest(content: bytes) -> bytes:
+    return hashlib.blake2b(content, digest_size=16).digest()
 
 
 def transform_countries(country_mappings: dict[str, str]) -> list[dict[str, str]]:
@@ -146,14 +220,246 @@ def transform_ilce(sehir_id: str) -> list[dict[str, str]]:
     return transformed_ilces
 
 
-def process_all_data() -> None:
-    """Process all data files and transform them to the new format."""
+def load_source_hashes() -> dict[str, str]:
+    """Content hash of every downloaded file, by path relative to DATA_DIR."""
+    if not DOWNLOAD_MANIFEST.exists():
+        return {}
+    manifest = load_json_file(DOWNLOAD_MANIFEST)
+    return {name: entry["hash"] for name, entry in manifest.items() if "hash" in entry}
+
+
+class CountryResult(NamedTuple):
+    """Files of one country produced by a transform worker."""
+
+    outputs: list[Path]  # every sehir and ilce file of the country
+    written: list[Path]  # the ones whose content changed
+    sehirler: list[dict[str, str]]
+    ilceler: dict[str, list[dict[str, str]]]  # by SehirID
+
+
+# Set in every worker process by _init_worker
+_full = True
+_hashes: dict[str, str] = {}
+_previous: dict[str, str] = {}
+
+
+def _init_worker(
+    data_dir: Path,
+    dest_dir: Path,
+    full: bool,
+    hashes: dict[str, str],
+    previous: dict[str, str],
+) -> None:
+    # Workers may be spawned rather than forked, pass the directories along
+    global DATA_DIR, DEST_DIR, _full, _hashes, _previous
+    DATA_DIR, DEST_DIR = data_dir, dest_dir
+    _full, _hashes, _previous = full, hashes, previous
+
+
+def _source_changed(name: str, output_path: Path) -> bool:
+    return (
+        _full
+        or not output_path.exists()
+        or name not in _hashes
+        or _hashes[name] != _previous.get(name)
+    )
+
+
+def transform_country(country_id: str) -> CountryResult:
+    """
+    Transform the sehir file of a country and the ilce files of its cities.
+
+    Sources unchanged since the previous run are not transformed again; the
+    ilces of their cities are read back from the existing output.
+    """
+    cities = transform_sehir(country_id)
+    result = CountryResult(outputs=[], written=[], sehirler=cities, ilceler={})
+    if not cities:
+        return result
+
+    sehir_path = DEST_DIR / "sehirler" / f"{country_id}.json"
+    result.outputs.append(sehir_path)
+    if _source_changed(f"sehirler/{country_id}.json", sehir_path) and write_if_changed(
+        render_json(cities), sehir_path
+    ):
+        result.written.append(sehir_path)
+
+    for sehir in cities:
+        sehir_id = sehir["SehirID"]
+        ilce_path = DEST_DIR / "ilceler" / f"{sehir_id}.json"
+        if _source_changed(f"ilceler/{sehir_id}.json", ilce_path):
+            ilces = transform_ilce(sehir_id)
+            if ilces and write_if_changed(render_json(ilces), ilce_path):
+                result.written.append(ilce_path)
+        else:
+            ilces = load_json_file(ilce_path)  # type: ignore[assignment]
+        if ilces:
+            result.outputs.append(ilce_path)
+            result.ilceler[sehir_id] = ilces
+
+    return result
+
+
+def transform_lookup(ilce_ids: set[str]) -> list[dict[str, Any]] | None:
+    """
+    Entries of lookup.json, checked against the transformed ilces.
+
+    Coordinates are not part of the downloaded data: entries are taken as
+    they are from LOOKUP_SOURCE, or else the shipped lookup.json.
+
+    Args:
+        ilce_ids: IlceIDs of every transformed ilce
+    """
+    source = LOOKUP_SOURCE if LOOKUP_SOURCE.exists() else DEST_DIR / "lookup.json"
+    if not source.exists():
+        logger.warning("No lookup.json to take coordinates from, skipping it")
+        return None
+
+    entries = load_json_file(source)
+    unknown = sum(1 for entry in entries if entry["IlceID"] not in ilce_ids)
+    if unknown:
+        logger.warning(f"{unknown} lookup entries refer to an unknown ilce")
+    return entries
+
+
+def render_bundle(
+    countries: list[dict[str, str]],
+    results: list[CountryResult],
+    lookup: list[dict[str, Any]],
+) -> bytes:
+    """
+    Pack every list of the output into one file.
+
+    Each list is stored both as fixed-width records and as the JSON body the
+    API returns for it, plain, gzipped and brotli compressed, so the app can
+    read single records and serve whole lists without parsing anything.
+    """
+    strings = bytearray()
+    string_refs: dict[str, tuple[int, int]] = {}
+
+    def ref(value: str) -> tuple[int, int]:
+        if value not in string_refs:
+            encoded = value.encode("utf-8")
+            string_refs[value] = (len(strings), len(encoded))
+            strings.extend(encoded)
+        return string_refs[value]
+
+    tables: dict[str, bytearray] = {kind: bytearray() for kind in GROUP_KINDS}
+    positions = dict.fromkeys(GROUP_KINDS, 0)
+    bodies = bytearray()
+    groups = []
+
+    def add_group(kind: str, group_id: int, records: list[dict[str, Any]]) -> None:
+        fields = PLACE_FIELDS.get(kind, LOOKUP_FIELDS)
+        for record in records:
+            if kind == "lookup":
+                tables[kind] += LOOKUP.pack(
+                    *ref(record["IlceAdi"]),
+                    *ref(record["SehirAdi"]),
+                    *ref(record["UlkeAdi"]),
+                    int(record["IlceID"]),
+                    record["lat"],
+                    record["lon"],
+                )
+            else:
+                name, name_en, record_id = (record[field] for field in fields)
+                tables[kind] += PLACE.pack(int(record_id), *ref(name), *ref(name_en))
+            positions[kind] += 1
+
+        body = json.dumps(
+            [{field: record[field] for field in fields} for record in records],
+            ensure_ascii=False,
+            separators=(",", ":"),
+        ).encode("utf-8")
+        gzipped = gzip.compress(body, compresslevel=9, mtime=0)
+        br = brotli.compress(body, quality=BUNDLE_BROTLI_QUALITY) if brotli else b""
+        groups.append(
+            (
+                GROUP_KINDS.index(kind),
+                group_id,
+                positions[kind] - len(records),
+                len(records),
+                len(bodies),
+                len(body),
+                len(bodies) + len(body),
+                len(gzipped),
+                len(bodies) + len(body) + len(gzipped),
+                len(br),
+                hashlib.blake2b(body, digest_size=16).digest(),
+            )
+        )
+        bodies.extend(body + gzipped + br)
+
+    add_group("ulkeler", 0, countries)
+    for country, result in zip(countries, results, strict=True):
+        if result.sehirler:
+            add_group("sehirler", int(country["UlkeID"]), result.sehirler)
+        for sehir_id, ilces in result.ilceler.items():
+            add_group("ilceler", int(sehir_id), ilces)
+    add_group("lookup", 0, lookup)
+
+    groups.sort()
+    sections = [
+        (strings, len(string_refs)),
+        *((tables[kind], positions[kind]) for kind in GROUP_KINDS),
+        (bytearray(GROUP.size * len(groups)), len(groups)),
+    ]
+    header = []
+    offset = HEADER.size
+    for content, count in sections:
+        header += [offset, count]
+        offset += len(content)
+
+    # The bodies go last, after the tables; point the groups at them
+    group_table = sections[-1][0]
+    for i, group in enumerate(groups):
+        *fields, body_at, body_size, gzip_at, gzip_size, br_at, br_size, digest = group
+        GROUP.pack_into(
+            group_table,
+            i * GROUP.size,
+            *fields,
+            offset + body_at,
+            body_size,
+            offset + gzip_at,
+            gzip_size,
+            offset + br_at if br_size else 0,
+            br_size,
+            digest,
+        )
+
+    return b"".join(
+        [
+            HEADER.pack(MAGIC, VERSION, *header),
+            *(bytes(content) for content, _ in sections),
+            bytes(bodies),
+        ]
+    )
+
+
+def process_all_data(full: bool = False, workers: int | None = None) -> None:
+    """
+    Process all data files and transform them to the new format.
+
+    Countries are transformed in parallel by a process pool. Only sources
+    that changed since the last run are transformed again, unless full is
+    set or there is no record of the previous run, and only files whose
+    content differs are written.
+
+    Args:
+        full: Transform every source, even if unchanged since the last run
+        workers: Worker processes (default: one per CPU, 1 runs in process)
+    """
     logger.info("Starting transformation process")
+    started = time.perf_counter()
 
-    # Create or clear the destination directory
-    if DEST_DIR.exists():
-        shutil.rmtree(DEST_DIR)
-    DEST_DIR.mkdir(parents=True, exist_ok=True)
+    hashes = load_source_hashes()
+    previous = load_json_file(TRANSFORM_STATE) if TRANSFORM_STATE.exists() else {}
+    if not hashes or not previous:
+        full = True
+
+    # Create the destination directories
+    (DEST_DIR / "sehirler").mkdir(parents=True, exist_ok=True)
+    (DEST_DIR / "ilceler").mkdir(parents=True, exist_ok=True)
 
     # Load country name mappings
     country_mappings_file = Path(__file__).parent / "country_name_mapping.json"
@@ -161,36 +467,70 @@ def process_all_data() -> None:
 
     # Transform countries
     countries = transform_countries(country_mappings)
-    save_json_file(countries, DEST_DIR / "countries.json")
-
-    # Create sehirler directory
-    (DEST_DIR / "sehirler").mkdir(parents=True, exist_ok=True)
-
-    # Create ilceler directory
-    (DEST_DIR / "ilceler").mkdir(parents=True, exist_ok=True)
-
-    # Process cities and ilces for each country
-    for country in countries:
-        country_id = country["UlkeID"]
-
-        # Transform cities for this country
-        cities = transform_sehir(country_id)
-        if cities:
-            save_json_file(cities, DEST_DIR / "sehirler" / f"{country_id}.json")
+    written = write_if_changed(render_json(countries), DEST_DIR / "countries.json")
+
+    # Process cities and ilces of every country
+    country_ids = [country["UlkeID"] for country in countries]
+    if workers == 1:
+        _init_worker(DATA_DIR, DEST_DIR, full, hashes, previous)
+        results = [transform_country(country_id) for country_id in country_ids]
+    else:
+        with ProcessPoolExecutor(
+            max_workers=workers,
+            initializer=_init_worker,
+            initargs=(DATA_DIR, DEST_DIR, full, hashes, previous),
+        ) as pool:
+            results = list(pool.map(transform_country, country_ids, chunksize=4))
+
+    outputs = {path for result in results for path in result.outputs}
+    written += sum(len(result.written) for result in results)
+
+    # Countries and cities no longer in the source
+    for subdir in ("sehirler", "ilceler"):
+        for output_path in (DEST_DIR / subdir).glob("*.json"):
+            if output_path not in outputs:
+                output_path.unlink()
+                logger.info(f"Removed {output_path}")
+
+    lookup = transform_lookup(
+        {
+            ilce["IlceID"]
+            for result in results
+            for ilces in result.ilceler.values()
+            for ilce in ilces
+        }
+    )
+    if lookup is not None:
+        written += write_if_changed(render_lookup(lookup), DEST_DIR / "lookup.json")
 
-            # Transform ilces for each sehir
-            for sehir in cities:
-                sehir_id = sehir["SehirID"]
-                ilces = transform_ilce(sehir_id)
-                if ilces:
-                    save_json_file(ilces, DEST_DIR / "ilceler" / f"{sehir_id}.json")
+    written += write_if_changed(
+        render_bundle(countries, results, lookup or []), DEST_DIR / BUNDLE_NAME
+    )
 
-    logger.info("Transformation process completed successfully")
+    write_if_changed(render_json(hashes), TRANSFORM_STATE)
+    logger.info(
+        f"Transformation process completed successfully in "
+        f"{time.perf_counter() - started:.2f} s: {written} of "
+        f"{len(outputs) + 3} files written"
+    )
 
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transform downloaded location data")
+    parser.add_argument(
+        "--full",
+        action="store_true",
+        help="transform every source, not only those changed since the last run",
+    )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=None,
+        help="worker processes (default: one per CPU)",
+    )
+    args = parser.parse_args()
     try:
-        process_all_data()
+        process_all_data(full=args.full, workers=args.workers)
     except Exception as e:
         logger.error(f"An error occurred during transformation: {e}")
         sys.exit(1)
@@ -1,15 +1,22 @@
 #!/usr/bin/env python3
 """
-Validate the existence and structure of prayer times data files.
-This script checks if all required JSON files exist in the locations directory.
+Validate the downloaded location data and the transformed files built from it.
+Every file of both trees is read once, in parallel, then checked for schema,
+ID uniqueness and references (country -> city -> ilce -> lookup entry).
+The findings are written as a JSON report.
 """
 
+import argparse
 import json
 import logging
+import math
 import os
 import sys
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any
+from typing import Any, NamedTuple
 
 # Configure logger
 logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
@@ -20,136 +27,415 @@ DATA_DIR = (
     if os.environ.get("EZAN_DATA_DIR")
     else Path(__file__).parent.parent / "data" / "locations"
 )
+DEST_DIR = Path(__file__).parent.parent / "app" / "static" / "data"
 
+REPORT_NAME = "validation-report.json"
 
-def load_json_file(file_path: Path) -> dict[str, Any] | None:
-    """Load and parse a JSON file."""
-    try:
-        if not file_path.exists():
-            return None
-        with open(file_path, encoding="utf-8") as f:
-            return json.load(f)
-    except json.JSONDecodeError:
-        logger.error(f"Invalid JSON format in {file_path}")
-        return None
-    except Exception as e:
-        logger.error(f"Error reading {file_path}: {e}")
-        return None
+# Threads reading and parsing files; parsing holds the GIL but the reads overlap
+READ_WORKERS = 16
 
 
-def check_country_file(base_dir: Path) -> list | None:
-    """
-    Validate and load countries.json file.
-    Returns the countries data if valid, None otherwise.
-    """
-    countries_file = base_dir / "countries.json"
+class Layout(NamedTuple):
+    """Where a tree keeps its records and what they look like."""
 
-    if not countries_file.exists():
-        logger.error(f"Countries file not found at {countries_file}")
-        return None
+    country_id: str
+    country_fields: tuple[str, ...]
+    sehir_list: str | None  # key of the record list in a sehir file, if wrapped
+    sehir_id: str
+    sehir_fields: tuple[str, ...]
+    ilce_list: str | None
+    ilce_id: str
+    ilce_fields: tuple[str, ...]
 
-    countries_data = load_json_file(countries_file)
-    return countries_data
 
+# As downloaded by download.py
+RAW = Layout(
+    country_id="CountryID",
+    country_fields=("CountryID", "CountryName"),
+    sehir_list="StateList",
+    sehir_id="SehirID",
+    sehir_fields=("SehirID", "SehirAdi", "SehirAdiEn"),
+    ilce_list="StateRegionList",
+    ilce_id="IlceID",
+    ilce_fields=("IlceID", "IlceAdi", "IlceAdiEn"),
+)
 
-def check_sehir_file(base_dir: Path, country_id: str) -> dict[str, Any] | None:
-    """
-    Check if a sehir file exists for the given country ID and load its content.
-    Returns the sehir data if valid, None otherwise.
-    """
-    sehir_file = base_dir / "sehirler" / f"{country_id}.json"
+# As written by transform.py and served by the API
+TRANSFORMED = Layout(
+    country_id="UlkeID",
+    country_fields=("UlkeID", "UlkeAdi", "UlkeAdiEn"),
+    sehir_list=None,
+    sehir_id="SehirID",
+    sehir_fields=("SehirID", "SehirAdi", "SehirAdiEn"),
+    ilce_list=None,
+    ilce_id="IlceID",
+    ilce_fields=("IlceID", "IlceAdi", "IlceAdiEn"),
+)
 
-    if not sehir_file.exists():
-        logger.warning(f"Missing sehir file: {sehir_file}")
-        return None
+LOOKUP_NAME_FIELDS = ("IlceAdi", "SehirAdi", "UlkeAdi")
 
-    return load_json_file(sehir_file)
 
+class Issue(NamedTuple):
+    """One finding of the validation."""
 
-def extract_sehir_ids(sehir_data: dict, country_id: str) -> set[str]:
-    """
-    Extract all sehir IDs from the sehir data.
-    Returns a set of sehir IDs.
-    """
-    sehir_ids = set()
+    severity: str  # "error" fails the validation, "warning" does not
+    tree: str
+    check: str
+    path: str
+    message: str
 
-    state_list = sehir_data.get("StateList", [])
-    if not state_list:
-        logger.warning(f"No cities found for country ID {country_id}")
-        return sehir_ids
 
-    for state in state_list:
-        sehir_id = state.get("SehirID")
-        if not sehir_id:
-            logger.warning(f"City without SehirID found in country {country_id}")
-            continue
+class Report:
+    """Findings and statistics of a validation run."""
 
-        sehir_ids.add(sehir_id)
+    def __init__(self):
+        self.issues: list[Issue] = []
+        self.stats: dict[str, dict[str, int]] = {}
 
-    return sehir_ids
+    def error(self, tree: str, check: str, path: str, message: str) -> None:
+        self.issues.append(Issue("error", tree, check, path, message))
 
+    def warning(self, tree: str, check: str, path: str, message: str) -> None:
+        self.issues.append(Issue("warning", tree, check, path, message))
 
-def check_ilce_files(base_dir: Path, sehir_ids: set[str]) -> list[str]:
-    """
-    Check if ilce files exist for all sehir IDs.
-    Returns a list of missing ilce files.
-    """
-    missing_files = []
+    @property
+    def ok(self) -> bool:
+        return not any(issue.severity == "error" for issue in self.issues)
 
-    for sehir_id in sehir_ids:
-        ilce_file = base_dir / "ilceler" / f"{sehir_id}.json"
-        if not ilce_file.exists():
-            missing_files.append(str(ilce_file))
+    def to_dict(self, elapsed: float) -> dict[str, Any]:
+        severities = Counter(issue.severity for issue in self.issues)
+        return {
+            "ok": self.ok,
+            "elapsed": round(elapsed, 3),
+            "errors": severities["error"],
+            "warnings": severities["warning"],
+            "stats": self.stats,
+            "issues": [issue._asdict() for issue in self.issues],
+        }
 
-    return missing_files
 
+class _Unreadable(NamedTuple):
+    reason: str
 
-def validate_files() -> bool:
+
+def read_file(file_path: Path) -> Any:
+    """Load and parse a JSON file, or describe why it cannot be."""
+    try:
+        return json.loads(file_path.read_bytes())
+    except json.JSONDecodeError as e:
+        return _Unreadable(f"invalid JSON: {e}")
+    except Exception as e:
+        return _Unreadable(str(e))
+
+
+def read_trees(base_dirs: dict[str, Path]) -> dict[str, dict[str, Any]]:
+    """
+    Read every JSON file of several trees at once.
+
+    Returns:
+        Parsed content (or _Unreadable) by path relative to its tree, per tree
     """
-    Validate all necessary JSON files exist.
-    Returns True if all validations pass, False otherwise.
+    paths = [
+        (tree, base_dir, file_path)
+        for tree, base_dir in base_dirs.items()
+        for file_path in sorted(base_dir.rglob("*.json"))
+    ]
+    with ThreadPoolExecutor(max_workers=READ_WORKERS) as pool:
+        contents = pool.map(read_file, (file_path for _, _, file_path in paths))
+        trees: dict[str, dict[str, Any]] = {tree: {} for tree in base_dirs}
+        for (tree, base_dir, file_path), content in zip(paths, contents, strict=True):
+            trees[tree][file_path.relative_to(base_dir).as_posix()] = content
+    return trees
+
+
+def _is_id(value: Any) -> bool:
+    if isinstance(value, str):
+        return value.isdigit()
+    return isinstance(value, int) and not isinstance(value, bool) and value >= 0
+
+
+def _is_coordinate(value: Any, limit: float) -> bool:
+    return (
+        isinstance(value, int | float)
+        and not isinstance(value, bool)
+        and math.isfinite(value)
+        and -limit <= value <= limit
+    )
+
+
+def _records(
+    report: Report,
+    tree: str,
+    files: dict[str, Any],
+    path: str,
+    list_key: str | None,
+    fields: tuple[str, ...],
+) -> list[dict[str, Any]] | None:
     """
+    The well-formed records of a file, reporting the ones that are not.
 
-    # Validate countries.json exists and load countries data
-    countries_data = check_country_file(DATA_DIR)
-    if countries_data is None:
-        return False
+    Returns:
+        The records, or None if the file is missing or unreadable
+    """
+    content = files.get(path)
+    if content is None:
+        report.error(tree, "missing_file", path, "file not found")
+        return None
+    if isinstance(content, _Unreadable):
+        report.error(tree, "unreadable_file", path, content.reason)
+        return None
 
-    missing_files = []
-    sehir_ids = set()
+    if list_key is not None:
+        content = content.get(list_key) if isinstance(content, dict) else None
+    if not isinstance(content, list):
+        expected = f"an object with a {list_key} list" if list_key else "a list"
+        report.error(tree, "schema", path, f"expected {expected}")
+        return None
 
-    # Check each country's sehir file
-    for country in countries_data:
-        country_id = country.get("CountryID")
-        if not country_id:
-            logger.warning(f"Country without CountryID found: {country}")
+    records = []
+    for i, record in enumerate(content):
+        if not isinstance(record, dict):
+            report.error(tree, "schema", path, f"record {i} is not an object")
             continue
-
-        # Load sehir data
-        sehir_data = check_sehir_file(DATA_DIR, country_id)
-        if sehir_data is None:
-            missing_files.append(str(DATA_DIR / "sehirler" / f"{country_id}.json"))
+        if problems := [
+            field
+            for field in fields
+            if not (
+                _is_id(record.get(field))
+                if field.endswith("ID")
+                else isinstance(record.get(field), str) and record[field].strip()
+            )
+        ]:
+            report.error(
+                tree,
+                "schema",
+                path,
+                f"record {i} has a missing or invalid {', '.join(problems)}",
+            )
             continue
+        records.append(record)
+    return records
+
+
+def _check_unique(
+    report: Report,
+    tree: str,
+    kind: str,
+    owners: dict[str, list[str]],
+    severity: str = "error",
+) -> None:
+    """Report IDs found in more than one place."""
+    add = report.error if severity == "error" else report.warning
+    for record_id, paths in owners.items():
+        if len(paths) > 1:
+            add(
+                tree,
+                f"duplicate_{kind}_id",
+                paths[0],
+                f"{kind} ID {record_id} appears {len(paths)} times: "
+                f"{', '.join(sorted(set(paths)))}",
+            )
+
+
+def check_tree(
+    report: Report, tree: str, files: dict[str, Any], layout: Layout
+) -> set[str]:
+    """
+    Check the countries, sehir and ilce files of a tree and their references.
 
-        # Extract sehir IDs
-        sehir_ids.update(extract_sehir_ids(sehir_data, country_id))
+    Every country needs a sehir file and every sehir an ilce file; files no
+    country or sehir refers to are reported as orphans.
 
-    # Check ilce files
-    ilce_missing_files = check_ilce_files(DATA_DIR, sehir_ids)
-    missing_files.extend(ilce_missing_files)
+    Returns:
+        IlceIDs found in the tree
+    """
+    countries = _records(
+        report, tree, files, "countries.json", None, layout.country_fields
+    )
+    if countries is None:
+        return set()
+
+    country_owners: dict[str, list[str]] = {}
+    sehir_owners: dict[str, list[str]] = {}
+    ilce_owners: dict[str, list[str]] = {}
+    for country in countries:
+        country_owners.setdefault(str(country[layout.country_id]), []).append(
+            "countries.json"
+        )
+
+    for country_id in country_owners:
+        path = f"sehirler/{country_id}.json"
+        sehirler = _records(
+            report, tree, files, path, layout.sehir_list, layout.sehir_fields
+        )
+        for sehir in sehirler or ():
+            sehir_owners.setdefault(str(sehir[layout.sehir_id]), []).append(path)
+
+    for sehir_id in sehir_owners:
+        path = f"ilceler/{sehir_id}.json"
+        ilceler = _records(
+            report, tree, files, path, layout.ilce_list, layout.ilce_fields
+        )
+        for ilce in ilceler or ():
+            ilce_owners.setdefault(str(ilce[layout.ilce_id]), []).append(path)
+
+    _check_unique(report, tree, "country", country_owners)
+    _check_unique(report, tree, "sehir", sehir_owners)
+    # The same ilce listed under two cities still has one set of prayer times
+    _check_unique(report, tree, "ilce", ilce_owners, severity="warning")
+
+    referenced = {f"sehirler/{country_id}.json" for country_id in country_owners} | {
+        f"ilceler/{sehir_id}.json" for sehir_id in sehir_owners
+    }
+    for path in files:
+        if path.startswith(("sehirler/", "ilceler/")) and path not in referenced:
+            report.warning(tree, "orphan_file", path, "no record refers to this file")
+
+    report.stats[tree] = {
+        "files": len(files),
+        "countries": len(countries),
+        "sehirler": sum(len(paths) for paths in sehir_owners.values()),
+        "ilceler": sum(len(paths) for paths in ilce_owners.values()),
+    }
+    return set(ilce_owners)
+
+
+def check_lookup(
+    report: Report, tree: str, files: dict[str, Any], ilce_ids: set[str]
+) -> None:
+    """
+    Check lookup.json: schema, coordinates, and that every entry is a known,
+    distinct ilce.
+    """
+    path = "lookup.json"
+    entries = _records(report, tree, files, path, None, ("IlceID", *LOOKUP_NAME_FIELDS))
+    if entries is None:
+        return
+
+    entry_ids: Counter[str] = Counter()
+    places: dict[tuple, list[str]] = {}
+    for entry in entries:
+        ilce_id = entry["IlceID"]
+        entry_ids[ilce_id] += 1
+        lat, lon = entry.get("lat"), entry.get("lon")
+        if not (_is_coordinate(lat, 90) and _is_coordinate(lon, 180)):
+            report.error(
+                tree,
+                "coordinates",
+                path,
+                f"IlceID {ilce_id} has invalid coordinates {lat!r}, {lon!r}",
+            )
+            continue
+        if ilce_id not in ilce_ids:
+            report.warning(
+                tree, "unknown_ilce", path, f"IlceID {ilce_id} is not in any ilce file"
+            )
+        place = (*(entry[field] for field in LOOKUP_NAME_FIELDS), lat, lon)
+        places.setdefault(place, []).append(ilce_id)
+
+    for ilce_id, count in entry_ids.items():
+        if count > 1:
+            report.error(
+                tree,
+                "duplicate_lookup_id",
+                path,
+                f"IlceID {ilce_id} has {count} entries",
+            )
+    for place, place_ids in places.items():
+        if len(set(place_ids)) > 1:
+            report.warning(
+                tree,
+                "duplicate_lookup_place",
+                path,
+                f"{place[0]} ({place[1]}, {place[2]}) is listed under IlceIDs "
+                f"{', '.join(sorted(set(place_ids)))}",
+            )
+
+    report.stats[tree]["lookup"] = len(entries)
+    report.stats[tree]["ilceler_without_lookup"] = len(ilce_ids - entry_ids.keys())
+
+
+def validate_files(
+    raw_dir: Path = DATA_DIR,
+    transformed_dir: Path = DEST_DIR,
+    report_path: Path | None = None,
+) -> bool:
+    """
+    Validate the downloaded and the transformed location data.
 
-    # Report results
-    if missing_files:
-        logger.error(f"Validation failed: {len(missing_files)} files are missing:")
-        for file_path in missing_files:
-            logger.error(f"  - {file_path}")
-        return False
+    The transformed tree is checked on its own rather than against the raw
+    one: it may still hold the output of the previous download.
 
-    logger.info("Validation successful: All required files exist.")
-    return True
+    Args:
+        raw_dir: Downloaded data
+        transformed_dir: Transformed data, skipped if it does not exist
+        report_path: Where to write the JSON report ("-" for stdout), next to
+            the downloaded data by default
+
+    Returns:
+        True if no errors were found, warnings do not fail the validation
+    """
+    started = time.perf_counter()
+    report = Report()
+
+    base_dirs = {"raw": raw_dir}
+    if transformed_dir.is_dir():
+        base_dirs["transformed"] = transformed_dir
+    else:
+        report.warning(
+            "transformed", "missing_tree", str(transformed_dir), "not validated"
+        )
+    trees = read_trees(base_dirs)
+
+    check_tree(report, "raw", trees["raw"], RAW)
+    if "transformed" in trees:
+        ilce_ids = check_tree(report, "transformed", trees["transformed"], TRANSFORMED)
+        check_lookup(report, "transformed", trees["transformed"], ilce_ids)
+
+    result = report.to_dict(time.perf_counter() - started)
+    rendered = json.dumps(result, ensure_ascii=False, indent=2)
+    if str(report_path) == "-":
+        print(rendered)
+    else:
+        report_path = report_path or raw_dir / REPORT_NAME
+        report_path.parent.mkdir(parents=True, exist_ok=True)
+        report_path.write_text(rendered, encoding="utf-8")
+        logger.info(f"Report written to {report_path}")
+
+    for issue in report.issues:
+        if issue.severity == "error":
+            logger.error(f"[{issue.tree}] {issue.path}: {issue.message}")
+    warnings = Counter(
+        (issue.tree, issue.check)
+        for issue in report.issues
+        if issue.severity == "warning"
+    )
+    for (tree, check), count in warnings.items():
+        logger.warning(f"[{tree}] {count} {check} warning(s), see the report")
+    summary = (
+        f"{result['errors']} error(s), {result['warnings']} warning(s) "
+        f"in {result['elapsed']:.2f} s"
+    )
+    if report.ok:
+        logger.info(f"Validation successful: {summary}")
+    else:
+        logger.error(f"Validation failed: {summary}")
+    return report.ok
 
 
 if __name__ == "__main__":
-    success = validate_files()
+    parser = argparse.ArgumentParser(description="Validate the location data")
+    parser.add_argument("--raw", type=Path, default=DATA_DIR, help="downloaded data")
+    parser.add_argument(
+        "--transformed", type=Path, default=DEST_DIR, help="transformed data"
+    )
+    parser.add_argument(
+        "--report",
+        type=Path,
+        default=None,
+        help=f"JSON report path, - for stdout (default: <raw>/{REPORT_NAME})",
+    )
+    args = parser.parse_args()
+    success = validate_files(args.raw, args.transformed, args.report)
     # Use appropriate exit codes: 0 for success, 1 for failure
     sys.exit(0 if success else 1)
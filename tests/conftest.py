@@ -0,0 +1,90 @@
+import os
+
+# Settings are read at import time; the tests never reach the upstream API
+os.environ.setdefault("API_USERNAME", "test")
+os.environ.setdefault("API_PASSWORD", "test")
+os.environ.setdefault("API_URL", "http://diyanet.invalid")
+os.environ.setdefault("CACHE_TYPE", "memory")
+os.environ.setdefault("WARMUP_ON_STARTUP", "false")
+
+from datetime import date, timedelta  # noqa: E402
+
+import pytest  # noqa: E402
+from fastapi import FastAPI  # noqa: E402
+from fastapi.testclient import TestClient  # noqa: E402
+
+from app import routes  # noqa: E402
+from app.infrastructure.cache.service import CacheService  # noqa: E402
+from app.main import GZIP_MINIMUM_SIZE  # noqa: E402
+from app.middleware.cache import CacheMiddleware  # noqa: E402
+from app.middleware.gzip import GZipMiddleware  # noqa: E402
+from app.models.compact import PrayerDays  # noqa: E402
+from app.models.domain import Vakit  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def catalog():
+    routes.catalog.load()
+    return routes.catalog
+
+
+@pytest.fixture
+def cache_service():
+    return CacheService("memory", default_timeout=60)
+
+
+@pytest.fixture
+def make_client(cache_service):
+    """Wrap an app in the response cache and gzip layers the way main.py does."""
+
+    def make(app: FastAPI, **options) -> TestClient:
+        app.add_middleware(
+            CacheMiddleware,  # type: ignore[arg-type]
+            cache_service=cache_service,
+            compress_min_size=GZIP_MINIMUM_SIZE,
+            **options,
+        )
+        app.add_middleware(GZipMiddleware, minimum_size=GZIP_MINIMUM_SIZE)  # type: ignore[arg-type]
+        return TestClient(app)
+
+    return make
+
+
+def vakit(day: date) -> Vakit:
+    return Vakit(
+        HicriTarihKisa="1.10.1447",
+        HicriTarihUzun="1 Şevval 1447",
+        AyinSekliURL="https://example.invalid/ay.gif",
+        MiladiTarihKisa=day.strftime("%d.%m.%Y"),
+        MiladiTarihKisaIso8601=day.strftime("%d.%m.%Y"),
+        MiladiTarihUzun=day.isoformat(),
+        MiladiTarihUzunIso8601=f"{day.isoformat()}T00:00:00.0000000+03:00",
+        GreenwichOrtalamaZamani=3.0,
+        Imsak="05:00",
+        Gunes="06:30",
+        Ogle="13:10",
+        Ikindi="16:40",
+        Aksam="19:30",
+        Yatsi="20:50",
+        GunesDogus="06:35",
+        GunesBatis="19:25",
+        KibleSaati="12:00",
+    )
+
+
+@pytest.fixture
+def store_days():
+    """Hold prayer times for an ilce in the worker, so no upstream call is made."""
+    stored = []
+
+    def store(ilce: int, first_day: date | None = None, count: int = 31) -> None:
+        first_day = first_day or date.today()
+        days = [first_day + timedelta(days=offset) for offset in range(count)]
+        routes.prayer_times._days[ilce] = PrayerDays.from_vakitler(
+            [vakit(day) for day in days], fetched_on=first_day
+        )
+        stored.append(ilce)
+
+    yield store
+    for ilce in stored:
+        routes.prayer_times._days.pop(ilce, None)
@@ -0,0 +1,76 @@
+from datetime import date
+
+import pytest
+from fastapi import FastAPI
+
+from app import routes
+
+SEHIR = 593
+
+
+@pytest.fixture
+def client(catalog, make_client):
+    app = FastAPI()
+    app.include_router(routes.router)
+    return make_client(app)
+
+
+@pytest.fixture
+def upstream_down(monkeypatch):
+    async def get_monthly_prayer_times(ilce_id: str):
+        raise RuntimeError("upstream down")
+
+    monkeypatch.setattr(
+        routes.api_client, "get_monthly_prayer_times", get_monthly_prayer_times
+    )
+
+
+def test_batch_streams_one_object_keyed_by_ilce(client, store_days):
+    store_days(9541)
+    store_days(9535)
+
+    response = client.post("/vakitler/batch", json=[9541, 9535, 9541])
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/json")
+    body = response.json()
+    assert sorted(body) == ["9535", "9541"]
+    for vakitler in body.values():
+        assert len(vakitler) == 31
+        assert vakitler[0]["MiladiTarihUzun"] == date.today().isoformat()
+
+
+def test_batch_maps_failed_ilces_to_null(client, store_days, upstream_down):
+    store_days(9541)
+
+    body = client.post("/vakitler/batch", json=[9541, 99999999]).json()
+    assert body["99999999"] is None
+    assert len(body["9541"]) == 31
+
+
+@pytest.mark.parametrize(
+    "ilceler", [[], list(range(routes.settings.vakitler_batch_max_ilces + 1)), ["abc"]]
+)
+def test_batch_rejects_invalid_bodies(client, ilceler):
+    assert client.post("/vakitler/batch", json=ilceler).status_code == 422
+
+
+def test_sehir_streams_every_ilce(client, catalog, store_days):
+    ilceler = [ilce["IlceID"] for ilce in catalog.get_ilceler(SEHIR)]
+    for ilce in ilceler:
+        store_days(int(ilce))
+
+    response = client.get(f"/vakitler/sehir/{SEHIR}")
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "MISS"
+    body = response.json()
+    assert sorted(body) == sorted(ilceler)
+    assert all(len(vakitler) == 31 for vakitler in body.values())
+
+    # The joined stream is cached like any other JSON response
+    hit = client.get(f"/vakitler/sehir/{SEHIR}")
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.json() == body
+
+
+def test_unknown_sehir_is_not_found(client):
+    assert client.get("/vakitler/sehir/99999999").status_code == 404
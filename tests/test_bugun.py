@@ -0,0 +1,48 @@
+from datetime import date, timedelta
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app import routes
+from app.main import app
+from app.services import vakitler
+
+ILCE = 9541
+FIRST_DAY = date(2026, 3, 30)
+
+
+class FakeDate(date):
+    current = FIRST_DAY
+
+    @classmethod
+    def today(cls) -> date:
+        return cls.current
+
+
+@pytest.fixture
+def client(monkeypatch, store_days):
+    monkeypatch.setattr(routes, "date", FakeDate)
+    monkeypatch.setattr(vakitler, "date", FakeDate)
+    FakeDate.current = FIRST_DAY
+    # Enough days ahead that no upstream call is needed on either day
+    store_days(ILCE, FIRST_DAY)
+    with TestClient(app) as client:
+        yield client
+
+
+def test_bugun_follows_the_date_past_midnight(client):
+    first = client.get(f"/vakitler/{ILCE}/bugun")
+    assert first.status_code == 200
+    assert first.json()["MiladiTarihUzun"] == FIRST_DAY.isoformat()
+
+    FakeDate.current = FIRST_DAY + timedelta(days=1)
+    second = client.get(f"/vakitler/{ILCE}/bugun")
+    assert second.status_code == 200
+    assert second.json()["MiladiTarihUzun"] == FakeDate.current.isoformat()
+
+
+def test_bugun_is_not_cached(client):
+    for _ in range(2):
+        response = client.get(f"/vakitler/{ILCE}/bugun")
+        assert response.status_code == 200
+        assert "x-cache" not in response.headers
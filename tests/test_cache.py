@@ -0,0 +1,258 @@
+import asyncio
+
+import pytest
+from fastapi import FastAPI
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+
+from app.middleware import cache
+from app.middleware.cache import CacheMiddleware
+from app.utils import make_etag
+
+TIMEOUT = 60
+STALE_WHILE_REVALIDATE = 100
+STALE_IF_ERROR = 1000
+
+
+class Clock:
+    """Stands in for the time module of the middleware."""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def upstream():
+    """How the app answers: the number of calls so far, or a failure."""
+    return {"calls": 0, "fail": None}
+
+
+@pytest.fixture
+def client(make_client, upstream, clock):
+    app = FastAPI()
+
+    @app.get("/sayac")
+    @app.post("/sayac")
+    @app.get("/up")
+    async def sayac():
+        if upstream["fail"] == "raise":
+            raise RuntimeError("upstream down")
+        if upstream["fail"] == "503":
+            return JSONResponse({"detail": "down"}, status_code=503)
+        upstream["calls"] += 1
+        return {"calls": upstream["calls"]}
+
+    @app.get("/akis")
+    async def akis():
+        upstream["calls"] += 1
+
+        async def chunks():
+            yield b"["
+            for n in range(upstream["calls"]):
+                yield b"%d," % n
+            yield b"null]"
+
+        return StreamingResponse(chunks(), media_type="application/json")
+
+    @app.get("/metin")
+    async def metin():
+        upstream["calls"] += 1
+        return PlainTextResponse(str(upstream["calls"]))
+
+    with make_client(
+        app,
+        stale_while_revalidate=STALE_WHILE_REVALIDATE,
+        stale_if_error=STALE_IF_ERROR,
+    ) as client:
+        yield client
+
+
+def settle(client) -> None:
+    """Wait for the background refreshes the middleware started."""
+    middleware = client.app.middleware_stack
+    while not isinstance(middleware, CacheMiddleware):
+        middleware = middleware.app
+
+    async def refreshed():
+        await asyncio.gather(*middleware._revalidating.values())
+
+    client.portal.call(refreshed)
+
+
+def test_stale_entry_is_served_while_revalidating(client, upstream, clock):
+    assert client.get("/sayac").json() == {"calls": 1}
+
+    clock.now += TIMEOUT + 1
+    stale = client.get("/sayac")
+    assert stale.headers["x-cache"] == "STALE"
+    assert stale.json() == {"calls": 1}
+    assert stale.headers["cache-control"] == (
+        f"public, max-age=0, stale-while-revalidate={STALE_WHILE_REVALIDATE}, "
+        f"stale-if-error={STALE_IF_ERROR}"
+    )
+
+    settle(client)
+    assert upstream["calls"] == 2
+    fresh = client.get("/sayac")
+    assert fresh.headers["x-cache"] == "HIT"
+    assert fresh.json() == {"calls": 2}
+    assert fresh.headers["cache-control"] == f"public, max-age={TIMEOUT}"
+
+
+def test_failed_revalidation_keeps_the_stale_entry(client, upstream, clock):
+    client.get("/sayac")
+
+    upstream["fail"] = "503"
+    clock.now += TIMEOUT + 1
+    assert client.get("/sayac").headers["x-cache"] == "STALE"
+    settle(client)
+
+    stale = client.get("/sayac")
+    assert stale.headers["x-cache"] == "STALE"
+    assert stale.json() == {"calls": 1}
+
+
+def test_expired_entry_is_refreshed_before_responding(client, upstream, clock):
+    client.get("/sayac")
+
+    clock.now += TIMEOUT + STALE_WHILE_REVALIDATE
+    response = client.get("/sayac")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json() == {"calls": 2}
+
+
+@pytest.mark.parametrize("fail", ["503", "raise"])
+def test_stale_entry_is_served_if_the_refresh_fails(client, upstream, clock, fail):
+    client.get("/sayac")
+
+    upstream["fail"] = fail
+    clock.now += TIMEOUT + STALE_WHILE_REVALIDATE
+    response = client.get("/sayac")
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "STALE-IF-ERROR"
+    assert response.json() == {"calls": 1}
+    assert response.headers["cache-control"].startswith("public, max-age=0, ")
+
+
+def test_server_error_without_entry_is_not_cached(client, upstream):
+    upstream["fail"] = "503"
+    assert client.get("/sayac").status_code == 503
+
+    upstream["fail"] = None
+    response = client.get("/sayac")
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json() == {"calls": 1}
+
+
+@pytest.fixture
+def cache_reads(cache_service, monkeypatch):
+    """Record the keys read from the cache."""
+    keys = []
+    get = cache_service.get
+
+    async def recording_get(key):
+        keys.append(key)
+        return await get(key)
+
+    monkeypatch.setattr(cache_service, "get", recording_get)
+    return keys
+
+
+@pytest.mark.parametrize(
+    "if_none_match", ["{etag}", "W/{etag}", '"other", {etag}', "*"]
+)
+def test_revalidation_reads_only_the_etag(client, cache_reads, if_none_match):
+    etag = client.get("/sayac").headers["etag"]
+    cache_reads.clear()
+
+    response = client.get(
+        "/sayac", headers={"If-None-Match": if_none_match.format(etag=etag)}
+    )
+    assert response.status_code == 304
+    assert response.content == b""
+    assert response.headers["etag"] == etag
+    assert response.headers["x-cache"] == "HIT"
+    assert cache_reads == ["etag:GET:/sayac:"]
+
+
+def test_changed_etag_gets_the_cached_body(client):
+    client.get("/sayac")
+    response = client.get("/sayac", headers={"If-None-Match": '"other"'})
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "HIT"
+    assert response.json() == {"calls": 1}
+
+
+def test_stale_revalidation_is_not_modified(client, upstream, clock):
+    etag = client.get("/sayac").headers["etag"]
+
+    clock.now += TIMEOUT + 1
+    response = client.get("/sayac", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["x-cache"] == "STALE"
+    settle(client)
+    assert upstream["calls"] == 2
+
+
+def test_expired_etag_is_not_trusted(client, upstream, clock):
+    etag = client.get("/sayac").headers["etag"]
+
+    clock.now += TIMEOUT + STALE_WHILE_REVALIDATE
+    response = client.get("/sayac", headers={"If-None-Match": etag})
+    assert response.status_code == 200
+    assert response.headers["x-cache"] == "MISS"
+    assert response.json() == {"calls": 2}
+
+
+def test_matching_etag_on_a_cold_cache(client):
+    etag = make_etag(b'{"calls":1}')
+    response = client.get("/sayac", headers={"If-None-Match": etag})
+    assert response.status_code == 304
+    assert response.headers["x-cache"] == "MISS"
+    assert client.get("/sayac").headers["etag"] == etag
+
+
+def test_json_gets_cache_control_and_charset(client):
+    response = client.get("/sayac")
+    assert response.headers["cache-control"] == f"public, max-age={TIMEOUT}"
+    assert response.headers["content-type"] == "application/json; charset=utf-8"
+
+
+def test_chunked_json_is_cached_whole(client, upstream):
+    miss = client.get("/akis")
+    assert miss.headers["x-cache"] == "MISS"
+    assert miss.json() == [0, None]
+
+    hit = client.get("/akis")
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.content == miss.content
+    assert upstream["calls"] == 1
+
+
+@pytest.mark.parametrize(
+    ("method", "url"), [("POST", "/sayac"), ("GET", "/up"), ("GET", "/metin")]
+)
+def test_uncacheable_responses_pass_through(client, upstream, method, url):
+    for calls in (1, 2):
+        response = client.request(method, url)
+        assert response.status_code == 200
+        assert "x-cache" not in response.headers
+        assert "etag" not in response.headers
+        assert upstream["calls"] == calls
+
+
+def test_only_get_responses_get_cache_control(client):
+    assert "cache-control" not in client.post("/sayac").headers
+    assert "cache-control" not in client.get("/up").headers
+    assert client.get("/metin").headers["cache-control"] == (
+        f"public, max-age={TIMEOUT}"
+    )
@@ -0,0 +1,81 @@
+import gzip
+
+import pytest
+from fastapi import FastAPI, Request
+
+from app.services.prepared import LazyPayload, prepared_response
+from app.utils import preferred_encoding
+
+BODY = [{"IlceID": str(i), "IlceAdi": f"ILCE {i}"} for i in range(100)]
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [
+        (None, None),
+        ("", None),
+        ("identity", None),
+        ("gzip", "gzip"),
+        ("gzip, br", "br"),
+        ("br;q=0.5, gzip", "gzip"),
+        ("gzip;q=0", None),
+        ("identity, gzip;q=0", None),
+        ("GZIP;Q=0.3", "gzip"),
+        ("*", "br"),
+        ("*, br;q=0", "gzip"),
+        ("br;q=invalid, gzip;q=0.1", "gzip"),
+    ],
+)
+def test_preferred_encoding(accept_encoding, expected):
+    assert preferred_encoding(accept_encoding, ("br", "gzip")) == expected
+
+
+@pytest.fixture
+def client(make_client):
+    app = FastAPI()
+
+    @app.get("/ilceler/1")
+    async def ilceler():
+        return BODY
+
+    @app.get("/prepared")
+    async def prepared(request: Request):
+        return prepared_response(request, LazyPayload(b'{"ok":true}'))
+
+    return make_client(app)
+
+
+@pytest.mark.parametrize("accept_encoding", ["gzip;q=0", "identity, gzip;q=0"])
+def test_refused_gzip_is_not_sent(client, accept_encoding):
+    headers = {"Accept-Encoding": accept_encoding}
+    for x_cache in ("MISS", "HIT"):
+        response = client.get("/ilceler/1", headers=headers)
+        assert response.headers["x-cache"] == x_cache
+        assert "content-encoding" not in response.headers
+        assert response.json() == BODY
+
+
+def test_cached_body_is_sent_gzipped_as_stored(client):
+    client.get("/ilceler/1")
+    response = client.get("/ilceler/1", headers={"Accept-Encoding": "gzip"})
+    assert response.headers["x-cache"] == "HIT"
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == BODY
+
+
+@pytest.mark.parametrize(
+    ("accept_encoding", "expected"),
+    [("gzip, br", "br"), ("gzip, br;q=0.5", "gzip"), ("br;q=0, gzip;q=0", None)],
+)
+def test_prepared_response_negotiates(client, accept_encoding, expected):
+    response = client.get("/prepared", headers={"Accept-Encoding": accept_encoding})
+    assert response.headers.get("content-encoding") == expected
+    assert response.headers["vary"] == "Accept-Encoding"
+    assert response.json() == {"ok": True}
+
+
+def test_lazy_payload_compresses_only_what_is_read():
+    payload = LazyPayload(b'{"ok":true}' * 100)
+    assert gzip.decompress(payload.gzip) == payload.body
+    assert "br" not in vars(payload)
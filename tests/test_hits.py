@@ -0,0 +1,54 @@
+import pytest
+from fastapi import FastAPI
+
+from app import routes
+from app.middleware.hits import HitCounterMiddleware
+
+ILCE = 9541
+
+
+@pytest.fixture
+def client(make_client, store_days):
+    store_days(ILCE)
+    routes.prayer_times.hits.clear()
+    app = FastAPI()
+    app.include_router(routes.router)
+    client = make_client(app)
+    # Outermost, in front of the response cache as in main.py
+    app.add_middleware(HitCounterMiddleware, hits=routes.prayer_times.hits)  # type: ignore[arg-type]
+    yield client
+    routes.prayer_times.hits.clear()
+
+
+def test_cache_hits_are_counted(client):
+    assert client.get(f"/vakitler/{ILCE}").headers["x-cache"] == "MISS"
+    assert client.get(f"/vakitler/{ILCE}").headers["x-cache"] == "HIT"
+    assert client.get(f"/vakitler/{ILCE}").headers["x-cache"] == "HIT"
+
+    assert routes.prayer_times.hits == {ILCE: 3}
+
+
+@pytest.mark.parametrize(
+    "url",
+    [
+        f"/vakitler/{ILCE}",
+        f"/vakitler?ilce={ILCE}",
+        f"/vakitler/{ILCE}/bugun",
+        f"/vakitler/{ILCE}?tarih=2026-01-01",
+    ],
+)
+def test_single_ilce_requests_are_counted(client, url):
+    client.get(url)
+    assert routes.prayer_times.hits == {ILCE: 1}
+
+
+@pytest.mark.parametrize("url", ["/vakitler?ilce=abc", "/ulkeler", "/lookup"])
+def test_other_requests_are_not_counted(client, url):
+    client.get(url)
+    assert not routes.prayer_times.hits
+
+
+def test_batch_counts_every_ilce(client, store_days):
+    store_days(9535)
+    client.post("/vakitler/batch", json=[ILCE, 9535, ILCE])
+    assert routes.prayer_times.hits == {ILCE: 1, 9535: 1}
@@ -0,0 +1,115 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+
+from app import routes
+
+
+@pytest.fixture
+def client(catalog, make_client):
+    # /lookup is only excluded from the response cache when the static
+    # responses are pre-serialized; this is the layout without them
+    app = FastAPI()
+    app.include_router(routes.router)
+    return make_client(app)
+
+
+@pytest.mark.parametrize("first", ["br", "gzip"])
+def test_encoded_page_is_not_cached_for_other_clients(client, first):
+    url = "/lookup?ulke=turkiye&limit=2"
+    encoded = client.get(url, headers={"Accept-Encoding": first})
+    assert encoded.status_code == 200
+    assert encoded.headers["content-encoding"] == first
+    assert "x-cache" not in encoded.headers
+
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert plain.status_code == 200
+    assert "content-encoding" not in plain.headers
+    assert [entry["IlceID"] for entry in json.loads(plain.content)] == [
+        entry["IlceID"] for entry in encoded.json()
+    ]
+
+
+def test_identity_page_is_cached_and_served_encoded(client):
+    url = "/lookup?ulke=turkiye&limit=50"
+    plain = client.get(url, headers={"Accept-Encoding": "identity"})
+    assert plain.headers["x-cache"] == "MISS"
+
+    hit = client.get(url, headers={"Accept-Encoding": "gzip"})
+    assert hit.headers["x-cache"] == "HIT"
+    assert hit.headers["content-encoding"] == "gzip"
+    assert hit.json() == plain.json()
+
+
+def follow(client, url: str) -> list:
+    """Request a page and every page after it through the Link headers."""
+    pages = []
+    while url:
+        response = client.get(url)
+        assert response.status_code == 200
+        pages.append(response)
+        link = response.headers.get("link")
+        if link is not None:
+            assert link.endswith('>; rel="next"')
+            link = link[1 : link.index(">")]
+        url = link
+    return pages
+
+
+def test_pages_cover_every_entry_once(client):
+    everything = client.get("/lookup?ulke=turkiye").json()
+    total = len(everything)
+    assert total > 600
+
+    pages = follow(client, "/lookup?ulke=turkiye&limit=300")
+    assert len(pages) == -(-total // 300)
+    assert all(page.headers["x-total-count"] == str(total) for page in pages)
+    assert [entry for page in pages for entry in page.json()] == everything
+
+
+def test_cursor_does_not_depend_on_the_page_size(client):
+    first = client.get("/lookup?ulke=turkiye&limit=7")
+    cursor = first.headers["link"].split("cursor=")[1].split(">")[0]
+
+    small = client.get(f"/lookup?ulke=turkiye&limit=2&cursor={cursor}").json()
+    large = client.get(f"/lookup?ulke=turkiye&limit=50&cursor={cursor}").json()
+    everything = client.get("/lookup?ulke=turkiye").json()
+    assert small == large[:2] == everything[7:9]
+
+
+def test_cursor_past_the_end(client):
+    response = client.get("/lookup?ulke=turkiye&cursor=1000000")
+    assert response.json() == []
+    assert int(response.headers["x-total-count"]) > 0
+    assert "link" not in response.headers
+
+
+def test_fields_and_columns_project_the_page(client):
+    url = "/lookup?sehir=ankara&limit=5"
+    entries = client.get(url).json()
+    assert len(entries) == 5
+
+    projected = client.get(f"{url}&fields=IlceID,IlceAdi").json()
+    assert projected == [
+        {"IlceAdi": entry["IlceAdi"], "IlceID": entry["IlceID"]} for entry in entries
+    ]
+
+    columns = client.get(f"{url}&format=columns&fields=lat,IlceID").json()
+    assert columns == {
+        "IlceID": [entry["IlceID"] for entry in entries],
+        "lat": [entry["lat"] for entry in entries],
+    }
+
+
+@pytest.mark.parametrize(
+    ("query", "status"),
+    [
+        ("fields=IlceID,nope", 400),
+        ("fields=,", 400),
+        ("cursor=-1", 422),
+        ("limit=0", 422),
+    ],
+)
+def test_invalid_page_parameters(client, query, status):
+    assert client.get(f"/lookup?ulke=turkiye&{query}").status_code == status
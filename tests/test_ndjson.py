@@ -0,0 +1,47 @@
+import json
+
+import pytest
+from fastapi import FastAPI
+
+from app import routes
+from app.services.streaming import NDJSON_MEDIA_TYPE
+
+
+@pytest.fixture
+def client(catalog, make_client):
+    app = FastAPI()
+    app.include_router(routes.router)
+    return make_client(app)
+
+
+def ndjson(response) -> list:
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith(NDJSON_MEDIA_TYPE)
+    # Streamed straight through, never buffered into the response cache
+    assert "x-cache" not in response.headers
+    assert response.text.endswith("\n")
+    return [json.loads(line) for line in response.text.splitlines()]
+
+
+@pytest.mark.parametrize("query", ["ulke=turkiye", "ulke=turkiye&limit=300&cursor=5"])
+def test_lookup_lines_match_the_json_page(client, query):
+    page = client.get(f"/lookup?{query}")
+    lines = client.get(f"/lookup?{query}&format=ndjson")
+    assert ndjson(lines) == page.json()
+    assert lines.headers["x-total-count"] == page.headers["x-total-count"]
+    assert lines.headers.get("link", "").replace("&format=ndjson", "") == (
+        page.headers.get("link", "")
+    )
+
+
+def test_lookup_lines_are_projected(client):
+    lines = ndjson(client.get("/lookup?sehir=ankara&fields=IlceID&format=ndjson"))
+    assert lines
+    assert all(list(line) == ["IlceID"] for line in lines)
+
+
+def test_ilceler_lines_match_the_json_list(client):
+    assert ndjson(client.get("/ilceler/539?format=ndjson")) == (
+        client.get("/ilceler/539").json()
+    )
+    assert client.get("/ilceler/99999999?format=ndjson").status_code == 404
@@ -0,0 +1,110 @@
+import math
+import random
+
+import pytest
+
+from app.services.catalog import LocationCatalog
+from app.services.nearby import NearestIlceIndex, haversine
+
+
+def brute_force(records, lat, lon, k):
+    return sorted(haversine(lat, lon, r["lat"], r["lon"]) for r in records)[:k]
+
+
+def grid_records():
+    """Ilces on a coarse grid, denser next to the poles and the antimeridian."""
+    points = [(lat, lon) for lat in range(-80, 81, 20) for lon in range(-180, 180, 30)]
+    points += [
+        (lat, lon)
+        for lat in (-89.9, -89.5, -88.0, 88.0, 89.5, 89.9)
+        for lon in range(-180, 180, 45)
+    ]
+    points += [
+        (lat, lon)
+        for lat in (-45.0, 0.0, 12.5, 65.0)
+        for lon in (-179.99, -179.5, -178.0, 178.0, 179.5, 179.99)
+    ]
+    return [
+        {"IlceID": str(i), "lat": float(lat), "lon": float(lon)}
+        for i, (lat, lon) in enumerate(points)
+    ]
+
+
+QUERIES = [
+    (0.0, 0.0),
+    (90.0, 0.0),
+    (-90.0, 0.0),
+    (89.99, 123.0),
+    (-89.99, -57.0),
+    (0.0, 180.0),
+    (0.0, -180.0),
+    (12.5, 179.999),
+    (12.5, -179.999),
+    (65.0, 180.0),
+    (-45.0, -179.9),
+    (41.0082, 28.9784),
+]
+
+
+@pytest.mark.parametrize(("lat", "lon"), QUERIES)
+@pytest.mark.parametrize("k", [1, 3, 10])
+def test_fixed_points_match_brute_force(lat, lon, k):
+    records = grid_records()
+    index = NearestIlceIndex(records)
+
+    distances = [d for d, _ in index.nearest(lat, lon, k)]
+
+    assert distances == pytest.approx(brute_force(records, lat, lon, k))
+
+
+def test_random_points_match_brute_force():
+    rng = random.Random(1234)
+    records = grid_records()
+    index = NearestIlceIndex(records)
+
+    for _ in range(500):
+        lat = math.degrees(math.asin(rng.uniform(-1, 1)))
+        lon = rng.uniform(-180, 180)
+        k = rng.choice([1, 2, 5, 25])
+        distances = [d for d, _ in index.nearest(lat, lon, k)]
+        assert distances == pytest.approx(brute_force(records, lat, lon, k))
+
+
+def test_catalog_matches_brute_force():
+    catalog = LocationCatalog()
+    catalog.load()
+    records = [r for r in catalog.lookup if r.get("lat") is not None]
+    index = NearestIlceIndex(records)
+    rng = random.Random(42)
+
+    queries = [(r["lat"], r["lon"]) for r in rng.sample(records, 100)]
+    queries += [
+        (math.degrees(math.asin(rng.uniform(-1, 1))), rng.uniform(-180, 180))
+        for _ in range(100)
+    ]
+    for lat, lon in queries:
+        distances = [d for d, _ in index.nearest(lat, lon, 5)]
+        assert distances == pytest.approx(brute_force(records, lat, lon, 5))
+
+
+def test_exact_ilce_is_nearest():
+    records = grid_records()
+    index = NearestIlceIndex(records)
+
+    for record in records:
+        distance, nearest = index.nearest(record["lat"], record["lon"])[0]
+        assert distance == pytest.approx(0.0, abs=1e-6)
+        assert (nearest["lat"], nearest["lon"]) == (record["lat"], record["lon"])
+
+
+def test_records_without_coordinates_are_skipped():
+    records = [
+        {"IlceID": "1", "lat": 41.0, "lon": 29.0},
+        {"IlceID": "2", "lat": None, "lon": None},
+        {"IlceID": "3"},
+    ]
+    index = NearestIlceIndex(records)
+
+    assert len(index) == 1
+    assert [r["IlceID"] for _, r in index.nearest(0.0, 0.0, 5)] == ["1"]
+    assert index.nearest(0.0, 0.0, 0) == []
@@ -0,0 +1,143 @@
+import asyncio
+from datetime import date, timedelta
+
+import pytest
+from conftest import vakit
+
+from app.infrastructure.cache.service import CacheService
+from app.infrastructure.cache.singleflight import SingleFlight
+from app.services import vakitler
+from app.services.vakitler import PrayerTimesService
+
+TODAY = date(2026, 3, 1)
+
+
+class SlowCall:
+    """Coroutine function finishing only once released, counting its calls."""
+
+    def __init__(self, result=None, error: Exception | None = None):
+        self.result = result
+        self.error = error
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        await self.released.wait()
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+async def started() -> None:
+    """Let the tasks run until they all wait on the call in flight."""
+    for _ in range(3):
+        await asyncio.sleep(0)
+
+
+def test_concurrent_calls_share_one_execution():
+    async def main():
+        flights = SingleFlight()
+        call = SlowCall(result=["vakit"])
+        waiters = [asyncio.create_task(flights.do("a", call)) for _ in range(5)]
+        await started()
+        call.released.set()
+
+        results = await asyncio.gather(*waiters)
+        assert call.calls == 1
+        assert all(result is results[0] for result in results)
+        assert flights.metrics == {"calls": 5, "executions": 1, "shared": 4}
+
+        # Done: the next call runs again
+        assert await flights.do("a", call) == ["vakit"]
+        assert call.calls == 2
+
+    asyncio.run(main())
+
+
+def test_different_keys_are_not_coalesced():
+    async def main():
+        flights = SingleFlight()
+        call = SlowCall()
+        waiters = [asyncio.create_task(flights.do(key, call)) for key in "abc"]
+        await started()
+        call.released.set()
+        await asyncio.gather(*waiters)
+        assert call.calls == 3
+
+    asyncio.run(main())
+
+
+def test_every_waiter_gets_the_error():
+    async def main():
+        flights = SingleFlight()
+        call = SlowCall(error=RuntimeError("upstream down"))
+        waiters = [asyncio.create_task(flights.do("a", call)) for _ in range(3)]
+        await started()
+        call.released.set()
+
+        results = await asyncio.gather(*waiters, return_exceptions=True)
+        assert call.calls == 1
+        assert all(isinstance(result, RuntimeError) for result in results)
+
+    asyncio.run(main())
+
+
+def test_cancelled_waiter_leaves_the_call_running():
+    async def main():
+        flights = SingleFlight()
+        call = SlowCall(result=1)
+        first = asyncio.create_task(flights.do("a", call))
+        second = asyncio.create_task(flights.do("a", call))
+        await started()
+        first.cancel()
+        await asyncio.sleep(0)
+        call.released.set()
+
+        assert await second == 1
+        assert first.cancelled()
+        assert call.calls == 1
+
+    asyncio.run(main())
+
+
+class FakeApiClient:
+    def __init__(self):
+        self.calls = 0
+        self.released = asyncio.Event()
+
+    async def get_monthly_prayer_times(self, ilce_id: str):
+        self.calls += 1
+        await self.released.wait()
+        return [vakit(TODAY + timedelta(days=offset)) for offset in range(30)]
+
+
+@pytest.fixture
+def service(monkeypatch):
+    # The fake client returns the converted records already
+    monkeypatch.setattr(vakitler, "convert_vakit_response", lambda response: response)
+    return PrayerTimesService(
+        api_client=FakeApiClient(),  # type: ignore[arg-type]
+        cache_service=CacheService("memory", default_timeout=60),
+    )
+
+
+def test_concurrent_misses_make_one_upstream_call(service):
+    async def main():
+        requests = [
+            asyncio.create_task(service.get_monthly(9541, today=TODAY))
+            for _ in range(10)
+        ]
+        await started()
+        service.api_client.released.set()
+
+        results = await asyncio.gather(*requests)
+        assert service.api_client.calls == 1
+        assert all(result == results[0] for result in results)
+        assert len(results[0]) == 30
+
+        # Stored now: no further upstream call
+        await service.get_monthly(9541, today=TODAY)
+        assert service.api_client.calls == 1
+
+    asyncio.run(main())